@@ -1,4 +1,5 @@
 from flask import Flask, jsonify, request, send_from_directory
+import logging
 import os
 from pymongo import MongoClient
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -14,6 +15,16 @@ class JSONEncoder(json.JSONEncoder):
 
 # Importar models
 import models
+import report_gateway
+import batch_fetch
+import request_batch
+import song_fanout
+# Módulos compartilhados com o report-service (ver common/)
+from moodtracker_common import admission, invalidation, lifecycle, log_config, mongo_tracing, static_assets
+
+# Logs em JSON, escritos por uma thread de fundo (não bloqueiam a requisição)
+log_config.setup_logging("app-main")
+logger = logging.getLogger(__name__)
 
 # Criar app
 app = Flask(
@@ -24,25 +35,86 @@ app = Flask(
 
 # Ativação do jsonencoder
 app.json_encoder = JSONEncoder
+log_config.init_request_ids(app)
+
+# Prioridade de cada rota: gravações e login nunca esperam atrás de estatísticas
+def admission_class(req):
+    if req.endpoint in ('create_mood', 'login', 'register_patient', 'register_professional'):
+        return admission.CRITICAL
+    if req.endpoint == 'get_user_stats':
+        return admission.EXPENSIVE
+    if req.endpoint == 'get_user_moods' and req.args.get('detailed', 'false').lower() == 'true':
+        return admission.EXPENSIVE
+    if req.endpoint == 'report_proxy' and req.view_args['subpath'].startswith(('pdf/', 'user_mood_stats/', 'risk')):
+        return admission.EXPENSIVE
+    if req.endpoint in (None, 'index', 'serve_css', 'static_asset', 'admission_metrics', 'report_gateway_metrics',
+                        'invalidation_metrics', 'livez', 'readyz'):
+        return None
+    # Cada item do lote passa pela admissão com a própria classe
+    if req.endpoint == 'batch':
+        return None
+    # Feed SSE: só o redirecionamento para o stream_app do report-service
+    if req.endpoint == 'report_proxy' and req.view_args['subpath'] == 'stream':
+        return None
+    # JS/CSS do relatório HTML, servidos do build (ou de static/) do report-service
+    if req.endpoint == 'report_proxy' and req.view_args['subpath'].startswith(('assets/', 'static/')):
+        return None
+    return admission.NORMAL
+
+admission.init_admission(app, admission_class)
+mongo_tracing.init_tracing(app)
+# /reports/* repassado ao report-service (mesma origem para o frontend)
+report_gateway.init_gateway(app)
+# JS/CSS do build com hash no nome e cache imutável (ver static_assets.py)
+static_assets.init_assets(app, "/assets")
+# POST /batch: várias chamadas do frontend em uma só ida e volta (ver request_batch.py)
+request_batch.init_request_batch(app)
 
 #Conexão MongoDB
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
 DB_NAME = os.getenv("DB_NAME", "moodtracker")
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    
-    # Testar conexão
-    client.admin.command('ping')
-    print(f"✅ Conectado ao MongoDB: {MONGO_URI}")
-    print(f"✅ Database: {DB_NAME}")
-    
-    models.init_db(db)
-    
-except Exception as e:
-    print(f"Erro ao conectar MongoDB: {e}")
-    exit(1)
+# Tracer registra os comandos de cada requisição (Server-Timing e alerta de N+1).
+# O client conecta sob demanda: o processo sobe mesmo com o Mongo fora do ar
+client = MongoClient(MONGO_URI, event_listeners=[mongo_tracing.RequestCommandTracer()])
+db = client[DB_NAME]
+logger.info(f"MongoDB: {MONGO_URI}")
+logger.info(f"Database: {DB_NAME}")
+
+models.init_db(db)
+# Threads de fundo só no processo que atende: não no pai do reloader de `python app.py`
+BACKGROUND_THREADS = lifecycle.serving_process(__name__)
+# Atualiza as cópias das músicas nas entradas de humor (ver song_fanout.py)
+if BACKGROUND_THREADS:
+    song_fanout.start_worker(db)
+# Invalida os caches em memória a partir do change stream (ver invalidation.py)
+invalidation.init_invalidation(app, db, start=BACKGROUND_THREADS)
+
+# Subida em segundo plano: /readyz responde 200 depois do aquecimento (ver lifecycle.py)
+lifecycle.startup.check("mongodb", lifecycle.mongo_ping(client))
+# MOOD_STORE=timeseries em MongoDB sem update/delete na time-series: nunca fica pronto
+lifecycle.startup.check("mood_store", models.check_mood_store)
+lifecycle.startup.warmup_step("indexes", models.ensure_indexes)
+lifecycle.init_lifecycle(app, start=BACKGROUND_THREADS)
+
+def _batch_args():
+    """Ids e campos de uma busca em lote: ?ids=a,b&fields=x,y ou {"ids": [...], "fields": [...]} no POST"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        ids, fields = data.get('ids'), data.get('fields')
+        if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+            return None, None, "fields deve ser uma lista de strings"
+    else:
+        ids = batch_fetch.split_param(request.args.get('ids'))
+        fields = batch_fetch.split_param(request.args.get('fields'))
+    return ids, fields, batch_fetch.validate_ids(ids)
+
+def _batch_response(name, fetch):
+    """Busca em lote com uma consulta $in (ver batch_fetch.py)"""
+    ids, fields, error = _batch_args()
+    if error:
+        return jsonify({"error": error}), 400
+    return jsonify(batch_fetch.response(name, ids, fetch(ids, fields=fields)))
 
 #Rotas
 
@@ -53,7 +125,8 @@ def serve_css():
 
 @app.route('/')
 def index():
-    return send_from_directory('templates', 'index.html')
+    # Shell do build (ou o template, sem build): revalidado a cada visita
+    return static_assets.send_shell('index.html', 'templates')
 
 @app.route('/test-db')
 def test_db():
@@ -123,8 +196,10 @@ def create_user():
 
 @app.route('/users', methods=['GET'])
 def list_users():
-    """Listar todos os usuários"""
+    """Listar todos os usuários (ou só os de ?ids=a,b,c, na ordem pedida)"""
     try:
+        if 'ids' in request.args:
+            return _batch_response("users", models.get_users_by_ids)
         users = models.list_all_users() #Depende de uma função do models
         return jsonify({
             "users": users,
@@ -133,6 +208,14 @@ def list_users():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/users/batch', methods=['POST'])
+def get_users_batch():
+    """Buscar vários usuários por id ({"ids": [...]}, para listas longas)"""
+    try:
+        return _batch_response("users", models.get_users_by_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/users/<user_id>', methods=['GET'])
 def get_user(user_id):
     """Buscar usuário específico"""
@@ -215,8 +298,10 @@ def create_song():
 
 @app.route('/songs', methods=['GET'])
 def list_songs():
-    """Listar músicas"""
+    """Listar músicas (ou só as de ?ids=a,b,c, na ordem pedida)"""
     try:
+        if 'ids' in request.args:
+            return _batch_response("songs", models.get_songs_by_ids)
         limit = request.args.get('limit', 50, type=int)
         songs = models.list_songs(limit=limit)
         
@@ -228,6 +313,14 @@ def list_songs():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/songs/batch', methods=['POST'])
+def get_songs_batch():
+    """Buscar várias músicas por id ({"ids": [...]}, para listas longas)"""
+    try:
+        return _batch_response("songs", models.get_songs_by_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/songs/<song_id>', methods=['GET'])
 def get_song(song_id):
     """Buscar música específica"""
@@ -344,6 +437,22 @@ def clear_songs():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/moods', methods=['GET'])
+def get_moods_batch():
+    """Buscar várias entradas de humor por id (?ids=a,b,c, na ordem pedida)"""
+    try:
+        return _batch_response("moods", models.get_mood_entries_by_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/moods/batch', methods=['POST'])
+def post_moods_batch():
+    """Buscar várias entradas de humor por id ({"ids": [...]}, para listas longas)"""
+    try:
+        return _batch_response("moods", models.get_mood_entries_by_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/moods/<mood_id>', methods=['GET'])
 def get_mood(mood_id):
     """Buscar entrada de humor específica"""
@@ -536,17 +645,8 @@ def internal_error(error):
 
 #Execução do app
 if __name__ == '__main__':
-    print("🚀 Iniciando MoodTracker API...")
-    print("📊 Endpoints disponíveis:")
-    print("   GET  /                    - Info da API")
-    print("   GET  /test-db             - Testar MongoDB")
-    print("   POST /users               - Criar usuário")
-    print("   GET  /users               - Listar usuários")
-    print("   POST /songs               - Criar música")
-    print("   GET  /songs               - Listar músicas")
-    print("   POST /moods               - Criar mood entry")
-    print("   GET  /moods/user/<id>     - Moods do usuário")
-    print("   GET  /stats/user/<id>     - Estatísticas")
-    print("   POST /auth/login          - Login")
+    logger.info("Iniciando MoodTracker API...", extra={"fields": {
+        "endpoints": sorted(str(rule) for rule in app.url_map.iter_rules() if rule.endpoint != "static")
+    }})
     
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
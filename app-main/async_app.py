@@ -0,0 +1,413 @@
+"""
+Versão assíncrona (ASGI) das rotas de usuários, músicas, humores e estatísticas do app.py.
+
+Mesmo contrato JSON do app.py, mas cada requisição esperando o MongoDB não
+prende uma thread: roda em um único event loop com o driver motor.
+
+    uvicorn async_app:app --host 0.0.0.0 --port 5000
+"""
+import json
+import logging
+import os
+from datetime import date, datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from werkzeug.http import http_date
+from werkzeug.security import generate_password_hash
+
+import async_models
+import batch_fetch
+from moodtracker_common import log_config
+
+log_config.setup_logging("app-async")
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+DB_NAME = os.getenv("DB_NAME", "moodtracker")
+# Conexões por processo: com um só event loop, é o teto de consultas simultâneas
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 200))
+
+client = None
+
+def _json_default(o):
+    # Mesmo formato do JSON do Flask (datas em HTTP-date)
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return http_date(o)
+    raise TypeError(f"Objeto do tipo {type(o).__name__} não é serializável em JSON")
+
+class FlaskJSONResponse(JSONResponse):
+    """JSONResponse serializando como o jsonify do app.py"""
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_json_default, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def jsonify(data, status_code: int = 200) -> FlaskJSONResponse:
+    return FlaskJSONResponse(data, status_code=status_code)
+
+async def _get_json(request):
+    """Corpo JSON da requisição, ou None se ausente/inválido"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def _int_arg(request, name: str, default: int) -> int:
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+def _missing_fields(data, required_fields):
+    return [field for field in required_fields if field not in data or not data[field]]
+
+async def _batch_response(request, name: str, fetch):
+    """Busca em lote: ?ids=a,b&fields=x,y ou {"ids": [...], "fields": [...]} no POST (ver batch_fetch.py)"""
+    if request.method == 'POST':
+        data = await _get_json(request) or {}
+        ids, fields = data.get('ids'), data.get('fields')
+        if fields is not None and not (isinstance(fields, list) and all(isinstance(f, str) for f in fields)):
+            return jsonify({"error": "fields deve ser uma lista de strings"}, 400)
+    else:
+        ids = batch_fetch.split_param(request.query_params.get('ids'))
+        fields = batch_fetch.split_param(request.query_params.get('fields'))
+    error = batch_fetch.validate_ids(ids)
+    if error:
+        return jsonify({"error": error}, 400)
+    return jsonify(batch_fetch.response(name, ids, await fetch(ids, fields=fields)))
+
+# Rotas dos usuários
+
+async def create_user(request):
+    """Criar novo usuário"""
+    try:
+        data = await _get_json(request)
+        if not data:
+            return jsonify({"error": "JSON é obrigatório"}, 400)
+
+        missing_fields = _missing_fields(data, ['username', 'email', 'password'])
+        if missing_fields:
+            return jsonify({"error": f"Campos obrigatórios: {', '.join(missing_fields)}"}, 400)
+
+        result = await async_models.create_user(
+            username=data['username'],
+            email=data['email'],
+            password_hash=generate_password_hash(data['password']),
+            user_type="patient"
+        )
+        if 'error' in result:
+            return jsonify(result, 400)
+        return jsonify(result, 201)
+
+    except Exception as e:
+        return jsonify({"error": f"Erro interno: {str(e)}"}, 500)
+
+async def list_users(request):
+    """Listar todos os usuários (ou só os de ?ids=a,b,c, na ordem pedida)"""
+    try:
+        if 'ids' in request.query_params:
+            return await _batch_response(request, "users", async_models.get_users_by_ids)
+        users = await async_models.list_all_users()
+        return jsonify({"users": users, "total": len(users)})
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def get_users_batch(request):
+    """Buscar vários usuários por id ({"ids": [...]}, para listas longas)"""
+    try:
+        return await _batch_response(request, "users", async_models.get_users_by_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def get_user(request):
+    """Buscar usuário específico"""
+    try:
+        user = await async_models.get_user_by_id(request.path_params['user_id'])
+        if user:
+            user.pop('password_hash', None)
+            return jsonify({"user": user})
+        return jsonify({"error": "Usuário não encontrado"}, 404)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def update_user(request):
+    """Atualizar usuário"""
+    try:
+        data = await _get_json(request)
+        if not data:
+            return jsonify({"error": "JSON é obrigatório"}, 400)
+
+        result = await async_models.update_user(request.path_params['user_id'], **data)
+        if 'error' in result:
+            return jsonify(result, 400)
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def delete_user(request):
+    """Deletar usuário"""
+    try:
+        result = await async_models.delete_user(request.path_params['user_id'])
+        if 'error' in result:
+            return jsonify(result, 404)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+# Rotas das músicas
+
+async def create_song(request):
+    """Criar nova música"""
+    try:
+        data = await _get_json(request)
+        if not data:
+            return jsonify({"error": "JSON é obrigatório"}, 400)
+
+        missing_fields = _missing_fields(data, ['title', 'artist', 'spotify_url'])
+        if missing_fields:
+            return jsonify({"error": f"Campos obrigatórios: {', '.join(missing_fields)}"}, 400)
+
+        result = await async_models.create_song(
+            title=data['title'],
+            artist=data['artist'],
+            spotify_url=data['spotify_url'],
+            genres=data.get('genres', [])
+        )
+        if 'error' in result:
+            return jsonify(result, 400)
+        return jsonify(result, 201)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def list_songs(request):
+    """Listar músicas (ou só as de ?ids=a,b,c, na ordem pedida)"""
+    try:
+        if 'ids' in request.query_params:
+            return await _batch_response(request, "songs", async_models.get_songs_by_ids)
+        limit = _int_arg(request, 'limit', 50)
+        songs = await async_models.list_songs(limit=limit)
+        return jsonify({"songs": songs, "total": len(songs), "limit": limit})
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def get_songs_batch(request):
+    """Buscar várias músicas por id ({"ids": [...]}, para listas longas)"""
+    try:
+        return await _batch_response(request, "songs", async_models.get_songs_by_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def get_song(request):
+    """Buscar música específica"""
+    try:
+        song = await async_models.get_song(request.path_params['song_id'])
+        if song:
+            return jsonify({"song": song})
+        return jsonify({"error": "Música não encontrada"}, 404)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def update_song(request):
+    """Atualizar música"""
+    try:
+        data = await _get_json(request)
+        if not data:
+            return jsonify({"error": "JSON é obrigatório"}, 400)
+
+        result = await async_models.update_song(request.path_params['song_id'], **data)
+        if 'error' in result:
+            return jsonify(result, 404)
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def delete_song(request):
+    """Deletar música"""
+    try:
+        result = await async_models.delete_song(request.path_params['song_id'])
+        if 'error' in result:
+            return jsonify(result, 404)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+# Rotas dos humores
+
+async def create_mood(request):
+    """Criar entrada de humor"""
+    try:
+        data = await _get_json(request)
+        if not data:
+            return jsonify({"error": "JSON é obrigatório"}, 400)
+
+        missing_fields = _missing_fields(data, ['user_id', 'emoji'])
+        if missing_fields:
+            return jsonify({"error": f"Campos obrigatórios: {', '.join(missing_fields)}"}, 400)
+
+        result = await async_models.create_mood_entry(
+            user_id=data['user_id'],
+            emoji=data['emoji'],
+            song_id=data.get('song_id'),
+            comment=data.get('comment', '')
+        )
+        if 'error' in result:
+            return jsonify(result, 400)
+        return jsonify(result, 201)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def get_user_moods(request):
+    """Buscar humores de um usuário"""
+    try:
+        user_id = request.path_params['user_id']
+        limit = _int_arg(request, 'limit', 20)
+        detailed = request.query_params.get('detailed', 'false').lower() == 'true'
+
+        if detailed:
+            moods = await async_models.get_mood_entries_with_songs(user_id, limit=limit)
+        else:
+            moods = await async_models.list_mood_entries(user_id, limit=limit)
+
+        return jsonify({
+            "moods": moods,
+            "total": len(moods),
+            "user_id": user_id,
+            "detailed": detailed
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def get_moods_batch(request):
+    """Buscar várias entradas de humor por id (?ids=a,b,c ou {"ids": [...]} no POST)"""
+    try:
+        return await _batch_response(request, "moods", async_models.get_mood_entries_by_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def get_mood(request):
+    """Buscar entrada de humor específica"""
+    try:
+        mood = await async_models.get_mood_entry(request.path_params['mood_id'])
+        if mood:
+            return jsonify({"mood": mood})
+        return jsonify({"error": "Entrada não encontrada"}, 404)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def update_mood(request):
+    """Atualizar entrada de humor"""
+    try:
+        data = await _get_json(request)
+        if not data:
+            return jsonify({"error": "JSON é obrigatório"}, 400)
+
+        result = await async_models.update_mood_entry(request.path_params['mood_id'], **data)
+        if 'error' in result:
+            return jsonify(result, 404)
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+async def delete_mood(request):
+    """Deletar entrada de humor"""
+    try:
+        result = await async_models.delete_mood_entry(request.path_params['mood_id'])
+        if 'error' in result:
+            return jsonify(result, 404)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+# Estatísticas
+
+async def get_user_stats(request):
+    """Estatísticas do usuário"""
+    try:
+        days = _int_arg(request, 'days', 30)
+        stats = await async_models.get_user_mood_stats(request.path_params['user_id'], days=days)
+        if 'error' in stats:
+            return jsonify(stats, 400)
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": str(e)}, 500)
+
+# Erros
+
+async def not_found(request, exc):
+    return jsonify({"error": "Endpoint não encontrado"}, 404)
+
+async def method_not_allowed(request, exc):
+    return jsonify({"error": "Método não permitido"}, 405)
+
+async def http_error(request, exc: HTTPException):
+    return jsonify({"error": exc.detail}, exc.status_code)
+
+async def internal_error(request, exc):
+    logger.exception(f"Erro não tratado em {request.url.path}: {exc}")
+    return jsonify({"error": "Erro interno do servidor"}, 500)
+
+# Ciclo de vida
+
+async def connect_mongo():
+    """Conectar ao MongoDB no event loop do servidor"""
+    global client
+    client = AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    await client.admin.command('ping')
+    logger.info(f"Conectado ao MongoDB: {MONGO_URI}/{DB_NAME}")
+    async_models.init_db(client[DB_NAME])
+    # Sem update/delete na time-series, o processo não sobe com MOOD_STORE=timeseries
+    await async_models.check_mood_store()
+
+async def close_mongo():
+    if client:
+        client.close()
+
+routes = [
+    Route('/users', create_user, methods=['POST']),
+    Route('/users', list_users, methods=['GET']),
+    Route('/users/batch', get_users_batch, methods=['POST']),
+    Route('/users/{user_id}', get_user, methods=['GET']),
+    Route('/users/{user_id}', update_user, methods=['PUT']),
+    Route('/users/{user_id}', delete_user, methods=['DELETE']),
+    Route('/songs', create_song, methods=['POST']),
+    Route('/songs', list_songs, methods=['GET']),
+    Route('/songs/batch', get_songs_batch, methods=['POST']),
+    Route('/songs/{song_id}', get_song, methods=['GET']),
+    Route('/songs/{song_id}', update_song, methods=['PUT']),
+    Route('/songs/{song_id}', delete_song, methods=['DELETE']),
+    Route('/moods', create_mood, methods=['POST']),
+    Route('/moods', get_moods_batch, methods=['GET']),
+    Route('/moods/batch', get_moods_batch, methods=['POST']),
+    Route('/moods/user/{user_id}', get_user_moods, methods=['GET']),
+    Route('/moods/{mood_id}', get_mood, methods=['GET']),
+    Route('/moods/{mood_id}', update_mood, methods=['PUT']),
+    Route('/moods/{mood_id}', delete_mood, methods=['DELETE']),
+    Route('/stats/user/{user_id}', get_user_stats, methods=['GET'])
+]
+
+app = Starlette(
+    routes=routes,
+    exception_handlers={
+        404: not_found,
+        405: method_not_allowed,
+        HTTPException: http_error,
+        Exception: internal_error
+    },
+    on_startup=[connect_mongo],
+    on_shutdown=[close_mongo]
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv("PORT", 5000)), access_log=False)
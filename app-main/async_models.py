@@ -0,0 +1,608 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from typing import Optional, Dict, Any, List
+
+import batch_fetch
+import recent_moods
+import song_fanout
+from recent_moods import RECENT_MOODS_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Versão assíncrona (motor) das funções de models.py usadas pelo async_app.
+# Mesmos documentos e mesmos retornos; consultas independentes rodam em paralelo.
+
+# Variável global para receber instância do db (AsyncIOMotorDatabase)
+db = None
+
+# Mesmo MOOD_STORE do models.py (legacy | dual | timeseries)
+MOOD_STORE = os.getenv("MOOD_STORE", "legacy")
+MOODS_TIMESERIES = "mood_entries_ts"
+ID_TIME_WINDOW = timedelta(minutes=5)
+TIMESERIES_MIN_SERVER = (8, 0)
+MOOD_EVENTS = "mood_events"
+
+def init_db(database_instance):
+    """Inicializar a conexão do banco no models"""
+    global db
+    db = database_instance
+    logger.info("Async models inicializado com sucesso!")
+
+async def check_mood_store():
+    """Recusar MOOD_STORE=timeseries em servidor que não edita nem apaga entradas da time-series"""
+    if MOOD_STORE != "timeseries":
+        return
+    info = await db.client.server_info()
+    version = tuple(int(part) for part in info["version"].split(".")[:2])
+    if version < TIMESERIES_MIN_SERVER:
+        raise RuntimeError(f"MOOD_STORE=timeseries exige MongoDB {'.'.join(map(str, TIMESERIES_MIN_SERVER))} "
+                           f"(servidor {'.'.join(map(str, version))}); mantenha MOOD_STORE=dual")
+
+def _moods():
+    """Coleção de onde as entradas de humor são lidas"""
+    return db[MOODS_TIMESERIES] if MOOD_STORE == "timeseries" else db.mood_entries
+
+def _mood_write_targets():
+    """Coleções que recebem as inserções (a time-series sempre primeiro; update/delete em _apply_to_mood)"""
+    if MOOD_STORE == "timeseries":
+        return [db[MOODS_TIMESERIES]]
+    if MOOD_STORE == "dual":
+        return [db[MOODS_TIMESERIES], db.mood_entries]
+    return [db.mood_entries]
+
+def _is_timeseries(collection) -> bool:
+    return collection.name == MOODS_TIMESERIES
+
+def _mood_id_filter(collection, oid: ObjectId) -> Dict[str, Any]:
+    if not _is_timeseries(collection):
+        return {"_id": oid}
+    created = oid.generation_time.replace(tzinfo=None)
+    return {"_id": oid, "created_at": {"$gte": created - ID_TIME_WINDOW, "$lte": created + ID_TIME_WINDOW}}
+
+def _mood_ids_filter(collection, oids: List[ObjectId]) -> Dict[str, Any]:
+    if not _is_timeseries(collection):
+        return {"_id": {"$in": oids}}
+    return {"$or": [_mood_id_filter(collection, oid) for oid in oids]}
+
+async def _push_recent_mood(doc: Dict[str, Any]):
+    """Entrada nova em users.recent_moods (ver recent_moods.push_filter)"""
+    for _ in range(recent_moods.PUSH_ATTEMPTS):
+        result = await db.users.update_one(recent_moods.push_filter(doc["user_id"]), recent_moods.push_update(doc))
+        if result.matched_count:
+            return
+        result = await db.users.update_one(recent_moods.push_filter(doc["user_id"], present=False),
+                                           recent_moods.VERSION_BUMP)
+        if result.matched_count:
+            return
+
+async def _publish_mood_event(op: str, mood: Optional[Dict[str, Any]]):
+    """Entrada gravada -> mood_events (só com MOOD_STORE=timeseries, ver models.MOOD_EVENTS)"""
+    if MOOD_STORE != "timeseries" or not mood:
+        return
+    try:
+        await db[MOOD_EVENTS].insert_one({"op": op, "mood": mood, "created_at": datetime.utcnow()})
+    except Exception as e:
+        logger.warning(f"Evento do feed não registrado para a entrada {mood.get('_id')}: {e}")
+
+async def _apply_to_mood(oid: ObjectId, operation):
+    """
+    Aplicar update_one/delete_one nas coleções de gravação; devolve o resultado da coleção de leitura.
+    Em modo dual, mood_entries (a coleção de leitura) vem primeiro e uma falha na time-series só é
+    registrada no log: o verify --fix de tools/migrate_timeseries.py refaz a cópia depois.
+    """
+    primary = None
+    for collection in sorted(_mood_write_targets(), key=lambda collection: collection.name != _moods().name):
+        try:
+            result = await operation(collection, _mood_id_filter(collection, oid))
+            if _is_timeseries(collection) and not (getattr(result, "matched_count", 0) or getattr(result, "deleted_count", 0)):
+                result = await operation(collection, {"_id": oid})
+        except Exception as e:
+            if collection.name == _moods().name:
+                raise
+            logger.warning(f"Time-series não atualizada para a entrada {oid} (rode migrate_timeseries.py verify --fix): {e}")
+            continue
+        if collection.name == _moods().name:
+            primary = result
+    return primary
+
+def _mood_to_json(entry: Dict[str, Any]) -> Dict[str, Any]:
+    if "date" not in entry and entry.get("created_at"):
+        entry["date"] = entry["created_at"].strftime("%Y-%m-%d")
+    entry["_id"] = str(entry["_id"])
+    entry["user_id"] = str(entry["user_id"])
+    if entry.get("song_id"):
+        entry["song_id"] = str(entry["song_id"])
+    else:
+        entry["song_id"] = None
+    if entry.get("song"):
+        entry["song"]["_id"] = entry["song_id"]
+    else:
+        entry.pop("song", None)
+    return entry
+
+# Usuários
+
+async def create_user(username: str, email: str, password_hash: str, user_type: str = "patient", **extra_fields) -> Dict[str, Any]:
+    """Criar usuário com tipo (professional/patient)"""
+    try:
+        if await db.users.find_one({"email": email}, {"_id": 1}):
+            return {"error": "E-mail já utilizado"}
+
+        if user_type not in ["professional", "patient"]:
+            return {"error": "Tipo de usuário inválido"}
+
+        now = datetime.utcnow()
+        user_doc = {
+            "username": username,
+            "email": email,
+            "password_hash": password_hash,
+            "user_type": user_type,
+            "active": True,
+            "created_at": now,
+            "updated_at": now,
+            "recent_moods": [],
+            "moods_version": 0
+        }
+
+        if user_type == "professional":
+            user_doc.update({
+                "crp": extra_fields.get("crp", ""),
+                "specialization": extra_fields.get("specialization", ""),
+                "clinic_name": extra_fields.get("clinic_name", ""),
+                "patients": []
+            })
+        else:
+            user_doc.update({
+                "age": extra_fields.get("age"),
+                "gender": extra_fields.get("gender"),
+                "linked_professional": None
+            })
+
+        result = await db.users.insert_one(user_doc)
+
+        return {
+            "success": True,
+            "user_id": str(result.inserted_id),
+            "user_type": user_type,
+            "message": "Usuário criado com sucesso!"
+        }
+
+    except Exception as e:
+        return {"error": f"Erro ao criar usuário: {str(e)}"}
+
+async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
+    """Buscar usuário por ID com tratamento de erro"""
+    try:
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, recent_moods.USER_PROJECTION)
+        if user:
+            user["_id"] = str(user["_id"])
+        return user
+    except Exception as e:
+        logger.error(f"Erro ao buscar usuário: {e}")
+        return None
+
+async def update_user(user_id: str, **fields) -> Dict[str, Any]:
+    """Atualizar usuário"""
+    try:
+        fields["updated_at"] = datetime.utcnow()
+        res = await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": fields})
+
+        if res.modified_count > 0:
+            return {"success": True, "message": "Usuário atualizado!"}
+        else:
+            return {"error": "Usuário não encontrado ou nenhum campo alterado"}
+
+    except Exception as e:
+        return {"error": f"Erro ao atualizar usuário: {str(e)}"}
+
+async def delete_user(user_id: str) -> Dict[str, Any]:
+    """Deletar usuário"""
+    try:
+        res = await db.users.delete_one({"_id": ObjectId(user_id)})
+
+        if res.deleted_count > 0:
+            return {"success": True, "message": "Usuário deletado!"}
+        else:
+            return {"error": "Usuário não encontrado"}
+
+    except Exception as e:
+        return {"error": f"Erro ao deletar usuário: {str(e)}"}
+
+async def list_all_users() -> List[Dict[str, Any]]:
+    """Listar todos os usuários"""
+    try:
+        users = []
+        async for user in db.users.find({}, {"password_hash": 0, **recent_moods.USER_PROJECTION}):
+            user["_id"] = str(user["_id"])
+            users.append(user)
+        return users
+    except Exception as e:
+        logger.error(f"Erro ao listar usuários: {e}")
+        return []
+
+# Músicas
+
+async def create_song(title: str, artist: str, spotify_url: str, user_id: str = None, genres: List[str] = None) -> Dict[str, Any]:
+    """Criar música"""
+    try:
+        if len(title) < 1:
+            return {"error": "Título é obrigatório"}
+
+        if len(artist) < 1:
+            return {"error": "Artista é obrigatório"}
+
+        if await db.songs.find_one({"title": title, "artist": artist}, {"_id": 1}):
+            return {"error": "Música já cadastrada"}
+
+        now = datetime.utcnow()
+        doc = {
+            "title": title,
+            "artist": artist,
+            "spotify_url": spotify_url,
+            "user_id": ObjectId(user_id) if user_id else None,
+            "genres": genres or [],
+            "play_count": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        result = await db.songs.insert_one(doc)
+        return {
+            "success": True,
+            "song_id": str(result.inserted_id),
+            "message": "Música criada com sucesso!"
+        }
+
+    except Exception as e:
+        return {"error": f"Erro ao criar música: {str(e)}"}
+
+async def get_song(song_id: str) -> Optional[Dict[str, Any]]:
+    """Buscar música por ID"""
+    try:
+        song = await db.songs.find_one({"_id": ObjectId(song_id)})
+        if song:
+            song["_id"] = str(song["_id"])
+        return song
+    except Exception as e:
+        logger.error(f"Erro ao buscar música: {e}")
+        return None
+
+async def list_songs(user_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """Listar músicas (do usuário e globais, se user_id for informado)"""
+    try:
+        if user_id:
+            filter_query = {"$or": [{"user_id": ObjectId(user_id)}, {"user_id": None}]}
+        else:
+            filter_query = {}
+
+        songs = []
+        async for song in db.songs.find(filter_query).limit(limit):
+            song["_id"] = str(song["_id"])
+            songs.append(song)
+        return songs
+    except Exception as e:
+        logger.error(f"Erro ao listar músicas: {e}")
+        return []
+
+async def update_song(song_id: str, **fields) -> Dict[str, Any]:
+    """Atualizar música"""
+    try:
+        fields["updated_at"] = datetime.utcnow()
+        res = await db.songs.update_one({"_id": ObjectId(song_id)}, {"$set": fields})
+
+        if res.modified_count > 0:
+            # As cópias nas entradas de humor são refeitas pela thread do app-main
+            if fields.keys() & song_fanout.SNAPSHOT_FIELDS:
+                await db[song_fanout.JOBS].update_one({"_id": ObjectId(song_id)}, song_fanout.job_update(), upsert=True)
+            return {"success": True, "message": "Música atualizada!"}
+        else:
+            return {"error": "Música não encontrada"}
+
+    except Exception as e:
+        return {"error": f"Erro ao atualizar música: {str(e)}"}
+
+async def delete_song(song_id: str) -> Dict[str, Any]:
+    """Deletar música"""
+    try:
+        res = await db.songs.delete_one({"_id": ObjectId(song_id)})
+
+        if res.deleted_count > 0:
+            await db[song_fanout.JOBS].update_one({"_id": ObjectId(song_id)}, song_fanout.job_update(), upsert=True)
+            return {"success": True, "message": "Música deletada!"}
+        else:
+            return {"error": "Música não encontrada"}
+
+    except Exception as e:
+        return {"error": f"Erro ao deletar música: {str(e)}"}
+
+# Entradas de humor
+
+async def create_mood_entry(user_id: str, emoji: str, song_id: str = None, comment: str = "") -> Dict[str, Any]:
+    """Criar entrada de humor"""
+    try:
+        if not user_id or not emoji:
+            return {"error": "user_id e emoji são obrigatórios"}
+
+        # Usuário e música são verificados ao mesmo tempo
+        user_exists, song = await asyncio.gather(
+            db.users.find_one({"_id": ObjectId(user_id)}, {"_id": 1}),
+            db.songs.find_one({"_id": ObjectId(song_id)}, song_fanout.SNAPSHOT_PROJECTION) if song_id else asyncio.sleep(0, result=True)
+        )
+        if not user_exists:
+            return {"error": "Usuário não encontrado"}
+        if not song:
+            return {"error": "Música não encontrada"}
+
+        now = datetime.utcnow()
+        doc = {
+            "_id": ObjectId(),
+            "user_id": ObjectId(user_id),
+            "emoji": emoji,
+            "comment": comment,
+            "date": now.strftime("%Y-%m-%d"),
+            "created_at": now,
+            "updated_at": now
+        }
+
+        if song_id:
+            doc["song_id"] = ObjectId(song_id)
+            doc["song"] = song_fanout.snapshot(song)
+
+        async def insert_entry():
+            # Em sequência: a time-series antes de mood_entries (ver tools/migrate_timeseries.py)
+            for collection in _mood_write_targets():
+                if _is_timeseries(collection):
+                    await collection.insert_one({key: value for key, value in doc.items() if key != "date"})
+                else:
+                    await collection.insert_one(doc)
+            await _push_recent_mood(doc)
+            await _publish_mood_event("insert", doc)
+
+        if song_id:
+            await asyncio.gather(
+                insert_entry(),
+                db.songs.update_one({"_id": ObjectId(song_id)}, {"$inc": {"play_count": 1}})
+            )
+        else:
+            await insert_entry()
+
+        return {
+            "success": True,
+            "mood_id": str(doc["_id"]),
+            "message": "Humor registrado com sucesso!"
+        }
+
+    except Exception as e:
+        return {"error": f"Erro ao criar entrada de humor: {str(e)}"}
+
+async def get_mood_entry(mood_id: str) -> Optional[Dict[str, Any]]:
+    """Buscar entrada de mood por ID"""
+    try:
+        oid = ObjectId(mood_id)
+        collection = _moods()
+        mood = await collection.find_one(_mood_id_filter(collection, oid))
+        if mood is None and _is_timeseries(collection):
+            mood = await collection.find_one({"_id": oid})
+        return _mood_to_json(mood) if mood else None
+    except Exception as e:
+        logger.error(f"Erro ao buscar mood: {e}")
+        return None
+
+async def _latest_moods(uid: ObjectId, limit: int):
+    """Entradas mais recentes do usuário e o usuário; limite pequeno lê a lista embutida (ver recent_moods.py)"""
+    user = None
+    if 0 < limit <= RECENT_MOODS_SIZE:
+        user = await db.users.find_one({"_id": uid}, {"username": 1, "recent_moods": {"$slice": limit}, "moods_version": 1})
+        if user and "recent_moods" in user:
+            return user, user["recent_moods"]
+
+    fetch = max(limit, RECENT_MOODS_SIZE) if user else limit
+    raw = await _moods().find({"user_id": uid}).sort("created_at", -1).limit(fetch).to_list(None)
+    if user:
+        await db.users.update_one(
+            recent_moods.rebuild_filter(uid, user.get("moods_version")),
+            {"$set": {"recent_moods": raw[:RECENT_MOODS_SIZE]}}
+        )
+    return user, raw[:limit]
+
+async def _fill_song_snapshots(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Entradas anteriores à cópia da música: uma única consulta $in em songs"""
+    missing = {entry["song_id"] for entry in entries if entry.get("song_id") and "song" not in entry}
+    if missing:
+        cursor = db.songs.find({"_id": {"$in": list(missing)}}, song_fanout.SNAPSHOT_PROJECTION)
+        songs = {song["_id"]: song async for song in cursor}
+        for entry in entries:
+            if entry.get("song_id") and "song" not in entry:
+                entry["song"] = song_fanout.snapshot(songs.get(entry["song_id"]))
+    return entries
+
+async def list_mood_entries(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Listar entradas de humor de um usuário"""
+    try:
+        _, raw = await _latest_moods(ObjectId(user_id), limit)
+        return [_mood_to_json(entry) for entry in raw]
+    except Exception as e:
+        logger.error(f"Erro ao listar entradas de humor: {e}")
+        return []
+
+async def get_mood_entries_with_songs(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Buscar entradas de humor com informações das músicas (cópia gravada na entrada, sem JOIN)"""
+    try:
+        uid = ObjectId(user_id)
+        user, raw = await _latest_moods(uid, limit)
+        if user is None:
+            user = await db.users.find_one({"_id": uid}, {"username": 1})
+
+        results = []
+        for entry in await _fill_song_snapshots(raw):
+            _mood_to_json(entry)
+            if user:
+                entry["user"] = {"username": user["username"]}
+            results.append(entry)
+
+        return results
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar entradas com músicas: {e}")
+        return []
+
+async def _find_mood(oid: ObjectId, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    collection = _moods()
+    mood = await collection.find_one(_mood_id_filter(collection, oid), projection)
+    if mood is None and _is_timeseries(collection):
+        mood = await collection.find_one({"_id": oid}, projection)
+    return mood
+
+async def _mood_owner(oid: ObjectId) -> Optional[ObjectId]:
+    mood = await _find_mood(oid, {"user_id": 1})
+    return mood["user_id"] if mood else None
+
+async def update_mood_entry(entry_id: str, **fields) -> Dict[str, Any]:
+    """Atualizar humor"""
+    try:
+        oid = ObjectId(entry_id)
+        fields["updated_at"] = datetime.utcnow()
+        if "song_id" in fields:
+            # Troca de música: a cópia gravada na entrada (e na lista embutida) acompanha o novo song_id
+            song = None
+            if fields["song_id"]:
+                song = await db.songs.find_one({"_id": ObjectId(fields["song_id"])}, song_fanout.SNAPSHOT_PROJECTION)
+                if not song:
+                    return {"error": "Música não encontrada"}
+            fields["song_id"] = song["_id"] if song else None
+            fields["song"] = song_fanout.snapshot(song)
+        owner = await _mood_owner(oid)
+        res = await _apply_to_mood(
+            oid,
+            lambda collection, query: collection.update_one(query, {"$set": fields})
+        )
+
+        if res.modified_count > 0:
+            if owner:
+                await db.users.update_one({"_id": owner}, recent_moods.edit_update(oid, fields))
+            if MOOD_STORE == "timeseries":
+                await _publish_mood_event("update", await _find_mood(oid))
+            return {"success": True, "message": "Entrada atualizada!"}
+        else:
+            return {"error": "Entrada não encontrada"}
+
+    except Exception as e:
+        return {"error": f"Erro ao atualizar entrada: {str(e)}"}
+
+async def delete_mood_entry(entry_id: str) -> Dict[str, Any]:
+    """Deletar humor"""
+    try:
+        oid = ObjectId(entry_id)
+        owner = await _mood_owner(oid)
+        res = await _apply_to_mood(oid, lambda collection, query: collection.delete_one(query))
+
+        if res.deleted_count > 0:
+            if owner:
+                await db.users.update_one({"_id": owner}, recent_moods.remove_update(oid))
+            return {"success": True, "message": "Entrada deletada!"}
+        else:
+            return {"error": "Entrada não encontrada"}
+
+    except Exception as e:
+        return {"error": f"Erro ao deletar entrada: {str(e)}"}
+
+# Estatísticas
+
+async def get_user_mood_stats(user_id: str, days: int = 30) -> Dict[str, Any]:
+    """Estatísticas de humor do usuário"""
+    try:
+        start_date = datetime.utcnow() - timedelta(days=days)
+
+        pipeline = [
+            {"$match": {
+                "user_id": ObjectId(user_id),
+                "created_at": {"$gte": start_date}
+            }},
+            {"$group": {
+                "_id": "$emoji",
+                "count": {"$sum": 1}
+            }},
+            {"$sort": {"count": -1}}
+        ]
+
+        # Distribuição do período e total geral em paralelo
+        mood_distribution, total_all_time = await asyncio.gather(
+            _moods().aggregate(pipeline).to_list(length=None),
+            _moods().count_documents({"user_id": ObjectId(user_id)})
+        )
+        total_entries = sum(item["count"] for item in mood_distribution)
+
+        return {
+            "user_id": user_id,
+            "period_days": days,
+            "total_entries_period": total_entries,
+            "total_entries_all_time": total_all_time,
+            "mood_distribution": mood_distribution,
+            "most_common_mood": mood_distribution[0]["_id"] if mood_distribution else None,
+            "generated_at": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        return {"error": f"Erro ao gerar estatísticas: {str(e)}"}
+
+# Busca em lote por _id (ver batch_fetch.py)
+
+USER_BATCH_PROJECTION = {"password_hash": 0, **recent_moods.USER_PROJECTION}
+USER_HIDDEN_FIELDS = ("password_hash", *recent_moods.USER_PROJECTION)
+MOOD_REQUIRED_FIELDS = ("user_id", "song_id", "created_at")
+
+async def get_users_by_ids(user_ids: List[str], fields: List[str] = None) -> List[Optional[Dict[str, Any]]]:
+    """Usuários na ordem dos ids (None para os não encontrados), sem a senha"""
+    try:
+        parsed = batch_fetch.parse_ids(user_ids)
+        project = batch_fetch.projection(fields, USER_BATCH_PROJECTION, forbidden=USER_HIDDEN_FIELDS)
+        found = {}
+        if parsed:
+            async for user in db.users.find({"_id": {"$in": list(parsed.values())}}, project):
+                found[user["_id"]] = user
+                user["_id"] = str(user["_id"])
+        return batch_fetch.in_request_order(user_ids, parsed, found)
+    except Exception as e:
+        logger.error(f"Erro ao buscar usuários em lote: {e}")
+        # Propagar: falha no banco não pode virar "não encontrado" (a rota responde 500)
+        raise
+
+async def get_songs_by_ids(song_ids: List[str], fields: List[str] = None) -> List[Optional[Dict[str, Any]]]:
+    """Músicas na ordem dos ids (None para as não encontradas)"""
+    try:
+        parsed = batch_fetch.parse_ids(song_ids)
+        found = {}
+        if parsed:
+            async for song in db.songs.find({"_id": {"$in": list(parsed.values())}}, batch_fetch.projection(fields)):
+                found[song["_id"]] = song
+                song["_id"] = str(song["_id"])
+        return batch_fetch.in_request_order(song_ids, parsed, found)
+    except Exception as e:
+        logger.error(f"Erro ao buscar músicas em lote: {e}")
+        # Propagar: falha no banco não pode virar "não encontrado" (a rota responde 500)
+        raise
+
+async def get_mood_entries_by_ids(mood_ids: List[str], fields: List[str] = None) -> List[Optional[Dict[str, Any]]]:
+    """Entradas de humor na ordem dos ids (None para as não encontradas)"""
+    try:
+        parsed = batch_fetch.parse_ids(mood_ids)
+        project = batch_fetch.projection(fields, required=MOOD_REQUIRED_FIELDS)
+        collection = _moods()
+        found = {}
+        if parsed:
+            oids = list(parsed.values())
+            found = {mood["_id"]: mood async for mood in collection.find(_mood_ids_filter(collection, oids), project)}
+            missing = [oid for oid in oids if oid not in found]
+            if missing and _is_timeseries(collection):
+                async for mood in collection.find({"_id": {"$in": missing}}, project):
+                    found[mood["_id"]] = mood
+            for mood in found.values():
+                _mood_to_json(mood)
+        return batch_fetch.in_request_order(mood_ids, parsed, found)
+    except Exception as e:
+        logger.error(f"Erro ao buscar moods em lote: {e}")
+        # Propagar: falha no banco não pode virar "não encontrado" (a rota responde 500)
+        raise
@@ -0,0 +1,64 @@
+"""
+Busca em lote por _id: GET /users?ids=, /songs?ids=, /moods?ids= e os POST /<coleção>/batch.
+
+Os ids pedidos viram uma única consulta $in (com projeção) e os documentos
+voltam na ordem do pedido, com null no lugar de cada id não encontrado:
+
+    GET /songs?ids=a,b,c&fields=title,artist
+    {"songs": [{...}, null, {...}], "missing": ["b"], "total": 2}
+
+Usado por models.py e async_models.py; os helpers daqui não acessam o banco.
+"""
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+# Teto de ids por pedido (o GET fica limitado também pelo tamanho da URL; listas longas vão no POST)
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 500))
+
+def split_param(value: Optional[str]) -> List[str]:
+    """"a, b,,c" -> ["a", "b", "c"]"""
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+def validate_ids(ids) -> Optional[str]:
+    """Mensagem de erro (400) para uma lista de ids inválida, ou None"""
+    if not isinstance(ids, list) or not ids:
+        return "Informe os ids (ids=a,b,c ou {\"ids\": [...]})"
+    if not all(isinstance(item, str) for item in ids):
+        return "Os ids devem ser strings"
+    if len(ids) > BATCH_MAX_IDS:
+        return f"Máximo de {BATCH_MAX_IDS} ids por pedido"
+    return None
+
+def parse_ids(ids: Iterable[str]) -> Dict[str, ObjectId]:
+    """Ids válidos e distintos -> ObjectId (ids inválidos ficam de fora e contam como não encontrados)"""
+    parsed = {}
+    for raw in ids:
+        if raw not in parsed and ObjectId.is_valid(raw):
+            parsed[raw] = ObjectId(raw)
+    return parsed
+
+def projection(fields: Optional[List[str]], default: Optional[Dict[str, int]] = None,
+               required: Tuple[str, ...] = (), forbidden: Tuple[str, ...] = ()) -> Optional[Dict[str, int]]:
+    """
+    Projeção de inclusão com os campos pedidos (mais os obrigatórios e sem os proibidos),
+    ou a projeção padrão da coleção quando nenhum campo é pedido.
+    """
+    fields = [field for field in fields or [] if field not in forbidden and not field.startswith("$")]
+    if not fields:
+        return default
+    return {field: 1 for field in (*fields, *required)}
+
+def in_request_order(ids: List[str], parsed: Dict[str, ObjectId],
+                     found: Dict[ObjectId, Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """Um resultado por id pedido (repetidos inclusive), None para os não encontrados"""
+    return [found.get(parsed[raw]) if raw in parsed else None for raw in ids]
+
+def response(name: str, ids: List[str], results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Corpo da resposta: resultados na ordem do pedido e os ids não encontrados"""
+    return {
+        name: results,
+        "missing": [raw for raw, result in zip(ids, results) if result is None],
+        "total": sum(1 for result in results if result is not None)
+    }
@@ -1,15 +1,225 @@
-from datetime import datetime
+import logging
+import os
+import random
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
 from typing import Optional, Dict, Any, List
 
+import batch_fetch
+import recent_moods
+import song_fanout
+from moodtracker_common.loader import BatchLoader
+from recent_moods import RECENT_MOODS_SIZE
+
+logger = logging.getLogger(__name__)
+
 # Variável global para receber instância do db
 db = None
 
+# Onde ficam as entradas de humor (migração para time-series, ver tools/migrate_timeseries.py):
+#   legacy     - só a coleção mood_entries
+#   dual       - grava nas duas e lê de mood_entries, comparando uma amostra das leituras com a time-series
+#   timeseries - só a coleção time-series
+MOOD_STORE = os.getenv("MOOD_STORE", "legacy")
+MOODS_TIMESERIES = "mood_entries_ts"
+SHADOW_READ_RATE = float(os.getenv("MOOD_SHADOW_READ_RATE", 0.05))
+# A time-series não indexa _id: a busca é limitada ao redor do timestamp do ObjectId
+ID_TIME_WINDOW = timedelta(minutes=5)
+# update/delete por _id e update_many em campos fora do metaField de uma time-series
+TIMESERIES_MIN_SERVER = (8, 0)
+# Change streams não funcionam em time-series: com MOOD_STORE=timeseries cada gravação
+# também vai para esta coleção, que alimenta o feed SSE do report-service (ver live_feed.py)
+MOOD_EVENTS = "mood_events"
+MOOD_EVENTS_TTL = int(os.getenv("MOOD_EVENTS_TTL", 86400))
+
+# Buscas por _id em lote, compartilhadas entre requisições concorrentes (ver loader.py)
+song_loader = BatchLoader(lambda ids: {
+    song["_id"]: song for song in db.songs.find({"_id": {"$in": ids}}, song_fanout.SNAPSHOT_PROJECTION)
+})
+username_loader = BatchLoader(lambda ids: {
+    user["_id"]: user.get("username") for user in db.users.find({"_id": {"$in": ids}}, {"username": 1})
+})
+
 def init_db(database_instance):
     """Inicializar a conexão do banco no models"""
     global db
     db = database_instance
-    print("✅ Models inicializado com sucesso!")
+    logger.info("Models inicializado com sucesso!")
+
+def ensure_indexes():
+    """Criar os índices das consultas da API (idempotente, roda no aquecimento)"""
+    db.users.create_index("email")
+    # Listagem de pacientes/profissionais e pacientes vinculados (report-service)
+    db.users.create_index([("user_type", ASCENDING), ("linked_professional", ASCENDING)])
+    # Fan-out das cópias das músicas em recent_moods
+    db.users.create_index("recent_moods.song_id")
+    db.songs.create_index([("title", ASCENDING), ("artist", ASCENDING)])
+    db.songs.create_index("user_id")
+    if MOOD_STORE != "timeseries":
+        # A time-series tem os seus criados por tools/migrate_timeseries.py
+        db.mood_entries.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+        # Fan-out das cópias das músicas (ver song_fanout.py)
+        db.mood_entries.create_index("song_id")
+    else:
+        db[MOOD_EVENTS].create_index("created_at", expireAfterSeconds=MOOD_EVENTS_TTL)
+    db[song_fanout.JOBS].create_index("requested_at")
+
+def server_version(database) -> tuple:
+    return tuple(int(part) for part in database.client.server_info()["version"].split(".")[:2])
+
+def check_mood_store():
+    """Recusar MOOD_STORE=timeseries em servidor que não edita nem apaga entradas da time-series"""
+    if MOOD_STORE != "timeseries":
+        return
+    version = server_version(db)
+    if version < TIMESERIES_MIN_SERVER:
+        message = (f"MOOD_STORE=timeseries exige MongoDB {'.'.join(map(str, TIMESERIES_MIN_SERVER))} "
+                   f"(servidor {'.'.join(map(str, version))}); mantenha MOOD_STORE=dual")
+        logger.error(message)
+        raise RuntimeError(message)
+
+def _moods():
+    """Coleção de onde as entradas de humor são lidas"""
+    return db[MOODS_TIMESERIES] if MOOD_STORE == "timeseries" else db.mood_entries
+
+def _mood_write_targets():
+    """Coleções que recebem as inserções (a time-series sempre primeiro; update/delete em _apply_to_mood)"""
+    if MOOD_STORE == "timeseries":
+        return [db[MOODS_TIMESERIES]]
+    if MOOD_STORE == "dual":
+        return [db[MOODS_TIMESERIES], db.mood_entries]
+    return [db.mood_entries]
+
+def _is_timeseries(collection) -> bool:
+    return collection.name == MOODS_TIMESERIES
+
+def _mood_id_filter(collection, oid: ObjectId) -> Dict[str, Any]:
+    if not _is_timeseries(collection):
+        return {"_id": oid}
+    created = oid.generation_time.replace(tzinfo=None)
+    return {"_id": oid, "created_at": {"$gte": created - ID_TIME_WINDOW, "$lte": created + ID_TIME_WINDOW}}
+
+def _mood_ids_filter(collection, oids: List[ObjectId]) -> Dict[str, Any]:
+    if not _is_timeseries(collection):
+        return {"_id": {"$in": oids}}
+    return {"$or": [_mood_id_filter(collection, oid) for oid in oids]}
+
+def _find_mood(collection, oid: ObjectId) -> Optional[Dict[str, Any]]:
+    mood = collection.find_one(_mood_id_filter(collection, oid))
+    if mood is None and _is_timeseries(collection):
+        # Entradas importadas podem ter created_at longe do timestamp do _id
+        mood = collection.find_one({"_id": oid})
+    return mood
+
+def _apply_to_mood(oid: ObjectId, operation):
+    """
+    Aplicar update_one/delete_one em todas as coleções de gravação.
+    Devolve o resultado da coleção de leitura.
+
+    Em modo dual, mood_entries (a coleção de leitura) vem primeiro: antes do
+    MongoDB 8.0 a time-series não aceita update/delete por _id, e a falha só é
+    registrada no log. O verify --fix de tools/migrate_timeseries.py refaz a
+    cópia do usuário depois. O modo timeseries não sobe nessas versões
+    (check_mood_store).
+    """
+    primary = None
+    for collection in sorted(_mood_write_targets(), key=lambda collection: collection.name != _moods().name):
+        try:
+            result = operation(collection, _mood_id_filter(collection, oid))
+            if _is_timeseries(collection) and not (getattr(result, "matched_count", 0) or getattr(result, "deleted_count", 0)):
+                result = operation(collection, {"_id": oid})
+        except Exception as e:
+            if collection.name == _moods().name:
+                raise
+            logger.warning(f"Time-series não atualizada para a entrada {oid} (rode migrate_timeseries.py verify --fix): {e}")
+            continue
+        if collection.name == _moods().name:
+            primary = result
+    return primary
+
+def _push_recent_mood(doc: Dict[str, Any]):
+    """Entrada nova em users.recent_moods (ver recent_moods.push_filter)"""
+    for _ in range(recent_moods.PUSH_ATTEMPTS):
+        if db.users.update_one(recent_moods.push_filter(doc["user_id"]), recent_moods.push_update(doc)).matched_count:
+            return
+        if db.users.update_one(recent_moods.push_filter(doc["user_id"], present=False),
+                               recent_moods.VERSION_BUMP).matched_count:
+            return
+
+def _publish_mood_event(op: str, mood: Optional[Dict[str, Any]]):
+    """Entrada gravada -> mood_events (só com MOOD_STORE=timeseries, ver MOOD_EVENTS)"""
+    if MOOD_STORE != "timeseries" or not mood:
+        return
+    try:
+        db[MOOD_EVENTS].insert_one({"op": op, "mood": mood, "created_at": datetime.utcnow()})
+    except Exception as e:
+        logger.warning(f"Evento do feed não registrado para a entrada {mood.get('_id')}: {e}")
+
+def _with_date(entry: Dict[str, Any]) -> Dict[str, Any]:
+    # A time-series não guarda o campo "date" (derivado de created_at)
+    if "date" not in entry and entry.get("created_at"):
+        entry["date"] = entry["created_at"].strftime("%Y-%m-%d")
+    return entry
+
+def _mood_to_json(entry: Dict[str, Any]) -> Dict[str, Any]:
+    _with_date(entry)
+    entry["_id"] = str(entry["_id"])
+    entry["user_id"] = str(entry["user_id"])
+    # Só converter song_id se existir
+    if entry.get("song_id"):
+        entry["song_id"] = str(entry["song_id"])
+    else:
+        entry["song_id"] = None
+    # Cópia da música (ver song_fanout.py); null quando a música foi apagada
+    if entry.get("song"):
+        entry["song"]["_id"] = entry["song_id"]
+    else:
+        entry.pop("song", None)
+    return entry
+
+def _fill_song_snapshots(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Entradas anteriores à cópia da música: músicas distintas buscadas em lote"""
+    missing = {entry["song_id"] for entry in entries if entry.get("song_id") and "song" not in entry}
+    if missing:
+        songs = song_loader.load_many(missing)
+        for entry in entries:
+            if entry.get("song_id") and "song" not in entry:
+                entry["song"] = song_fanout.snapshot(songs.get(entry["song_id"]))
+    return entries
+
+def _latest_moods(uid: ObjectId, limit: int):
+    """
+    Entradas mais recentes do usuário (documentos do banco) e o usuário.
+    Limite pequeno: uma leitura do usuário pela chave primária (ver recent_moods.py).
+    """
+    user = None
+    if 0 < limit <= RECENT_MOODS_SIZE:
+        user = db.users.find_one({"_id": uid}, {"username": 1, "recent_moods": {"$slice": limit}, "moods_version": 1})
+        if user and "recent_moods" in user:
+            return user, user["recent_moods"]
+
+    fetch = max(limit, RECENT_MOODS_SIZE) if user else limit
+    raw = list(_moods().find({"user_id": uid}).sort("created_at", -1).limit(fetch))
+    if user:
+        # Reconstruir a lista embutida (ignorado se houve gravação nesse meio-tempo)
+        db.users.update_one(
+            recent_moods.rebuild_filter(uid, user.get("moods_version")),
+            {"$set": {"recent_moods": raw[:RECENT_MOODS_SIZE]}}
+        )
+    return user, raw[:limit]
+
+def _shadow_read(name: str, legacy_result, read_timeseries):
+    """No modo dual, comparar uma amostra das leituras com a time-series"""
+    if MOOD_STORE != "dual" or random.random() >= SHADOW_READ_RATE:
+        return
+    try:
+        timeseries_result = read_timeseries()
+        if timeseries_result != legacy_result:
+            logger.warning(f"Leitura dual divergente em {name}",
+                           extra={"fields": {"legacy": legacy_result, "timeseries": timeseries_result}})
+    except Exception as e:
+        logger.warning(f"Erro na leitura dual de {name}: {e}")
 
 # USsuarios
 
@@ -34,7 +244,10 @@ def create_user(username: str, email: str, password_hash: str, user_type: str =
             "user_type": user_type,  # ← CAMPO PRINCIPAL
             "active": True,
             "created_at": now,
-            "updated_at": now
+            "updated_at": now,
+            # Usuário novo: lista de humores recentes já completa (vazia)
+            "recent_moods": [],
+            "moods_version": 0
         }
 
         # Adicionar campos específicos baseado no tipo
@@ -69,24 +282,24 @@ def create_user(username: str, email: str, password_hash: str, user_type: str =
 def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """Buscar usuário por ID com tratamento de erro"""
     try:
-        user = db.users.find_one({"_id": ObjectId(user_id)})
+        user = db.users.find_one({"_id": ObjectId(user_id)}, recent_moods.USER_PROJECTION)
         if user:
             user["_id"] = str(user["_id"])  # Converter Id para string
         return user
     except Exception as e:
-        print(f"Erro ao buscar usuário: {e}")
+        logger.error(f"Erro ao buscar usuário: {e}")
         return None
 
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     """Buscar usuário por email"""
     try:
-        user = db.users.find_one({"email": email})
+        user = db.users.find_one({"email": email}, recent_moods.USER_PROJECTION)
         if user:
             user["_id"] = str(user["_id"])
         return user
     except Exception as e:
-        print(f"Erro ao buscar usuário por email: {e}")
+        logger.error(f"Erro ao buscar usuário por email: {e}")
         return None
 
 def update_user(user_id: str, **fields) -> Dict[str, Any]:
@@ -176,7 +389,7 @@ def search_songs(query: str) -> List[Dict[str, Any]]:
             songs.append(song)
         return songs
     except Exception as e:
-        print(f"Erro ao buscar músicas: {e}")
+        logger.error(f"Erro ao buscar músicas: {e}")
         return []
 
 
@@ -190,6 +403,8 @@ def update_song(song_id: str, **fields) -> Dict[str, Any]:
         )
         
         if res.modified_count > 0:
+            if fields.keys() & song_fanout.SNAPSHOT_FIELDS:
+                song_fanout.request_refresh(db, ObjectId(song_id))
             return {"success": True, "message": "Música atualizada!"}
         else:
             return {"error": "Música não encontrada"}
@@ -204,6 +419,7 @@ def delete_song(song_id: str) -> Dict[str, Any]:
         res = db.songs.delete_one({"_id": ObjectId(song_id)})
         
         if res.deleted_count > 0:
+            song_fanout.request_refresh(db, ObjectId(song_id))
             return {"success": True, "message": "Música deletada!"}
         else:
             return {"error": "Música não encontrada"}
@@ -224,11 +440,13 @@ def create_mood_entry(user_id: str, emoji: str, song_id: str = None, comment: st
             return {"error": "Usuário não encontrado"}
         
         # Verificar música APENAS se fornecida
-        if song_id and not get_song(song_id):  # ← ADICIONAR song_id check
+        song = get_song(song_id) if song_id else None
+        if song_id and not song:  # ← ADICIONAR song_id check
             return {"error": "Música não encontrada"}
         
         now = datetime.utcnow()
         doc = {
+            "_id": ObjectId(),  # mesmo _id nas duas coleções durante a migração
             "user_id": ObjectId(user_id),
             "emoji": emoji,
             "comment": comment,
@@ -240,8 +458,15 @@ def create_mood_entry(user_id: str, emoji: str, song_id: str = None, comment: st
         # Adicionar song_id APENAS se fornecido
         if song_id:
             doc["song_id"] = ObjectId(song_id)
+            doc["song"] = song_fanout.snapshot(song)
         
-        result = db.mood_entries.insert_one(doc)
+        for collection in _mood_write_targets():
+            if _is_timeseries(collection):
+                collection.insert_one({key: value for key, value in doc.items() if key != "date"})
+            else:
+                collection.insert_one(doc)
+        _push_recent_mood(doc)
+        _publish_mood_event("insert", doc)
         
         # Incrementar contador APENAS se tiver música
         if song_id:
@@ -252,7 +477,7 @@ def create_mood_entry(user_id: str, emoji: str, song_id: str = None, comment: st
         
         return {
             "success": True,
-            "mood_id": str(result.inserted_id),
+            "mood_id": str(doc["_id"]),
             "message": "Humor registrado com sucesso!"
         }
         
@@ -261,73 +486,42 @@ def create_mood_entry(user_id: str, emoji: str, song_id: str = None, comment: st
 
 def list_mood_entries(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
     try:
-        entries = []
-        for entry in db.mood_entries.find({"user_id": ObjectId(user_id)}).sort("created_at", -1).limit(limit):
-            entry["_id"] = str(entry["_id"])
-            entry["user_id"] = str(entry["user_id"])
-            
-            # Só converter song_id se existir
-            if "song_id" in entry and entry["song_id"]:
-                entry["song_id"] = str(entry["song_id"])
-            else:
-                entry["song_id"] = None
-                
-            entries.append(entry)
+        uid = ObjectId(user_id)
+        _, raw = _latest_moods(uid, limit)
+        entries = [_mood_to_json(entry) for entry in raw]
+
+        _shadow_read(
+            "list_mood_entries",
+            [entry["_id"] for entry in entries],
+            lambda: [str(entry["_id"]) for entry in db[MOODS_TIMESERIES].find(
+                {"user_id": uid}, {"_id": 1}
+            ).sort("created_at", -1).limit(limit)]
+        )
         return entries
     except Exception as e:
-        print(f"Erro ao listar entradas de humor: {e}")
+        logger.error(f"Erro ao listar entradas de humor: {e}")
         return []
         
         
         
 def get_mood_entries_with_songs(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-    """Buscar entradas de humor com informações das músicas (JOIN)"""
+    """Buscar entradas de humor com informações das músicas (cópia gravada na entrada, sem JOIN)"""
     try:
-        pipeline = [
-            {"$match": {"user_id": ObjectId(user_id)}},
-            {"$sort": {"created_at": -1}},
-            {"$limit": limit},
-            {"$lookup": {
-                "from": "songs",
-                "localField": "song_id",
-                "foreignField": "_id", 
-                "as": "song_info"
-            }},
-            {"$lookup": {
-                "from": "users",
-                "localField": "user_id",
-                "foreignField": "_id",
-                "as": "user_info"
-            }}
-        ]
-        
+        uid = ObjectId(user_id)
+        user, raw = _latest_moods(uid, limit)
+        username = user.get("username") if user else username_loader.load(uid)
+
         results = []
-        for entry in db.mood_entries.aggregate(pipeline):
-            entry["_id"] = str(entry["_id"])
-            entry["user_id"] = str(entry["user_id"])
-            if "song_id" in entry and entry["song_id"]:
-                 entry["song_id"] = str(entry["song_id"])
-            else:
-                  entry["song_id"] = None
-            
-            # Adicionar info da música e usuário
-            if entry["song_info"]:
-                entry["song"] = entry["song_info"][0]
-                entry["song"]["_id"] = str(entry["song"]["_id"])
-            
-            if entry["user_info"]:
-                entry["user"] = {"username": entry["user_info"][0]["username"]}
-            
-            # Limpar campos auxiliares
-            entry.pop("song_info", None)
-            entry.pop("user_info", None)
-            
+        for entry in _fill_song_snapshots(raw):
+            _mood_to_json(entry)
+            if username:
+                entry["user"] = {"username": username}
             results.append(entry)
         
         return results
         
     except Exception as e:
-        print(f"Erro ao buscar entradas com músicas: {e}")
+        logger.error(f"Erro ao buscar entradas com músicas: {e}")
         return []
         
 
@@ -335,8 +529,6 @@ def get_mood_entries_with_songs(user_id: str, limit: int = 10) -> List[Dict[str,
 def get_user_mood_stats(user_id: str, days: int = 30) -> Dict[str, Any]:
     """Estatísticas de humor do usuário"""
     try:
-        from datetime import timedelta
-        
         start_date = datetime.utcnow() - timedelta(days=days)
         
         # Pipeline de agregação para estatísticas
@@ -352,11 +544,16 @@ def get_user_mood_stats(user_id: str, days: int = 30) -> Dict[str, Any]:
             {"$sort": {"count": -1}}
         ]
         
-        mood_distribution = list(db.mood_entries.aggregate(pipeline))
+        mood_distribution = list(_moods().aggregate(pipeline))
         total_entries = sum(item["count"] for item in mood_distribution)
+        _shadow_read(
+            "get_user_mood_stats",
+            sorted((item["_id"], item["count"]) for item in mood_distribution),
+            lambda: sorted((item["_id"], item["count"]) for item in db[MOODS_TIMESERIES].aggregate(pipeline))
+        )
         
         # Estatísticas gerais
-        total_all_time = db.mood_entries.count_documents({"user_id": ObjectId(user_id)})
+        total_all_time = _moods().count_documents({"user_id": ObjectId(user_id)})
         
         return {
             "user_id": user_id,
@@ -375,13 +572,29 @@ def get_user_mood_stats(user_id: str, days: int = 30) -> Dict[str, Any]:
 def update_mood_entry(entry_id: str, **fields) -> Dict[str, Any]:
     """Atualizar humor"""
     try:
+        oid = ObjectId(entry_id)
         fields["updated_at"] = datetime.utcnow()
-        res = db.mood_entries.update_one(
-            {"_id": ObjectId(entry_id)},
-            {"$set": fields}
+        if "song_id" in fields:
+            # Troca de música: a cópia gravada na entrada (e na lista embutida) acompanha o novo song_id
+            song = None
+            if fields["song_id"]:
+                song = db.songs.find_one({"_id": ObjectId(fields["song_id"])}, song_fanout.SNAPSHOT_PROJECTION)
+                if not song:
+                    return {"error": "Música não encontrada"}
+            fields["song_id"] = song["_id"] if song else None
+            fields["song"] = song_fanout.snapshot(song)
+        # Dono da entrada, para manter a lista embutida em dia
+        mood = _find_mood(_moods(), oid)
+        res = _apply_to_mood(
+            oid,
+            lambda collection, query: collection.update_one(query, {"$set": fields})
         )
         
         if res.modified_count > 0:
+            if mood:
+                db.users.update_one({"_id": mood["user_id"]}, recent_moods.edit_update(oid, fields))
+            if MOOD_STORE == "timeseries":
+                _publish_mood_event("update", _find_mood(_moods(), oid))
             return {"success": True, "message": "Entrada atualizada!"}
         else:
             return {"error": "Entrada não encontrada"}
@@ -393,9 +606,14 @@ def update_mood_entry(entry_id: str, **fields) -> Dict[str, Any]:
 def delete_mood_entry(entry_id: str) -> Dict[str, Any]:
     """Deletar humor"""
     try:
-        res = db.mood_entries.delete_one({"_id": ObjectId(entry_id)})
+        oid = ObjectId(entry_id)
+        # Dono da entrada, para manter a lista embutida em dia
+        mood = _find_mood(_moods(), oid)
+        res = _apply_to_mood(oid, lambda collection, query: collection.delete_one(query))
         
         if res.deleted_count > 0:
+            if mood:
+                db.users.update_one({"_id": mood["user_id"]}, recent_moods.remove_update(oid))
             return {"success": True, "message": "Entrada deletada!"}
         else:
             return {"error": "Entrada não encontrada"}
@@ -412,7 +630,7 @@ def get_song(song_id: str) -> Optional[Dict[str, Any]]:
             song["_id"] = str(song["_id"])
         return song
     except Exception as e:
-        print(f"Erro ao buscar música: {e}")
+        logger.error(f"Erro ao buscar música: {e}")
         return None
 
 def list_songs(user_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
@@ -435,35 +653,89 @@ def list_songs(user_id: str = None, limit: int = 50) -> List[Dict[str, Any]]:
             songs.append(song)
         return songs
     except Exception as e:
-        print(f"Erro ao listar músicas: {e}")
+        logger.error(f"Erro ao listar músicas: {e}")
         return []
 
 def list_all_users() -> List[Dict[str, Any]]:
     """Listar todos os usuários"""
     try:
         users = []
-        for user in db.users.find():
+        for user in db.users.find({}, recent_moods.USER_PROJECTION):
             user["_id"] = str(user["_id"])
             user.pop('password_hash', None)  # Remover senha por segurança
             users.append(user)
         return users
     except Exception as e:
-        print(f"Erro ao listar usuários: {e}")
+        logger.error(f"Erro ao listar usuários: {e}")
         return []
 
 def get_mood_entry(mood_id: str) -> Optional[Dict[str, Any]]:
     """Buscar entrada de mood por ID"""
     try:
-        mood = db.mood_entries.find_one({"_id": ObjectId(mood_id)})
+        mood = _find_mood(_moods(), ObjectId(mood_id))
         if mood:
-            mood["_id"] = str(mood["_id"])
-            mood["user_id"] = str(mood["user_id"])
-            # Só converter se não for None
-            if mood.get("song_id"):
-                mood["song_id"] = str(mood["song_id"])
-            else:
-                mood["song_id"] = None
+            _mood_to_json(mood)
         return mood
     except Exception as e:
-        print(f"Erro ao buscar mood: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"Erro ao buscar mood: {e}")
+        return None
+
+# Busca em lote por _id (ver batch_fetch.py)
+
+USER_BATCH_PROJECTION = {"password_hash": 0, **recent_moods.USER_PROJECTION}
+USER_HIDDEN_FIELDS = ("password_hash", *recent_moods.USER_PROJECTION)
+# Campos usados por _mood_to_json
+MOOD_REQUIRED_FIELDS = ("user_id", "song_id", "created_at")
+
+def get_users_by_ids(user_ids: List[str], fields: List[str] = None) -> List[Optional[Dict[str, Any]]]:
+    """Usuários na ordem dos ids (None para os não encontrados), sem a senha"""
+    try:
+        parsed = batch_fetch.parse_ids(user_ids)
+        project = batch_fetch.projection(fields, USER_BATCH_PROJECTION, forbidden=USER_HIDDEN_FIELDS)
+        found = {}
+        if parsed:
+            for user in db.users.find({"_id": {"$in": list(parsed.values())}}, project):
+                found[user["_id"]] = user
+                user["_id"] = str(user["_id"])
+        return batch_fetch.in_request_order(user_ids, parsed, found)
+    except Exception as e:
+        logger.error(f"Erro ao buscar usuários em lote: {e}")
+        # Propagar: falha no banco não pode virar "não encontrado" (a rota responde 500)
+        raise
+
+def get_songs_by_ids(song_ids: List[str], fields: List[str] = None) -> List[Optional[Dict[str, Any]]]:
+    """Músicas na ordem dos ids (None para as não encontradas)"""
+    try:
+        parsed = batch_fetch.parse_ids(song_ids)
+        found = {}
+        if parsed:
+            for song in db.songs.find({"_id": {"$in": list(parsed.values())}}, batch_fetch.projection(fields)):
+                found[song["_id"]] = song
+                song["_id"] = str(song["_id"])
+        return batch_fetch.in_request_order(song_ids, parsed, found)
+    except Exception as e:
+        logger.error(f"Erro ao buscar músicas em lote: {e}")
+        # Propagar: falha no banco não pode virar "não encontrado" (a rota responde 500)
+        raise
+
+def get_mood_entries_by_ids(mood_ids: List[str], fields: List[str] = None) -> List[Optional[Dict[str, Any]]]:
+    """Entradas de humor na ordem dos ids (None para as não encontradas)"""
+    try:
+        parsed = batch_fetch.parse_ids(mood_ids)
+        project = batch_fetch.projection(fields, required=MOOD_REQUIRED_FIELDS)
+        collection = _moods()
+        found = {}
+        if parsed:
+            oids = list(parsed.values())
+            found = {mood["_id"]: mood for mood in collection.find(_mood_ids_filter(collection, oids), project)}
+            missing = [oid for oid in oids if oid not in found]
+            if missing and _is_timeseries(collection):
+                # Entradas importadas podem ter created_at longe do timestamp do _id
+                found.update((mood["_id"], mood) for mood in collection.find({"_id": {"$in": missing}}, project))
+            for mood in found.values():
+                _mood_to_json(mood)
+        return batch_fetch.in_request_order(mood_ids, parsed, found)
+    except Exception as e:
+        logger.error(f"Erro ao buscar moods em lote: {e}")
+        # Propagar: falha no banco não pode virar "não encontrado" (a rota responde 500)
+        raise
@@ -0,0 +1,86 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+# Últimas entradas de humor embutidas no documento do usuário (users.recent_moods),
+# usadas por models.py e async_models.py.
+#
+# Invariante: quando o campo existe, ele tem as min(N, total) entradas mais recentes
+# do usuário, da mais nova para a mais antiga. Sem o campo, a próxima leitura busca
+# na coleção de humores e reconstrói a lista.
+#
+# Toda gravação de humor incrementa users.moods_version; a reconstrução só é gravada
+# se a versão não mudou desde que foi lida (não sobrescreve gravações concorrentes).
+# A inserção é um $push com $sort/$slice filtrado pela presença da lista (push_filter);
+# edição e remoção são pipelines. Cada alteração no usuário é uma única operação atômica.
+# Valores gravados nos pipelines vão em $literal (um comentário "$100" não pode virar expressão).
+RECENT_MOODS_SIZE = int(os.getenv("RECENT_MOODS_SIZE", 20))
+
+# Campos internos que não saem nas respostas de usuário
+USER_PROJECTION = {"recent_moods": 0, "moods_version": 0}
+# Alterar estes campos muda o dono ou a posição da entrada na lista
+_REORDERING_FIELDS = {"user_id", "created_at"}
+
+def _bump_version() -> Dict[str, Any]:
+    return {"$add": [{"$ifNull": ["$moods_version", 0]}, 1]}
+
+def _when_present(expression: Dict[str, Any]) -> Dict[str, Any]:
+    # Sem a lista embutida, continua sem (a reconstrução fica para a leitura)
+    return {"$cond": [{"$isArray": "$recent_moods"}, expression, "$$REMOVE"]}
+
+def _without(oid: ObjectId) -> Dict[str, Any]:
+    return {"$filter": {"input": "$recent_moods", "cond": {"$ne": ["$$this._id", oid]}}}
+
+def push_update(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Colocar uma entrada nova na lista, da mais nova para a mais antiga, mantendo no máximo N"""
+    return {
+        "$push": {"recent_moods": {"$each": [entry], "$sort": {"created_at": -1, "_id": -1}, "$slice": RECENT_MOODS_SIZE}},
+        "$inc": {"moods_version": 1}
+    }
+
+def push_filter(user_id: ObjectId, present: bool = True) -> Dict[str, Any]:
+    """
+    Usuário com a lista (present=True) ou sem ela. Sem a lista, o $push a criaria só com a
+    entrada nova: quem grava usa push_update com present=True e, sem match, só VERSION_BUMP
+    com present=False. Se nenhum dos dois casar, uma reconstrução gravou a lista no meio:
+    tenta o $push de novo.
+    """
+    return {"_id": user_id, "recent_moods": {"$exists": present}}
+
+VERSION_BUMP = {"$inc": {"moods_version": 1}}
+PUSH_ATTEMPTS = 3
+
+def edit_update(oid: ObjectId, fields: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Aplicar os campos alterados na cópia embutida da entrada"""
+    if _REORDERING_FIELDS & fields.keys():
+        return [{"$set": {"recent_moods": "$$REMOVE", "moods_version": _bump_version()}}]
+    return [{"$set": {
+        "recent_moods": _when_present({"$map": {
+            "input": "$recent_moods",
+            "in": {"$cond": [
+                {"$eq": ["$$this._id", oid]},
+                {"$mergeObjects": ["$$this", {"$literal": fields}]},
+                "$$this"
+            ]}
+        }}),
+        "moods_version": _bump_version()
+    }}]
+
+def remove_update(oid: ObjectId) -> List[Dict[str, Any]]:
+    """
+    Tirar uma entrada removida da lista. Com a lista cheia não há como saber a
+    próxima entrada mais antiga: o campo é descartado e reconstruído na leitura.
+    """
+    return [{"$set": {
+        "recent_moods": _when_present({"$cond": [
+            {"$not": [{"$in": [oid, "$recent_moods._id"]}]},
+            "$recent_moods",
+            {"$cond": [{"$gte": [{"$size": "$recent_moods"}, RECENT_MOODS_SIZE]}, "$$REMOVE", _without(oid)]}
+        ]}),
+        "moods_version": _bump_version()
+    }}]
+
+def rebuild_filter(user_id: ObjectId, version: Optional[int]) -> Dict[str, Any]:
+    """Filtro para gravar a lista reconstruída só se nada mudou desde a leitura"""
+    return {"_id": user_id, "recent_moods": {"$exists": False}, "moods_version": version}
@@ -0,0 +1,210 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict
+
+import requests
+from flask import Response, jsonify, redirect, request, stream_with_context
+from requests.adapters import HTTPAdapter
+
+from moodtracker_common import invalidation, log_config
+
+logger = logging.getLogger(__name__)
+
+REPORT_SERVICE_URL = os.getenv("REPORT_SERVICE_URL", "http://report-service:5001").rstrip("/")
+# Feed SSE (report-service/stream_app.py): endereço visto pelo navegador, que é redirecionado para lá
+REPORT_STREAM_URL = os.getenv("REPORT_STREAM_URL", "http://localhost:8084").rstrip("/")
+POOL_SIZE = int(os.getenv("REPORT_POOL_SIZE", 32))
+CONNECT_TIMEOUT = float(os.getenv("REPORT_CONNECT_TIMEOUT", 1.0))
+READ_TIMEOUT = float(os.getenv("REPORT_READ_TIMEOUT", 10.0))
+PDF_READ_TIMEOUT = float(os.getenv("REPORT_PDF_READ_TIMEOUT", 60.0))
+MAX_ATTEMPTS = int(os.getenv("REPORT_MAX_ATTEMPTS", 3))
+# Retentativas permitidas: 10% das requisições, com uma reserva mínima
+RETRY_BUDGET_RATIO = float(os.getenv("REPORT_RETRY_BUDGET_RATIO", 0.1))
+RETRY_BUDGET_MIN = float(os.getenv("REPORT_RETRY_BUDGET_MIN", 10))
+STATS_CACHE_TTL = float(os.getenv("REPORT_STATS_CACHE_TTL", 15))
+STATS_CACHE_SIZE = int(os.getenv("REPORT_STATS_CACHE_SIZE", 1024))
+
+# Rotas do report-service fora de /reports, expostas como /reports/<alias>
+_ALIASES = {"health": "/health", "test-pdf": "/test-pdf"}
+# 502/504 vêm de falhas transitórias; 503 é descarte de carga (respeitar o Retry-After)
+_RETRY_STATUSES = {502, 504}
+_FORWARD_REQUEST_HEADERS = ["Accept", "Range", "If-Range", "If-None-Match", "If-Modified-Since"]
+_FORWARD_RESPONSE_HEADERS = [
+    "Content-Type", "Content-Disposition", "Content-Range", "Accept-Ranges",
+    "ETag", "Last-Modified", "Cache-Control", "Vary", "Retry-After", "Server-Timing"
+]
+
+class RetryBudget:
+    """
+    Limitar retentativas a uma fração das requisições: com o serviço fora do
+    ar, as retentativas param em vez de multiplicar a carga sobre ele.
+    """
+    def __init__(self, ratio: float, minimum: float):
+        self.ratio = ratio
+        self.minimum = minimum
+        self._tokens = minimum
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.minimum * 10, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+session = requests.Session()
+# Conexões keep-alive reaproveitadas; retentativas ficam por conta do RetryBudget
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0))
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0))
+
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN)
+# Invalidado pelas gravações de humor e de usuário (ver invalidation.py)
+stats_cache = invalidation.bus.register(invalidation.TaggedTTLCache(STATS_CACHE_TTL, STATS_CACHE_SIZE))
+metrics = {"requests": 0, "retries": 0, "budget_exhausted": 0, "errors": 0, "cache_hits": 0, "cache_misses": 0}
+_metrics_lock = threading.Lock()
+
+def _count(name: str):
+    with _metrics_lock:
+        metrics[name] += 1
+
+def _upstream_path(subpath: str) -> str:
+    return _ALIASES.get(subpath, f"/reports/{subpath}")
+
+def _is_pdf(path: str) -> bool:
+    return path.startswith("/reports/pdf/") or path == "/test-pdf"
+
+def _is_asset(path: str) -> bool:
+    """JS/CSS do relatório HTML: build com hash (ver static_assets.py) ou static/ do report-service"""
+    return path.startswith(("/reports/assets/", "/reports/static/"))
+
+def _is_raw(path: str) -> bool:
+    """Respostas repassadas byte a byte, sem descomprimir"""
+    return _is_pdf(path) or _is_asset(path)
+
+def _is_event_stream(path: str) -> bool:
+    return path == "/reports/stream"
+
+def _read_timeout(path: str) -> float:
+    return PDF_READ_TIMEOUT if _is_pdf(path) else READ_TIMEOUT
+
+def _is_cacheable(path: str) -> bool:
+    return path.startswith("/reports/user_mood_stats/")
+
+def _cache_tags(path: str):
+    user_id = path[len("/reports/user_mood_stats/"):]
+    return (f"moods:{user_id}", f"user:{user_id}")
+
+def fetch(path: str, params=None, stream: bool = False) -> requests.Response:
+    """GET no report-service com timeout e retentativas limitadas pelo orçamento"""
+    headers = log_config.outgoing_headers()
+    for name in _FORWARD_REQUEST_HEADERS:
+        if name in request.headers:
+            headers[name] = request.headers[name]
+    # Cliente original para o limite por usuário do report-service (ADMISSION_TRUSTED_PROXIES)
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    client = request.remote_addr or "-"
+    headers["X-Forwarded-For"] = f"{forwarded_for}, {client}" if forwarded_for else client
+    # O report-service escolhe a variante pré-comprimida que o navegador aceita
+    if _is_raw(path):
+        headers["Accept-Encoding"] = request.headers.get("Accept-Encoding", "identity")
+    timeout = (CONNECT_TIMEOUT, _read_timeout(path))
+
+    _count("requests")
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = session.get(f"{REPORT_SERVICE_URL}{path}", params=params, headers=headers,
+                                   timeout=timeout, stream=stream)
+            if response.status_code not in _RETRY_STATUSES:
+                retry_budget.deposit()
+                return response
+            failure = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response = None
+            failure = e
+
+        if attempt >= MAX_ATTEMPTS:
+            break
+        if not retry_budget.withdraw():
+            _count("budget_exhausted")
+            break
+        if response is not None:
+            response.close()
+        _count("retries")
+        # Backoff exponencial com jitter
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    if response is not None:
+        return response
+    raise failure
+
+def _passthrough_headers(upstream: requests.Response) -> Dict[str, str]:
+    return {name: upstream.headers[name] for name in _FORWARD_RESPONSE_HEADERS if name in upstream.headers}
+
+def init_gateway(app):
+    """Registrar /reports/* como proxy do report-service"""
+
+    @app.route('/reports/<path:subpath>', methods=['GET'])
+    def report_proxy(subpath):
+        """Repassar a requisição ao report-service"""
+        path = _upstream_path(subpath)
+        if _is_event_stream(path):
+            # Conexão que fica aberta: não prende uma thread daqui nem do report-service
+            return redirect(f"{REPORT_STREAM_URL}{request.full_path}", code=307)
+        cache_key = request.full_path if _is_cacheable(path) else None
+
+        if cache_key:
+            cached = stats_cache.get(cache_key)
+            if cached:
+                _count("cache_hits")
+                body, status, headers = cached
+                return Response(body, status=status, headers={**headers, "X-Cache": "HIT"})
+            _count("cache_misses")
+
+        try:
+            upstream = fetch(path, params=request.args, stream=_is_raw(path))
+        except requests.Timeout:
+            _count("errors")
+            logger.error(f"Timeout no report-service: {path}")
+            return jsonify({"error": "Serviço de relatórios não respondeu a tempo"}), 504
+        except requests.RequestException as e:
+            _count("errors")
+            logger.error(f"Report-service indisponível ({path}): {e}")
+            return jsonify({"error": "Serviço de relatórios indisponível"}), 502
+
+        headers = _passthrough_headers(upstream)
+
+        if _is_raw(path):
+            # PDF (e JS/CSS) repassado em blocos, sem montar o arquivo inteiro em memória.
+            # Bytes crus: Content-Length/Content-Encoding seguem valendo
+            for name in ("Content-Length", "Content-Encoding"):
+                if name in upstream.headers:
+                    headers[name] = upstream.headers[name]
+
+            def generate():
+                try:
+                    for chunk in upstream.raw.stream(64 * 1024, decode_content=False):
+                        yield chunk
+                finally:
+                    upstream.close()
+            return Response(stream_with_context(generate()), status=upstream.status_code, headers=headers)
+
+        body = upstream.content
+        if cache_key and upstream.status_code == 200:
+            stats_cache.set(cache_key, (body, upstream.status_code, headers), tags=_cache_tags(path))
+            headers = {**headers, "X-Cache": "MISS"}
+        return Response(body, status=upstream.status_code, headers=headers)
+
+    @app.route('/admin/report-gateway', methods=['GET'])
+    def report_gateway_metrics():
+        """Contadores do proxy para o report-service"""
+        with _metrics_lock:
+            return jsonify(dict(metrics))
@@ -0,0 +1,171 @@
+"""
+POST /batch: várias chamadas da API em uma única ida e volta HTTP.
+
+    POST /batch
+    {"requests": [
+        {"id": "songs", "path": "/songs"},
+        {"id": "stats", "path": "/stats/user/<id>?days=30"},
+        {"id": "mood", "method": "POST", "path": "/moods", "body": {...}},
+        {"id": "history", "path": "/moods/user/<id>", "depends_on": ["mood"]}
+    ]}
+
+    {"responses": [{"id": "songs", "status": 200, "body": {...}}, ...]}
+
+Cada item passa pela pilha WSGI do próprio app (admissão, rastreamento do
+Mongo e logs por item, com o mesmo X-Request-ID do lote). Itens sem
+depends_on rodam em paralelo; um item com dependências espera por elas e
+devolve 424 se alguma falhou. As respostas voltam na ordem do pedido.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlsplit
+
+from flask import jsonify, request
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+from moodtracker_common import log_config
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 20))
+# Threads compartilhadas por todos os lotes do processo
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 8))
+
+_METHODS = {"GET", "POST", "PUT", "DELETE"}
+# Respostas em streaming ou binárias não cabem no corpo JSON do lote
+_EXCLUDED_PREFIXES = ("/batch", "/reports/stream", "/reports/pdf/", "/reports/test-pdf")
+# Marca no environ das sub-requisições: um /batch dentro de um lote ocuparia as threads
+# do executor esperando por filhos que precisam dessas mesmas threads
+_SUB_REQUEST_KEY = "moodtracker.batch_item"
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+def _excluded(path: str) -> bool:
+    """Caminho fora do lote, comparado já decodificado (/%62atch é /batch)"""
+    return unquote(urlsplit(path).path).startswith(_EXCLUDED_PREFIXES)
+
+def _validate(items) -> Optional[str]:
+    """Mensagem de erro (400) para uma lista de sub-requisições inválida, ou None"""
+    if not isinstance(items, list) or not items:
+        return "Informe as requisições ({\"requests\": [...]})"
+    if len(items) > BATCH_MAX_REQUESTS:
+        return f"Máximo de {BATCH_MAX_REQUESTS} requisições por lote"
+    ids = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str) or not item["path"].startswith("/"):
+            return f"Requisição {index}: path é obrigatório e deve começar com /"
+        if str(item.get("method", "GET")).upper() not in _METHODS:
+            return f"Requisição {index}: método não suportado"
+        if _excluded(item["path"]):
+            return f"Requisição {index}: {item['path']} não pode ser usada em lote"
+        item_id = str(item.get("id", index))
+        if item_id in ids:
+            return f"Requisição {index}: id repetido ({item_id})"
+        ids.add(item_id)
+    for index, item in enumerate(items):
+        depends_on = item.get("depends_on", [])
+        if not isinstance(depends_on, list) or any(str(dep) not in ids for dep in depends_on):
+            return f"Requisição {index}: depends_on deve listar ids do lote"
+    return None
+
+def _item_ids(items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """id do item -> posição no lote (o padrão do id é a própria posição)"""
+    return {str(item.get("id", index)): index for index, item in enumerate(items)}
+
+def _levels(items: List[Dict[str, Any]], index_by_id: Dict[str, int]) -> Optional[List[List[int]]]:
+    """Índices agrupados em ondas: cada onda só depende das anteriores (None se houver ciclo)"""
+    deps = {index: {index_by_id[str(dep)] for dep in item.get("depends_on", [])} for index, item in enumerate(items)}
+    done, levels = set(), []
+    while len(done) < len(items):
+        ready = [index for index in range(len(items)) if index not in done and deps[index] <= done]
+        if not ready:
+            return None
+        levels.append(ready)
+        done.update(ready)
+    return levels
+
+def _dispatch(app, item: Dict[str, Any], base_environ: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    """Executar uma sub-requisição no próprio app e montar a resposta do item"""
+    builder = EnvironBuilder(
+        path=item["path"],
+        method=item.get("method", "GET").upper(),
+        headers=headers,
+        json=item.get("body"),
+        environ_base={**base_environ, _SUB_REQUEST_KEY: True}
+    )
+    started = time.perf_counter()
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    # Conferência final no PATH_INFO que o app vai rotear
+    if environ["PATH_INFO"].startswith(_EXCLUDED_PREFIXES):
+        return {"status": 400, "body": {"error": f"{environ['PATH_INFO']} não pode ser usada em lote"}, "duration_ms": 0}
+    app_iter, status, response_headers = run_wsgi_app(app.wsgi_app, environ, buffered=True)
+    try:
+        raw = b"".join(app_iter)
+    finally:
+        if hasattr(app_iter, "close"):
+            app_iter.close()
+
+    text = raw.decode("utf-8", errors="replace")
+    if response_headers.get("Content-Type", "").startswith("application/json"):
+        try:
+            body = json.loads(text) if text else None
+        except ValueError:
+            body = text
+    else:
+        body = text
+    return {
+        "status": int(status.split(" ", 1)[0]),
+        "body": body,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def init_request_batch(app):
+    """Registrar POST /batch"""
+
+    @app.route('/batch', methods=['POST'])
+    def batch():
+        """Executar várias requisições da API em uma só ida e volta"""
+        if request.environ.get(_SUB_REQUEST_KEY):
+            return jsonify({"error": "/batch não pode ser usada em lote"}), 400
+        data = request.get_json(silent=True) or {}
+        items = data.get("requests")
+        error = _validate(items)
+        if error:
+            return jsonify({"error": error}), 400
+        index_by_id = _item_ids(items)
+        levels = _levels(items, index_by_id)
+        if levels is None:
+            return jsonify({"error": "depends_on com ciclo"}), 400
+
+        # Mesmo cliente e mesmo id de requisição nos logs de cada item
+        base_environ = {"REMOTE_ADDR": request.remote_addr or ""}
+        headers = log_config.outgoing_headers()
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        for level in levels:
+            futures = {}
+            for index in level:
+                item = items[index]
+                failed = [dep for dep in item.get("depends_on", [])
+                          if results[index_by_id[str(dep)]]["status"] >= 400]
+                if failed:
+                    results[index] = {"status": 424, "body": {"error": f"Dependência falhou: {', '.join(map(str, failed))}"}}
+                else:
+                    futures[index] = _executor.submit(_dispatch, app, item, base_environ, headers)
+            for index, future in futures.items():
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Erro na requisição em lote {items[index]['path']}: {e}")
+                    results[index] = {"status": 500, "body": {"error": str(e)}}
+
+        return jsonify({
+            "responses": [{"id": item.get("id", index), **result} for index, (item, result) in enumerate(zip(items, results))]
+        })
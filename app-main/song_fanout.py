@@ -0,0 +1,184 @@
+"""
+Cópia compacta da música (título, artista, link) gravada em cada entrada de
+humor, no campo `song`. Leituras detalhadas e estatísticas usam a cópia em vez
+de um $lookup em `songs`.
+
+update_song/delete_song só registram um job em `song_fanout`. Uma thread do
+app-main (ou este script, via cron) aplica a cópia nova em todas as entradas
+da música, inclusive as embutidas em users.recent_moods. Música apagada fica
+com `song: null`. Entradas sem o campo são anteriores à cópia e as leituras
+buscam a música. Para preencher todas de uma vez:
+
+    python song_fanout.py backfill
+    python song_fanout.py run
+
+Os jobs são reservados com um lease, então vários processos podem dividir o
+trabalho e um job interrompido é retomado por outro.
+"""
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+
+from bson import ObjectId
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
+
+from moodtracker_common import log_config
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ("title", "artist", "spotify_url")
+SNAPSHOT_PROJECTION = {field: 1 for field in SNAPSHOT_FIELDS}
+JOBS = "song_fanout"
+MOOD_STORE = os.getenv("MOOD_STORE", "legacy")
+MOODS_TIMESERIES = "mood_entries_ts"
+POLL_INTERVAL = float(os.getenv("SONG_FANOUT_POLL_SECONDS", 2))
+# Humores gravados com a cópia antiga enquanto a música mudava entram no mesmo job
+SETTLE_DELAY = timedelta(seconds=float(os.getenv("SONG_FANOUT_DELAY_SECONDS", 2)))
+LEASE_SECONDS = int(os.getenv("SONG_FANOUT_LEASE_SECONDS", 300))
+
+# Variável global para receber instância do db
+db = None
+_started = False
+_start_lock = threading.Lock()
+
+def snapshot(song: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Cópia gravada na entrada de humor (None para música inexistente)"""
+    if not song:
+        return None
+    return {field: song.get(field) for field in SNAPSHOT_FIELDS}
+
+def job_update() -> Dict[str, Any]:
+    """Update (com upsert) que registra ou renova o job de uma música"""
+    return {"$set": {"requested_at": datetime.utcnow()}}
+
+def request_refresh(database, song_id: ObjectId):
+    """Registrar que as cópias de uma música precisam ser refeitas"""
+    database[JOBS].update_one({"_id": song_id}, job_update(), upsert=True)
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _mood_collections():
+    # Mesmo MOOD_STORE do models.py: todas as coleções que recebem gravações
+    if MOOD_STORE == "timeseries":
+        return [db[MOODS_TIMESERIES]]
+    if MOOD_STORE == "dual":
+        return [db[MOODS_TIMESERIES], db.mood_entries]
+    return [db.mood_entries]
+
+def _claim_job() -> Optional[Dict[str, Any]]:
+    """Reservar o próximo job livre (ou cujo lease expirou)"""
+    now = datetime.utcnow()
+    return db[JOBS].find_one_and_update(
+        {
+            "requested_at": {"$lte": now - SETTLE_DELAY},
+            "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]
+        },
+        {"$set": {"worker": _worker_id(), "lease_until": now + timedelta(seconds=LEASE_SECONDS)}},
+        sort=[("requested_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def apply_snapshot(song_id: ObjectId) -> int:
+    """Gravar a cópia atual da música em todas as entradas que a citam"""
+    copy = snapshot(db.songs.find_one({"_id": song_id}, SNAPSHOT_PROJECTION))
+    modified = 0
+    for collection in _mood_collections():
+        try:
+            modified += collection.update_many({"song_id": song_id}, {"$set": {"song": copy}}).modified_count
+        except PyMongoError as e:
+            # Time-series só aceita update_many em campos comuns a partir do MongoDB 8.0
+            logger.warning(f"Cópia da música {song_id} não aplicada em {collection.name}: {e}")
+
+    # Cópias em users.recent_moods; a versão impede que uma reconstrução traga a cópia antiga
+    db.users.update_many(
+        {"recent_moods.song_id": song_id},
+        {"$set": {"recent_moods.$[entry].song": copy}, "$inc": {"moods_version": 1}},
+        array_filters=[{"entry.song_id": song_id}]
+    )
+    return modified
+
+def run_pending() -> int:
+    """Processar os jobs disponíveis; devolve quantos foram concluídos"""
+    done = 0
+    while True:
+        job = _claim_job()
+        if not job:
+            return done
+
+        try:
+            modified = apply_snapshot(job["_id"])
+            logger.info(f"Cópias da música {job['_id']} atualizadas", extra={"fields": {"modified": modified}})
+            # Pedido novo durante o processamento: o job fica para a próxima rodada
+            if not db[JOBS].delete_one({"_id": job["_id"], "requested_at": job["requested_at"]}).deleted_count:
+                db[JOBS].update_one({"_id": job["_id"]}, {"$unset": {"lease_until": ""}})
+            done += 1
+        except Exception as e:
+            logger.exception(f"Erro ao atualizar cópias da música {job['_id']}: {e}")
+            db[JOBS].update_one({"_id": job["_id"]}, {"$set": {"error": str(e)}})
+            return done
+
+def start_worker(database):
+    """Iniciar a thread que consome os jobs (uma por processo)"""
+    global db, _started
+    with _start_lock:
+        if _started:
+            return
+        db = database
+        _started = True
+
+    def loop():
+        while True:
+            try:
+                run_pending()
+            except Exception as e:
+                logger.exception(f"Erro no fan-out de músicas: {e}")
+            time.sleep(POLL_INTERVAL)
+
+    threading.Thread(target=loop, name="song-fanout", daemon=True).start()
+
+def backfill() -> int:
+    """Registrar um job para cada música (preenche entradas antigas sem cópia)"""
+    requested_at = datetime.utcnow() - SETTLE_DELAY
+    total = 0
+    batch = []
+    for song in db.songs.find({}, {"_id": 1}):
+        batch.append(UpdateOne({"_id": song["_id"]}, {"$set": {"requested_at": requested_at}}, upsert=True))
+        if len(batch) >= 1000:
+            db[JOBS].bulk_write(batch, ordered=False)
+            total += len(batch)
+            batch = []
+    if batch:
+        db[JOBS].bulk_write(batch, ordered=False)
+        total += len(batch)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Fan-out das cópias de músicas nas entradas de humor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("run", help="Processar os jobs pendentes e sair")
+    subparsers.add_parser("backfill", help="Registrar um job para cada música")
+    subparsers.add_parser("status", help="Mostrar quantos jobs estão pendentes")
+
+    args = parser.parse_args()
+    log_config.setup_logging("song-fanout")
+
+    global db
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://mongo:27017"))
+    db = client[os.getenv("DB_NAME", "moodtracker")]
+
+    if args.command == "run":
+        logger.info(f"{run_pending()} jobs concluídos")
+    elif args.command == "backfill":
+        logger.info(f"{backfill()} músicas enfileiradas")
+    else:
+        logger.info(f"{db[JOBS].count_documents({})} jobs pendentes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Módulos usados pelos dois serviços (app-main e report-service):
+
+    admission      controle de admissão (prioridade, concorrência e limite por usuário)
+    invalidation   invalidação dos caches em memória pelo change stream
+    lifecycle      subida em segundo plano, /livez e /readyz
+    loader         BatchLoader: buscas por _id agrupadas entre requisições
+    log_config     logs em JSON e X-Request-ID
+    mongo_tracing  comandos do MongoDB por requisição (Server-Timing, N+1, servidor que atendeu)
+    static_assets  build e serviço dos arquivos estáticos com hash no nome
+
+Instalação (o Dockerfile de cada serviço faz o mesmo):
+
+    pip install -e common
+"""
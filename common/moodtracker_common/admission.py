@@ -0,0 +1,261 @@
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# Classes de prioridade. Cada classe tem seu próprio limite, então relatórios
+# saturados não atrasam gravações e logins.
+CRITICAL = "critical"    # gravações e login: sem limite de concorrência
+NORMAL = "normal"
+EXPENSIVE = "expensive"  # PDFs, estatísticas, leituras detalhadas
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+# Concorrência, tamanho da fila de espera e espera máxima (s) por classe
+CLASS_LIMITS = {
+    NORMAL: (
+        int(_env_float("ADMISSION_NORMAL_CONCURRENCY", 32)),
+        int(_env_float("ADMISSION_NORMAL_QUEUE", 64)),
+        _env_float("ADMISSION_NORMAL_MAX_WAIT", 5.0)
+    ),
+    EXPENSIVE: (
+        int(_env_float("ADMISSION_EXPENSIVE_CONCURRENCY", 4)),
+        int(_env_float("ADMISSION_EXPENSIVE_QUEUE", 8)),
+        _env_float("ADMISSION_EXPENSIVE_MAX_WAIT", 2.0)
+    )
+}
+
+# Token bucket por usuário e classe: (tokens por segundo, rajada)
+USER_RATES = {
+    CRITICAL: (_env_float("ADMISSION_CRITICAL_RATE", 5.0), _env_float("ADMISSION_CRITICAL_BURST", 20)),
+    NORMAL: (_env_float("ADMISSION_NORMAL_RATE", 10.0), _env_float("ADMISSION_NORMAL_BURST", 30)),
+    EXPENSIVE: (_env_float("ADMISSION_EXPENSIVE_RATE", 0.5), _env_float("ADMISSION_EXPENSIVE_BURST", 5))
+}
+
+# Proxies confiáveis na frente do serviço, por nome ou IP (o report-service atrás do gateway usa
+# "app-main"). Só nas conexões vindas deles o cliente é lido do X-Forwarded-For: quem acessa a
+# porta publicada diretamente não escolhe a própria chave do limite por usuário
+ADMISSION_TRUSTED_PROXIES = [host.strip() for host in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",") if host.strip()]
+# Os nomes são resolvidos de novo depois deste intervalo (o IP muda quando o contêiner é recriado)
+PROXY_RESOLVE_SECONDS = 30
+
+class ConcurrencyLimiter:
+    """
+    Limite de requisições simultâneas com uma fila de espera limitada.
+    Fila cheia ou espera esgotada: a requisição é recusada na hora.
+    """
+    def __init__(self, limit: int, max_queue: int, max_wait: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.avg_service_s = 0.5  # média móvel do tempo de atendimento
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "max_waiting": 0,
+            "queue_wait_ms_total": 0.0
+        }
+
+    def retry_after(self) -> int:
+        """Estimativa (s) de quando a fila terá andado o suficiente"""
+        return max(1, math.ceil(self.avg_service_s * (self.waiting + 1) / max(1, self.limit)))
+
+    def acquire(self) -> Optional[str]:
+        """Ocupar uma vaga; devolve o motivo da recusa ou None se admitida"""
+        with self._cond:
+            if self.in_flight < self.limit and not self.waiting:
+                self.in_flight += 1
+                self.stats["admitted"] += 1
+                return None
+            if self.waiting >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                return "queue_full"
+
+            self.waiting += 1
+            self.stats["queued"] += 1
+            self.stats["max_waiting"] = max(self.stats["max_waiting"], self.waiting)
+            started = time.monotonic()
+            deadline = started + self.max_wait
+            try:
+                while self.in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["rejected_timeout"] += 1
+                        return "timeout"
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+                self.stats["queue_wait_ms_total"] += (time.monotonic() - started) * 1000
+
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return None
+
+    def release(self, duration_s: float):
+        with self._cond:
+            self.in_flight -= 1
+            self.avg_service_s = 0.8 * self.avg_service_s + 0.2 * duration_s
+            self._cond.notify()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                **self.stats,
+                "queue_wait_ms_total": round(self.stats["queue_wait_ms_total"], 1),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "limit": self.limit,
+                "max_queue": self.max_queue,
+                "avg_service_ms": round(self.avg_service_s * 1000, 1)
+            }
+
+class UserRateLimiter:
+    """Token bucket por chave (usuário ou IP)"""
+    MAX_KEYS = 50000
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def take(self, key: str) -> float:
+        """Consumir um token; devolve 0 ou quantos segundos faltam para o próximo"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            self.rejected += 1
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now: float):
+        # Baldes que já teriam enchido de novo equivalem a chaves novas
+        refill_s = self.burst / self.rate
+        self._buckets = {key: value for key, value in self._buckets.items() if now - value[1] < refill_s}
+
+_limiters: Dict[str, ConcurrencyLimiter] = {}
+_rate_limiters: Dict[str, UserRateLimiter] = {}
+_critical_in_flight = {"in_flight": 0, "admitted": 0}
+_critical_lock = threading.Lock()
+
+def _reject(status: int, message: str, retry_after: int):
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+_proxy_addresses = (float("-inf"), frozenset())
+
+def _trusted_proxy_addresses() -> frozenset:
+    """IPs de ADMISSION_TRUSTED_PROXIES (resolvidos a cada PROXY_RESOLVE_SECONDS)"""
+    global _proxy_addresses
+    resolved_at, addresses = _proxy_addresses
+    if time.monotonic() - resolved_at < PROXY_RESOLVE_SECONDS:
+        return addresses
+    resolved = set()
+    for host in ADMISSION_TRUSTED_PROXIES:
+        try:
+            resolved.update(info[4][0] for info in socket.getaddrinfo(host, None))
+        except socket.gaierror:
+            logger.warning(f"Proxy confiável não resolvido: {host}")
+    _proxy_addresses = (time.monotonic(), frozenset(resolved))
+    return _proxy_addresses[1]
+
+def _client_address() -> str:
+    """Endereço do cliente; atrás de um proxy confiável, o último salto do X-Forwarded-For"""
+    remote = request.remote_addr or "-"
+    forwarded = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+    if forwarded and ADMISSION_TRUSTED_PROXIES and remote in _trusted_proxy_addresses():
+        return forwarded[-1]
+    return remote
+
+def _rate_key() -> str:
+    """Usuário da rota ou da query string (user_id, professional_id) quando houver; senão o cliente"""
+    user_id = (request.view_args or {}).get("user_id")
+    return user_id or request.args.get("user_id") or request.args.get("professional_id") or _client_address()
+
+def get_metrics() -> Dict[str, Dict[str, float]]:
+    """Contadores de admissão por classe"""
+    metrics = {}
+    for name in (CRITICAL, NORMAL, EXPENSIVE):
+        entry = dict(_limiters[name].snapshot()) if name in _limiters else dict(_critical_in_flight)
+        entry["rate_limited"] = _rate_limiters[name].rejected if name in _rate_limiters else 0
+        metrics[name] = entry
+    return metrics
+
+def init_admission(app, classify: Callable[[object], Optional[str]]):
+    """
+    Registrar o controle de admissão. `classify(request)` devolve a classe
+    da requisição (CRITICAL/NORMAL/EXPENSIVE) ou None para não controlar.
+    """
+    for name, (limit, max_queue, max_wait) in CLASS_LIMITS.items():
+        _limiters[name] = ConcurrencyLimiter(limit, max_queue, max_wait)
+    for name, (rate, burst) in USER_RATES.items():
+        _rate_limiters[name] = UserRateLimiter(rate, burst)
+
+    @app.before_request
+    def _admit():
+        priority = classify(request)
+        if priority is None:
+            return None
+
+        key = _rate_key()
+        wait_s = _rate_limiters[priority].take(key)
+        if wait_s:
+            retry_after = max(1, math.ceil(wait_s))
+            logger.warning(f"Limite por usuário: {priority} {request.path}",
+                           extra={"fields": {"priority": priority, "key": key}})
+            return _reject(429, "Muitas requisições, tente novamente em instantes", retry_after)
+
+        limiter = _limiters.get(priority)
+        if limiter is None:
+            with _critical_lock:
+                _critical_in_flight["in_flight"] += 1
+                _critical_in_flight["admitted"] += 1
+            g._admission = (priority, None, time.monotonic())
+            return None
+
+        reason = limiter.acquire()
+        if reason:
+            logger.warning(f"Requisição recusada ({reason}): {priority} {request.path}",
+                           extra={"fields": {"priority": priority, "reason": reason}})
+            return _reject(503, "Serviço sobrecarregado, tente novamente em instantes", limiter.retry_after())
+        g._admission = (priority, limiter, time.monotonic())
+        return None
+
+    @app.teardown_request
+    def _release(exc=None):
+        admitted = g.pop("_admission", None)
+        if not admitted:
+            return
+        _, limiter, started = admitted
+        if limiter is None:
+            with _critical_lock:
+                _critical_in_flight["in_flight"] -= 1
+        else:
+            limiter.release(time.monotonic() - started)
+
+    @app.route('/admin/admission', methods=['GET'])
+    def admission_metrics():
+        """Métricas de requisições admitidas, enfileiradas e recusadas"""
+        return jsonify(get_metrics())
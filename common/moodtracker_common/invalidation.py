@@ -0,0 +1,259 @@
+"""
+Invalidação de caches em memória entre serviços.
+
+Cada processo mantém um change stream no banco (users, songs e mood_entries)
+e remove dos caches registrados as entradas afetadas pela alteração:
+
+    moods:<user_id>  entradas de humor do usuário
+    user:<user_id>   documento do usuário
+    song:<song_id>   documento da música
+
+Sem change stream não há como saber o que os outros serviços gravaram: os
+caches ficam desligados (get/set ignorados) até o stream abrir de novo, e são
+esvaziados nesse momento. Com INVALIDATION_BUS=local não há stream: só
+publish() no próprio processo invalida (para testes e Mongo sem replica set).
+"""
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import jsonify
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+MODE = os.getenv("INVALIDATION_BUS", "changestream")
+WATCHED_COLLECTIONS = {"mood_entries": "moods", "users": "user", "songs": "song"}
+# Peso da última medida na média móvel do atraso
+LAG_EWMA_ALPHA = 0.2
+
+_PIPELINE = [
+    {"$match": {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}}},
+    # Só o necessário para achar as chaves
+    {"$project": {"operationType": 1, "ns": 1, "documentKey": 1, "clusterTime": 1,
+                  "wallTime": 1, "fullDocument.user_id": 1}}
+]
+
+class TaggedTTLCache:
+    """Cache LRU em memória com validade curta; entradas marcadas com tags para invalidação"""
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.bus: Optional["InvalidationBus"] = None
+        self._items: "OrderedDict[Any, Tuple[float, Any, Set[str]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _enabled(self) -> bool:
+        return self.bus is None or self.bus.live
+
+    def get(self, key: Any) -> Optional[Any]:
+        if not self._enabled():
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if not item:
+                return None
+            if item[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key: Any, value: Any, tags: Iterable[str] = ()):
+        if not self._enabled():
+            return
+        with self._lock:
+            self._remove(key)
+            tags = set(tags)
+            self._items[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._items) > self.max_size:
+                self._remove(next(iter(self._items)))
+
+    def _remove(self, key: Any):
+        item = self._items.pop(key, None)
+        if item:
+            for tag in item[2]:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tags[tag]
+
+    def evict_tag(self, tag: str) -> int:
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def evict_kind(self, kind: str) -> int:
+        """Remover tudo que tem alguma tag do tipo (ex.: "moods")"""
+        with self._lock:
+            keys = {key for tag, tagged in self._tags.items() if tag.startswith(f"{kind}:") for key in tagged}
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+def _event_time(change: Dict[str, Any]) -> Optional[datetime]:
+    # wallTime (MongoDB 6.0+) tem milissegundos; clusterTime só segundos
+    if change.get("wallTime"):
+        return change["wallTime"].replace(tzinfo=timezone.utc)
+    if change.get("clusterTime"):
+        return change["clusterTime"].as_datetime()
+    return None
+
+class InvalidationBus:
+    def __init__(self):
+        self.mode = MODE
+        # Local: sempre ativo; change stream: só depois de aberto
+        self.live = self.mode == "local"
+        self.error: Optional[str] = None
+        self._caches: List[TaggedTTLCache] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.metrics = {
+            "events": 0, "evictions": 0, "flushes": 0,
+            "lag_ms_last": None, "lag_ms_avg": None, "lag_ms_max": 0.0, "last_event_at": None
+        }
+
+    def register(self, cache: TaggedTTLCache) -> TaggedTTLCache:
+        cache.bus = self
+        with self._lock:
+            self._caches.append(cache)
+        return cache
+
+    def publish(self, tag: str) -> int:
+        """Invalidar uma tag nos caches deste processo"""
+        with self._lock:
+            caches = list(self._caches)
+        evicted = sum(cache.evict_tag(tag) for cache in caches)
+        self._count(evictions=evicted)
+        return evicted
+
+    def publish_kind(self, kind: str) -> int:
+        with self._lock:
+            caches = list(self._caches)
+        evicted = sum(cache.evict_kind(kind) for cache in caches)
+        self._count(evictions=evicted)
+        return evicted
+
+    def flush(self):
+        with self._lock:
+            caches = list(self._caches)
+            self.metrics["flushes"] += 1
+        for cache in caches:
+            cache.clear()
+
+    def _count(self, events: int = 0, evictions: int = 0):
+        with self._lock:
+            self.metrics["events"] += events
+            self.metrics["evictions"] += evictions
+
+    def _record_lag(self, change: Dict[str, Any]):
+        event_time = _event_time(change)
+        if not event_time:
+            return
+        lag = max(0.0, (datetime.now(timezone.utc) - event_time).total_seconds() * 1000)
+        with self._lock:
+            average = self.metrics["lag_ms_avg"]
+            self.metrics["lag_ms_last"] = round(lag, 1)
+            self.metrics["lag_ms_avg"] = round(lag if average is None else average + LAG_EWMA_ALPHA * (lag - average), 1)
+            self.metrics["lag_ms_max"] = round(max(self.metrics["lag_ms_max"], lag), 1)
+            self.metrics["last_event_at"] = datetime.utcnow().isoformat()
+
+    def handle(self, change: Dict[str, Any]):
+        """Traduzir um evento do change stream em invalidações"""
+        self._count(events=1)
+        self._record_lag(change)
+        operation = change["operationType"]
+        kind = WATCHED_COLLECTIONS.get(change.get("ns", {}).get("coll"))
+        if operation in ("drop", "rename", "dropDatabase", "invalidate") or not kind:
+            self.flush()
+            return
+
+        if kind == "moods":
+            user_id = (change.get("fullDocument") or {}).get("user_id")
+            if user_id is None:
+                # Remoção (ou entrada já apagada): não há como saber o usuário
+                self.publish_kind("moods")
+            else:
+                self.publish(f"moods:{user_id}")
+        else:
+            self.publish(f"{kind}:{change['documentKey']['_id']}")
+
+    def start(self, db):
+        """Abrir o change stream em uma thread (uma por processo)"""
+        if self.mode == "local":
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._watch, args=(db,), name="invalidation-bus", daemon=True)
+            self._thread.start()
+
+    def wait_live(self, timeout: float) -> bool:
+        """Esperar o change stream abrir (caches ligados); False se não abrir no prazo"""
+        deadline = time.monotonic() + timeout
+        while not self.live and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return self.live
+
+    def _watch(self, db):
+        backoff = 1
+        while True:
+            try:
+                # O próprio pymongo retoma o stream em erros transitórios
+                with db.watch(_PIPELINE, full_document="updateLookup") as stream:
+                    # Tudo que foi para o cache antes deste ponto pode ter perdido eventos
+                    self.flush()
+                    self.live = True
+                    self.error = None
+                    backoff = 1
+                    logger.info("Barramento de invalidação ativo")
+                    for change in stream:
+                        self.handle(change)
+            except PyMongoError as e:
+                self.live = False
+                self.flush()
+                self.error = str(e)
+                logger.error(f"Change stream de invalidação interrompido, caches desligados: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "live": self.live,
+                "error": self.error,
+                "cached_entries": sum(len(cache) for cache in self._caches),
+                **copy.deepcopy(self.metrics)
+            }
+
+def init_invalidation(app, db, start: bool = True):
+    """Iniciar o barramento e expor as métricas em /admin/invalidation (start=False: só a rota)"""
+    if start:
+        bus.start(db)
+
+    @app.route('/admin/invalidation', methods=['GET'])
+    def invalidation_metrics():
+        """Estado do barramento de invalidação e atraso dos eventos"""
+        return jsonify(bus.snapshot())
+
+bus = InvalidationBus()
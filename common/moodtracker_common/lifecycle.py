@@ -0,0 +1,153 @@
+"""
+Ciclo de vida do serviço: subir sem depender do Mongo, aquecer e só então
+receber tráfego.
+
+A importação não acessa o banco (o MongoClient conecta sob demanda). Uma
+thread confere as dependências com backoff até todas responderem, executa as
+etapas de aquecimento (índices, ReportLab...) e marca o processo como pronto.
+Depois disso as dependências são conferidas a cada READY_CHECK_INTERVAL
+segundos; /readyz só responde o último resultado, sem tocar no banco.
+
+    /livez   processo vivo (o orquestrador reinicia se falhar)
+    /readyz  200 só com aquecimento concluído e dependências respondendo
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+import pymongo
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+READY_CHECK_INTERVAL = float(os.getenv("READY_CHECK_INTERVAL", 5))
+STARTUP_BACKOFF_MAX = float(os.getenv("STARTUP_BACKOFF_MAX", 30))
+MONGO_PING_TIMEOUT = float(os.getenv("MONGO_PING_TIMEOUT", 2))
+
+STARTING, WARMING, READY = "starting", "warming", "ready"
+
+class Lifecycle:
+    def __init__(self):
+        self.state = STARTING
+        self.started_at = time.monotonic()
+        self.startup_seconds = None
+        self.warmup: Dict[str, Any] = {}
+        self._checks: List[Tuple[str, Callable[[], Any]]] = []
+        self._steps: List[Tuple[str, Callable[[], Any]]] = []
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def check(self, name: str, fn: Callable[[], Any]):
+        """Dependência conferida antes do aquecimento e periodicamente (fn levanta exceção se falhar)"""
+        self._checks.append((name, fn))
+
+    def warmup_step(self, name: str, fn: Callable[[], Any]):
+        """Etapa executada uma vez, em ordem, antes de o processo ficar pronto"""
+        self._steps.append((name, fn))
+
+    def _run_checks(self) -> bool:
+        healthy = True
+        for name, fn in self._checks:
+            started = time.perf_counter()
+            try:
+                fn()
+                status = {"ok": True}
+            except Exception as e:
+                status = {"ok": False, "error": str(e)}
+                healthy = False
+            status["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            status["checked_at"] = datetime.utcnow().isoformat()
+            with self._lock:
+                self._status[name] = status
+        return healthy
+
+    def _retry(self, description: str, fn: Callable[[], bool]):
+        backoff = 0.5
+        while not fn():
+            logger.warning(f"{description}: nova tentativa em {backoff:.1f}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, STARTUP_BACKOFF_MAX)
+
+    def _run_step(self, name: str, fn: Callable[[], Any]) -> bool:
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.error(f"Falha no aquecimento ({name}): {e}")
+            self.warmup[name] = {"ok": False, "error": str(e)}
+            return False
+        self.warmup[name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        return True
+
+    def _startup(self):
+        self._retry("Dependências indisponíveis", self._run_checks)
+        self.state = WARMING
+        for name, fn in self._steps:
+            self._retry(f"Aquecimento ({name})", lambda: self._run_step(name, fn))
+        self.startup_seconds = round(time.monotonic() - self.started_at, 3)
+        self.state = READY
+        logger.info(f"Pronto para receber tráfego em {self.startup_seconds}s", extra={"fields": {"warmup": self.warmup}})
+
+        while True:
+            time.sleep(READY_CHECK_INTERVAL)
+            self._run_checks()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._startup, name="lifecycle", daemon=True)
+                self._thread.start()
+
+    def ready(self) -> bool:
+        with self._lock:
+            return self.state == READY and all(status["ok"] for status in self._status.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            checks = {name: dict(status) for name, status in self._status.items()}
+        return {
+            "ready": self.ready(),
+            "state": self.state,
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "startup_s": self.startup_seconds,
+            "checks": checks,
+            "warmup": dict(self.warmup)
+        }
+
+def mongo_ping(client) -> Callable[[], Any]:
+    """Conferência do Mongo com timeout curto (não espera a seleção de servidor padrão de 30 s)"""
+    def ping():
+        with pymongo.timeout(MONGO_PING_TIMEOUT):
+            client.admin.command("ping")
+    return ping
+
+def serving_process(module_name: str) -> bool:
+    """
+    Se este processo atende requisições. `python app.py` roda com o reloader do modo
+    debug: o processo pai só vigia os arquivos e reinicia o filho (WERKZEUG_RUN_MAIN),
+    então as threads de fundo não devem subir nele. No gunicorn o módulo não é __main__.
+    """
+    return module_name != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+
+def init_lifecycle(app, start: bool = True):
+    """Registrar /livez e /readyz e iniciar a subida em segundo plano (start=False: só as rotas)"""
+
+    @app.route('/livez', methods=['GET'])
+    def livez():
+        """Processo vivo: não depende do banco"""
+        return jsonify({"status": "alive", "state": startup.state})
+
+    @app.route('/readyz', methods=['GET'])
+    def readyz():
+        """Pronto para tráfego: aquecido e com dependências respondendo (resultado em cache)"""
+        snapshot = startup.snapshot()
+        return jsonify(snapshot), 200 if snapshot["ready"] else 503
+
+    if start:
+        startup.start()
+
+startup = Lifecycle()
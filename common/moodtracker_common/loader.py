@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List
+
+# Carregamento em lote no estilo DataLoader: os ids pedidos por um conjunto de
+# resultados são deduplicados e buscados com um único $in. Requisições
+# concorrentes do mesmo processo que pedem o mesmo id esperam a mesma busca,
+# e com LOADER_WAIT_MS > 0 ids diferentes pedidos nessa janela vão na mesma consulta.
+WAIT_SECONDS = float(os.getenv("LOADER_WAIT_MS", 0)) / 1000
+MAX_BATCH = int(os.getenv("LOADER_MAX_BATCH", 1000))
+
+class BatchLoader:
+    """
+    fetch recebe uma lista de ids distintos e devolve {id: documento};
+    ids sem documento ficam como None. Nada é guardado depois da busca.
+    """
+    def __init__(self, fetch: Callable[[List[Any]], Dict[Any, Any]], wait: float = WAIT_SECONDS, max_batch: int = MAX_BATCH):
+        self.fetch = fetch
+        self.wait = wait
+        self.max_batch = max_batch
+        self._pending: Dict[Any, Future] = {}
+        self._inflight: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requested": 0, "fetched": 0, "batches": 0}
+
+    def load_many(self, keys: Iterable[Any]) -> Dict[Any, Any]:
+        futures = {}
+        leader = False
+        with self._lock:
+            for key in set(keys):
+                self.stats["requested"] += 1
+                future = self._inflight.get(key) or self._pending.get(key)
+                if future is None:
+                    # Primeiro id de um lote novo: esta thread faz a busca
+                    leader = leader or not self._pending
+                    future = self._pending[key] = Future()
+                futures[key] = future
+
+        if leader:
+            if self.wait:
+                time.sleep(self.wait)
+            self._dispatch()
+        return {key: future.result() for key, future in futures.items()}
+
+    def load(self, key: Any) -> Any:
+        return self.load_many([key])[key]
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch = dict(list(self._pending.items())[:self.max_batch])
+                for key in batch:
+                    del self._pending[key]
+                self._inflight.update(batch)
+                self.stats["fetched"] += len(batch)
+                self.stats["batches"] += 1
+
+            try:
+                found = self.fetch(list(batch))
+                for key, future in batch.items():
+                    future.set_result(found.get(key))
+            except Exception as e:
+                for future in batch.values():
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._lock:
+                    for key in batch:
+                        self._inflight.pop(key, None)
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict
+
+from flask import g, has_request_context, jsonify, request
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Acima destes limites a requisição é sinalizada no log
+COMMAND_BUDGET = int(os.getenv("MONGO_COMMAND_BUDGET", 10))
+REPEAT_THRESHOLD = int(os.getenv("MONGO_REPEAT_THRESHOLD", 3))
+
+# Campo do comando que guarda o filtro, por tipo de comando
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline"
+}
+
+def query_shape(value: Any) -> Any:
+    """Trocar valores por '?' mantendo campos e operadores"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return "?"
+    return "?"
+
+def _command_filter(command_name: str, command: Dict[str, Any]) -> Any:
+    if command_name in _FILTER_FIELDS:
+        return command.get(_FILTER_FIELDS[command_name])
+    if command_name == "update":
+        return [update.get("q") for update in command.get("updates", [])[:1]]
+    if command_name == "delete":
+        return [delete.get("q") for delete in command.get("deletes", [])[:1]]
+    return None
+
+def _docs_returned(command_name: str, reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    return reply.get("n", 0)
+
+class RequestCommandTracer(monitoring.CommandListener):
+    """
+    Registrar os comandos MongoDB na requisição Flask em andamento.
+    O pymongo síncrono dispara os eventos na thread que executa a operação,
+    então o contexto da requisição está disponível.
+    """
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if not has_request_context() or "_mongo_commands" not in g:
+            return
+        collection = event.command.get(event.command_name)
+        shape = (
+            event.command_name,
+            collection if isinstance(collection, str) else None,
+            repr(query_shape(_command_filter(event.command_name, event.command)))
+        )
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (shape, g._mongo_commands)
+
+    def _finish(self, event, reply, failed=False):
+        with self._lock:
+            pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if not pending:
+            return
+        shape, commands = pending
+        commands.append({
+            "command": shape[0],
+            "collection": shape[1],
+            "shape": shape,
+            "duration_ms": event.duration_micros / 1000,
+            "docs_returned": 0 if failed else _docs_returned(shape[0], reply),
+            "failed": failed
+        })
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None, failed=True)
+
+class ServedByCounter(monitoring.CommandListener):
+    """Contar, por coleção, em qual servidor (primário ou secundário) cada leitura foi atendida"""
+    def __init__(self):
+        self.client = None
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _role(self, address) -> str:
+        if self.client is None:
+            return "unknown"
+        server = self.client.topology_description.server_descriptions().get(address)
+        return server.server_type_name if server else "unknown"
+
+    def started(self, event):
+        # O servidor já foi escolhido pela read preference quando o comando sai
+        if event.command_name not in _FILTER_FIELDS or event.command_name == "findAndModify":
+            return
+        host, port = event.connection_id
+        collection = event.command.get(event.command_name)
+        key = (self._role(event.connection_id), f"{host}:{port}", event.command_name,
+               collection if isinstance(collection, str) else None)
+        with self._lock:
+            self._counts[key] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts.items())
+        by_role = Counter()
+        servers = []
+        for (role, address, command_name, collection), count in sorted(counts):
+            by_role[role] += count
+            servers.append({"role": role, "server": address, "command": command_name,
+                            "collection": collection, "count": count})
+        return {"by_role": dict(by_role), "reads": servers}
+
+def init_served_by(app, client, listener: ServedByCounter, read_preferences: Dict[str, Any]):
+    """Expor em /admin/mongo-reads onde as leituras foram atendidas"""
+    listener.client = client
+
+    @app.route('/admin/mongo-reads', methods=['GET'])
+    def mongo_reads():
+        """Leituras por servidor (RSPrimary, RSSecondary...) e read preferences configuradas"""
+        return jsonify({"read_preferences": read_preferences, **listener.snapshot()})
+
+def init_tracing(app):
+    """Registrar os hooks que montam o resumo e o Server-Timing de cada requisição"""
+
+    @app.before_request
+    def _start_mongo_trace():
+        g._mongo_commands = []
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_mongo_trace(response):
+        commands = g.pop("_mongo_commands", None)
+        started = g.pop("_request_started", None)
+        if commands is None or started is None:
+            return response
+
+        total_ms = (time.perf_counter() - started) * 1000
+        mongo_ms = sum(command["duration_ms"] for command in commands)
+        response.headers.add(
+            "Server-Timing",
+            f'mongo;dur={mongo_ms:.2f};desc="{len(commands)} comandos", app;dur={total_ms:.2f}'
+        )
+
+        repeated = [
+            (shape, count) for shape, count in Counter(command["shape"] for command in commands).items()
+            if count >= REPEAT_THRESHOLD
+        ]
+        by_collection = Counter(f"{command['command']}:{command['collection']}" for command in commands)
+        summary = (
+            f"{request.method} {request.path} {response.status_code} "
+            f"{len(commands)} comandos, {mongo_ms:.1f}/{total_ms:.1f} ms no Mongo, "
+            f"{sum(command['docs_returned'] for command in commands)} docs "
+            f"{dict(by_collection)}"
+        )
+
+        if len(commands) > COMMAND_BUDGET:
+            logger.warning(f"Orçamento de comandos excedido ({len(commands)} > {COMMAND_BUDGET}): {summary}")
+        for (command_name, collection, shape), count in repeated:
+            logger.warning(f"Possível N+1: {command_name} em {collection} repetido {count}x com o formato {shape}: {summary}")
+        if len(commands) <= COMMAND_BUDGET and not repeated:
+            logger.info(summary, extra={"sample": True})
+
+        return response
@@ -0,0 +1,389 @@
+"""
+Arquivos estáticos com hash no nome, pré-comprimidos e com cache imutável.
+
+Build (roda no Dockerfile, no diretório do serviço; gera dist/):
+
+    python -m moodtracker_common.static_assets build templates/index.html --css templates/style.css --prefix /assets
+
+O script inline da página e a folha de estilos local viram arquivos
+minificados com o hash do conteúdo no nome (index.3f9c0a1b2c4d.js), com
+variantes .gz e .br. A página (o "shell") passa a apontar para eles e fica
+pequena. Scripts com expressões Jinja ({{ }}) continuam inline.
+
+Em produção os arquivos de <prefixo>/ vão com Cache-Control immutable de um
+ano: um conteúdo novo tem outro nome. O shell é revalidado a cada visita
+(no-cache + ETag), e a visita seguinte recebe só um 304. Sem dist/ (fora do
+Docker), as páginas continuam sendo servidas dos templates originais.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+from flask import abort, current_app, request, send_file
+from jinja2 import ChoiceLoader, FileSystemLoader
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+# Saída do build; sem a variável, dist/ no diretório do serviço (root_path do app)
+ASSETS_DIST_DIR = os.getenv("ASSETS_DIST_DIR")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Variantes pré-comprimidas, na ordem de preferência
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# O Flask acrescenta o charset aos tipos text/*
+_MIMETYPES = {".js": "text/javascript", ".css": "text/css"}
+
+# Minificação (só espaços e comentários: strings, templates e regex ficam intactos)
+
+_REGEX_PREFIX = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = ("return", "typeof", "case", "do", "else", "in", "of", "void", "yield", "await")
+
+class _Output:
+    """Junta os trechos de código colapsando espaços e linhas em branco"""
+    def __init__(self):
+        self.parts: List[str] = []
+        self._space = False
+        self._newline = False
+
+    def space(self, newline: bool = False):
+        self._space = True
+        self._newline = self._newline or newline
+
+    def write(self, text: str):
+        if self.parts:
+            if self._newline:
+                self.parts.append("\n")
+            elif self._space and _needs_space(self.parts[-1][-1], text[0]):
+                self.parts.append(" ")
+        self._space = self._newline = False
+        self.parts.append(text)
+
+    def last_token(self) -> str:
+        return "".join(self.parts[-8:]).rstrip()
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char in "_$\\"
+
+def _needs_space(last: str, first: str) -> bool:
+    """Espaço entre dois trechos só quando removê-lo muda o código (a b, a + +b, /re/ in, 1 .x)"""
+    return (
+        (_is_word(last) and _is_word(first))
+        or (last in "+-" and first in "+-")
+        or (last == "/" and (_is_word(first) or first == "/"))
+        or (last.isdigit() and first == ".")
+    )
+
+def _skip_string(source: str, i: int) -> int:
+    """Posição logo após a string iniciada em source[i]"""
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == "\\" else 1
+    return i + 1
+
+def _skip_regex(source: str, i: int) -> int:
+    """Posição logo após o literal de regex iniciado em source[i] (incluindo as flags)"""
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            break
+        elif char == "\n":
+            raise ValueError("Regex sem fim")
+        i += 1
+    i += 1
+    while i < len(source) and (source[i].isalnum() or source[i] == "_"):
+        i += 1
+    return i
+
+def _regex_allowed(out: _Output) -> bool:
+    previous = out.last_token()
+    if not previous:
+        return True
+    if previous[-1] in _REGEX_PREFIX:
+        return True
+    return any(re.search(rf"(^|[^\w$]){keyword}$", previous) for keyword in _REGEX_KEYWORDS)
+
+def _js_code(source: str, i: int, out: _Output, in_template: bool) -> int:
+    """Copiar código JS até o fim (ou até o } que fecha um ${ } de template)"""
+    depth = 0
+    while i < len(source):
+        char = source[i]
+        nxt = source[i + 1] if i + 1 < len(source) else ""
+        if char in " \t\r":
+            out.space()
+            i += 1
+        elif char == "\n":
+            out.space(newline=True)
+            i += 1
+        elif char == "/" and nxt == "/":
+            end = source.find("\n", i)
+            i = len(source) if end == -1 else end
+        elif char == "/" and nxt == "*":
+            end = source.find("*/", i + 2)
+            if end == -1:
+                raise ValueError("Comentário sem fim")
+            out.space(newline="\n" in source[i:end])
+            i = end + 2
+        elif char in "'\"":
+            end = _skip_string(source, i)
+            out.write(source[i:end])
+            i = end
+        elif char == "`":
+            i = _js_template(source, i, out)
+        elif char == "/" and _regex_allowed(out):
+            end = _skip_regex(source, i)
+            out.write(source[i:end])
+            i = end
+        else:
+            if in_template:
+                if char == "{":
+                    depth += 1
+                elif char == "}":
+                    if depth == 0:
+                        return i
+                    depth -= 1
+            out.write(char)
+            i += 1
+    if in_template:
+        raise ValueError("Template sem fim")
+    return i
+
+def _js_template(source: str, i: int, out: _Output) -> int:
+    """Copiar um template literal sem mexer no texto; o código dos ${ } é minificado"""
+    start = i
+    i += 1
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+        elif char == "`":
+            out.write(source[start:i + 1])
+            return i + 1
+        elif char == "$" and source[i + 1:i + 2] == "{":
+            out.write(source[start:i + 2])
+            i = _js_code(source, i + 2, out, in_template=True)
+            start = i
+            i += 1
+        else:
+            i += 1
+    raise ValueError("Template sem fim")
+
+def minify_js(source: str) -> str:
+    """Remover comentários, indentação e linhas em branco (as quebras de linha ficam, por causa do ASI)"""
+    out = _Output()
+    _js_code(source, 0, out, in_template=False)
+    return "".join(out.parts) + "\n"
+
+def _compact_css(code: str) -> str:
+    code = re.sub(r"\s+", " ", code)
+    return re.sub(r"\s*([{};,])\s*", r"\1", code)
+
+def minify_css(source: str) -> str:
+    """Remover comentários e espaços desnecessários ao redor de { } ; , (strings ficam intactas)"""
+    parts = []
+    code = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char == "/" and source[i + 1:i + 2] == "*":
+            end = source.find("*/", i + 2)
+            i = len(source) if end == -1 else end + 2
+            code.append(" ")
+        elif char in "'\"":
+            end = _skip_string(source, i)
+            parts.append(_compact_css("".join(code)))
+            parts.append(source[i:end])
+            code = []
+            i = end
+        else:
+            code.append(char)
+            i += 1
+    parts.append(_compact_css("".join(code)))
+    return "".join(parts).replace(";}", "}").strip() + "\n"
+
+def minify_html(source: str) -> str:
+    """Indentação e linhas em branco do shell (páginas com <pre>/<textarea> ficam como estão)"""
+    if re.search(r"<(pre|textarea)\b", source, re.I):
+        return source
+    return "\n".join(line.strip() for line in source.splitlines() if line.strip()) + "\n"
+
+# Build
+
+_INLINE_SCRIPT = re.compile(r"<script>(.*?)</script>", re.S)
+_LOCAL_STYLESHEET = re.compile(r'<link rel="stylesheet" href="(?!https?:|//)[^"]*">')
+
+def _hashed_name(name: str, content: bytes) -> str:
+    base, ext = os.path.splitext(name)
+    return f"{base}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+def _write_asset(assets_dir: str, name: str, text: str, brotli) -> Tuple[str, Dict[str, int]]:
+    """Gravar o arquivo com hash e as variantes comprimidas; devolve o nome e os tamanhos"""
+    data = text.encode("utf-8")
+    hashed = _hashed_name(name, data)
+    path = os.path.join(assets_dir, hashed)
+    with open(path, "wb") as f:
+        f.write(data)
+    sizes = {"identity": len(data)}
+    variants = [("gzip", ".gz", gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ("br", ".br", brotli.compress(data, quality=11)))
+    for encoding, suffix, compressed in variants:
+        # Variante maior que o original não ajuda
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+            sizes[encoding] = len(compressed)
+    return hashed, sizes
+
+def dist_dir(app) -> str:
+    return ASSETS_DIST_DIR or os.path.join(app.root_path, "dist")
+
+def build(html_path: str, css_path: Optional[str], prefix: str, out_dir: str = ASSETS_DIST_DIR or "dist") -> Dict[str, object]:
+    """Gerar o shell e os arquivos com hash de uma página; devolve o manifesto"""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("⚠️  Módulo brotli não instalado: só as variantes .gz serão geradas")
+
+    with open(html_path, encoding="utf-8") as f:
+        html = f.read()
+    page = os.path.basename(html_path)
+    base = os.path.splitext(page)[0]
+    assets_dir = os.path.join(out_dir, "assets")
+    os.makedirs(assets_dir, exist_ok=True)
+    manifest = {"page": page, "prefix": prefix, "assets": {}, "sizes": {"source_html": len(html.encode("utf-8"))}}
+
+    def add(name: str, text: str) -> str:
+        hashed, sizes = _write_asset(assets_dir, name, text, brotli)
+        manifest["assets"][name] = hashed
+        manifest["sizes"][hashed] = sizes
+        return f"{prefix}/{hashed}"
+
+    if _LOCAL_STYLESHEET.search(html):
+        if not css_path:
+            raise SystemExit(f"❌ {page} usa uma folha de estilos local: informe --css")
+        with open(css_path, encoding="utf-8") as f:
+            url = add(os.path.basename(css_path), minify_css(f.read()))
+        html = _LOCAL_STYLESHEET.sub(lambda match: f'<link rel="stylesheet" href="{url}">', html)
+
+    scripts = 0
+    def extract(match):
+        nonlocal scripts
+        code = match.group(1)
+        if "{{" in code or "{%" in code:
+            print(f"⚠️  Script com expressões Jinja em {page}: mantido inline")
+            return match.group(0)
+        scripts += 1
+        name = f"{base}.js" if scripts == 1 else f"{base}-{scripts}.js"
+        return f'<script src="{add(name, minify_js(code))}"></script>'
+    html = _INLINE_SCRIPT.sub(extract, html)
+
+    shell = minify_html(html)
+    with open(os.path.join(out_dir, page), "w", encoding="utf-8") as f:
+        f.write(shell)
+    manifest["sizes"]["shell_html"] = len(shell.encode("utf-8"))
+    if "{{" not in shell and "{%" not in shell:
+        # Shell estático (sem Jinja): servido também pré-comprimido
+        data = shell.encode("utf-8")
+        with open(os.path.join(out_dir, page + ".gz"), "wb") as f:
+            f.write(gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            with open(os.path.join(out_dir, page + ".br"), "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+    with open(os.path.join(out_dir, f"{base}.manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+# Serviço
+
+def _encoded_variant(path: str) -> Tuple[str, Optional[str]]:
+    """Variante pré-comprimida aceita pelo cliente (caminho, Content-Encoding)"""
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+def send_shell(page: str, fallback_dir: str):
+    """Shell gerado pelo build (no-cache + ETag) ou, sem build, o template original"""
+    path = os.path.join(dist_dir(current_app), page)
+    encoding = None
+    if os.path.isfile(path):
+        path, encoding = _encoded_variant(path)
+    else:
+        path = os.path.join(current_app.root_path, fallback_dir, page)
+    response = send_file(path, mimetype="text/html", conditional=True, etag=True, max_age=0)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Cache-Control"] = REVALIDATE
+    response.vary.add("Accept-Encoding")
+    return response
+
+def revalidated(response):
+    """Página renderizada a cada pedido: no-cache + ETag (304 quando não mudou)"""
+    response.headers["Cache-Control"] = REVALIDATE
+    response.add_etag()
+    return response.make_conditional(request)
+
+def init_assets(app, prefix: str):
+    """Servir <prefix>/<arquivo> do build e renderizar os templates gerados no lugar dos originais"""
+    build_dir = dist_dir(app)
+    assets_dir = os.path.join(build_dir, "assets")
+    if os.path.isdir(build_dir):
+        app.jinja_loader = ChoiceLoader([FileSystemLoader(build_dir), app.jinja_loader])
+        logger.info(f"Arquivos estáticos do build em {build_dir}")
+
+    @app.route(f"{prefix}/<path:filename>", methods=['GET'])
+    def static_asset(filename):
+        """Arquivo com hash no nome: nunca muda, cache de um ano"""
+        path = safe_join(assets_dir, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        mimetype = _MIMETYPES.get(os.path.splitext(path)[1]) or mimetypes.guess_type(path)[0]
+        path, encoding = _encoded_variant(path)
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=31536000)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.vary.add("Accept-Encoding")
+        return response
+
+def main():
+    parser = argparse.ArgumentParser(description="Build dos arquivos estáticos (hash no nome, minificação e pré-compressão)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Gerar dist/ a partir de uma página")
+    build_parser.add_argument("html", help="Página de origem (template)")
+    build_parser.add_argument("--css", help="Folha de estilos local usada pela página")
+    build_parser.add_argument("--prefix", default="/assets", help="URL de onde os arquivos são servidos")
+    build_parser.add_argument("--out", default=ASSETS_DIST_DIR or "dist", help="Diretório de saída (padrão: ASSETS_DIST_DIR ou dist/)")
+    build_parser.add_argument("--clean", action="store_true", help="Apagar o diretório de saída antes")
+    args = parser.parse_args()
+
+    if args.clean and os.path.isdir(args.out):
+        shutil.rmtree(args.out)
+    manifest = build(args.html, args.css, args.prefix, args.out)
+    sizes = manifest["sizes"]
+    print(f"📦 {manifest['page']}: {sizes['source_html']} bytes -> shell de {sizes['shell_html']} bytes")
+    for name, hashed in manifest["assets"].items():
+        variants = ", ".join(f"{encoding} {size}" for encoding, size in sizes[hashed].items())
+        print(f"   {name} -> {manifest['prefix']}/{hashed} ({variants} bytes)")
+
+if __name__ == "__main__":
+    main()
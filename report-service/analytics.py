@@ -0,0 +1,213 @@
+"""
+Pontuação de risco de humor dos pacientes de um profissional (GET /reports/risk).
+
+Os pacientes são processados em lotes de RISK_BATCH_SIZE. Para cada lote, uma
+única agregação traz as contagens por (paciente, dia, emoji) da janela; os
+emojis viram valência (-1 a 1, pelos nomes em models.MOOD_NAMES) e tudo vira
+duas matrizes pacientes x dias (soma da valência e número de entradas). As
+métricas saem de operações NumPy sobre a matriz inteira, sem laço por paciente:
+
+    - média móvel da valência (RISK_ROLLING_DAYS) e a queda contra a janela anterior
+    - volatilidade (desvio padrão da valência média de cada dia)
+    - sequência atual e maior sequência de dias com humor negativo
+    - dias desde o último registro e maior intervalo sem registros
+
+A pontuação (0-100) é a soma ponderada desses componentes (RISK_WEIGHTS).
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from bson import ObjectId
+
+import models
+
+logger = logging.getLogger(__name__)
+
+RISK_ROLLING_DAYS = int(os.getenv("RISK_ROLLING_DAYS", 7))
+RISK_BATCH_SIZE = int(os.getenv("RISK_BATCH_SIZE", 500))
+
+# Valência de cada humor (-1 muito negativo, 1 muito positivo); emojis fora da tabela são ignorados
+MOOD_VALENCE = {
+    "Feliz": 1.0,
+    "Animado": 1.0,
+    "Apaixonado": 0.8,
+    "Pensativo": 0.0,
+    "Cansado": -0.4,
+    "Ansioso": -0.7,
+    "Bravo": -0.8,
+    "Triste": -1.0
+}
+EMOJI_VALENCE = {emoji: MOOD_VALENCE[name] for emoji, name in models.MOOD_NAMES.items() if name in MOOD_VALENCE}
+
+# Peso de cada componente (cada um vai de 0 a 1) na pontuação
+RISK_WEIGHTS = {
+    "mood_level": 0.35,
+    "decline": 0.25,
+    "volatility": 0.15,
+    "negative_streak": 0.15,
+    "logging_gap": 0.10
+}
+# Dias de humor negativo seguidos / sem registro que levam o componente ao máximo
+NEGATIVE_STREAK_MAX = 7
+LOGGING_GAP_MAX = 14
+RISK_LEVELS = ((60, "Alto"), (35, "Médio"), (0, "Baixo"))
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Divisão elemento a elemento com NaN onde o denominador é zero"""
+    return np.divide(numerator, denominator, out=np.full(np.shape(numerator), np.nan), where=denominator > 0)
+
+def _run_lengths(mask: np.ndarray) -> np.ndarray:
+    """Tamanho da sequência de True que termina em cada posição, linha a linha"""
+    total = np.cumsum(mask, axis=1)
+    # Total acumulado no último False de cada posição: subtraído, zera a contagem a cada quebra
+    reset = np.maximum.accumulate(np.where(mask, 0, total), axis=1)
+    return total - reset
+
+def window_matrices(rows: List[Dict[str, Any]], user_ids: List[ObjectId],
+                    start: datetime, days: int) -> Dict[str, np.ndarray]:
+    """
+    Linhas de models.get_daily_mood_counts -> matrizes pacientes x dias com a soma
+    da valência e o número de entradas com valência, mais o total de entradas por paciente.
+    """
+    position = {user_id: index for index, user_id in enumerate(user_ids)}
+    rows = [row for row in rows if row["_id"]["user_id"] in position]
+    users = np.fromiter((position[row["_id"]["user_id"]] for row in rows), dtype=np.int64, count=len(rows))
+    counts = np.fromiter((row["count"] for row in rows), dtype=np.float64, count=len(rows))
+    day = (np.array([row["_id"]["day"] for row in rows], dtype="datetime64[D]")
+           - np.datetime64(start.date(), "D")).astype(np.int64)
+    valence = np.fromiter((EMOJI_VALENCE.get(row["_id"]["emoji"], np.nan) for row in rows),
+                          dtype=np.float64, count=len(rows))
+
+    shape = (len(user_ids), days)
+    valence_sum, valence_count = np.zeros(shape), np.zeros(shape)
+    valid = ~np.isnan(valence) & (day >= 0) & (day < days)
+    np.add.at(valence_sum, (users[valid], day[valid]), valence[valid] * counts[valid])
+    np.add.at(valence_count, (users[valid], day[valid]), counts[valid])
+    return {
+        "valence_sum": valence_sum,
+        "valence_count": valence_count,
+        "entries": np.bincount(users, weights=counts, minlength=len(user_ids))
+    }
+
+def risk_metrics(valence_sum: np.ndarray, valence_count: np.ndarray,
+                 window: int = RISK_ROLLING_DAYS) -> Dict[str, np.ndarray]:
+    """Métricas e pontuação de todos os pacientes (linhas) de uma vez; a última coluna é hoje"""
+    patients, days = valence_count.shape
+    logged = valence_count > 0
+    daily = _divide(valence_sum, valence_count)
+    logged_days = logged.sum(axis=1)
+
+    # Média móvel ponderada pelas entradas, pelas somas acumuladas
+    cumulative_sum = np.concatenate([np.zeros((patients, 1)), np.cumsum(valence_sum, axis=1)], axis=1)
+    cumulative_count = np.concatenate([np.zeros((patients, 1)), np.cumsum(valence_count, axis=1)], axis=1)
+    end = np.arange(1, days + 1)
+    begin = np.maximum(end - window, 0)
+    rolling = _divide(cumulative_sum[:, end] - cumulative_sum[:, begin],
+                      cumulative_count[:, end] - cumulative_count[:, begin])
+    recent_mean = rolling[:, -1]
+    previous_mean = rolling[:, -1 - window] if days > window else np.full(patients, np.nan)
+    trend = recent_mean - previous_mean
+
+    # Volatilidade: desvio padrão da média diária, só nos dias com registro
+    mean_daily = _divide(np.where(logged, daily, 0).sum(axis=1), logged_days)
+    deviation = np.where(logged, daily - mean_daily[:, None], 0)
+    volatility = np.sqrt(_divide((deviation ** 2).sum(axis=1), logged_days))
+
+    # Sequências de dias negativos (contadas até o último dia com registro) e de dias sem registro
+    negative = np.less(daily, 0, out=np.zeros(daily.shape, dtype=bool), where=logged)
+    negative_runs = _run_lengths(negative)
+    gap_runs = _run_lengths(~logged)
+    days_since_last = gap_runs[:, -1]
+    last_logged = np.clip(days - 1 - days_since_last, 0, days - 1)
+    current_negative_streak = np.where(logged_days > 0, negative_runs[np.arange(patients), last_logged], 0)
+
+    # Sem registros na última janela, o nível de humor vem da média do período
+    level = np.where(np.isnan(recent_mean), mean_daily, recent_mean)
+    components = {
+        "mood_level": np.nan_to_num((1 - level) / 2),
+        "decline": np.clip(-np.nan_to_num(trend), 0, 1),
+        "volatility": np.clip(np.nan_to_num(volatility), 0, 1),
+        "negative_streak": np.clip(current_negative_streak / NEGATIVE_STREAK_MAX, 0, 1),
+        "logging_gap": np.clip(days_since_last / LOGGING_GAP_MAX, 0, 1)
+    }
+    score = 100 * sum(RISK_WEIGHTS[name] * value for name, value in components.items())
+
+    return {
+        "score": score,
+        "recent_mean": recent_mean,
+        "previous_mean": previous_mean,
+        "trend": trend,
+        "volatility": volatility,
+        "current_negative_streak": current_negative_streak,
+        "longest_negative_streak": negative_runs.max(axis=1),
+        "days_since_last_entry": np.where(logged_days > 0, days_since_last, -1),
+        "longest_gap": gap_runs.max(axis=1),
+        "logged_days": logged_days,
+        "logging_rate": logged_days / days
+    }
+
+def _number(value) -> Optional[float]:
+    """Valor do NumPy -> número do JSON (NaN vira null)"""
+    return None if np.isnan(value) else round(float(value), 3)
+
+def _risk_level(score: float, logged_days: int) -> str:
+    if not logged_days:
+        return "Sem registros"
+    return next(level for threshold, level in RISK_LEVELS if score >= threshold)
+
+def score_patients(patient_ids: List[ObjectId], days: int = 30) -> List[Dict[str, Any]]:
+    """Pontuação de risco de cada paciente nos últimos `days` dias, em lotes de RISK_BATCH_SIZE"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=days - 1)
+    results = []
+    for offset in range(0, len(patient_ids), RISK_BATCH_SIZE):
+        batch = patient_ids[offset:offset + RISK_BATCH_SIZE]
+        matrices = window_matrices(models.get_daily_mood_counts(batch, start), batch, start, days)
+        metrics = risk_metrics(matrices["valence_sum"], matrices["valence_count"])
+        usernames = {
+            user["_id"]: user.get("username")
+            for user in models.reporting_db().users.find({"_id": {"$in": batch}}, {"username": 1})
+        }
+        for index, patient_id in enumerate(batch):
+            logged_days = int(metrics["logged_days"][index])
+            score = float(metrics["score"][index])
+            results.append({
+                "user_id": str(patient_id),
+                "username": usernames.get(patient_id),
+                "risk_score": round(score, 1),
+                "risk_level": _risk_level(score, logged_days),
+                "entries": int(matrices["entries"][index]),
+                "recent_mean": _number(metrics["recent_mean"][index]),
+                "previous_mean": _number(metrics["previous_mean"][index]),
+                "trend": _number(metrics["trend"][index]),
+                "volatility": _number(metrics["volatility"][index]),
+                "current_negative_streak": int(metrics["current_negative_streak"][index]),
+                "longest_negative_streak": int(metrics["longest_negative_streak"][index]),
+                "days_since_last_entry": int(metrics["days_since_last_entry"][index]) if logged_days else None,
+                "longest_gap": int(metrics["longest_gap"][index]),
+                "logging_rate": round(float(metrics["logging_rate"][index]), 3)
+            })
+    # Maior risco primeiro; pacientes sem registros no fim
+    results.sort(key=lambda patient: (patient["risk_level"] == "Sem registros", -patient["risk_score"]))
+    return results
+
+def professional_risk(professional: Dict[str, Any], days: int = 30) -> Dict[str, Any]:
+    """Pacientes do profissional ordenados pela pontuação de risco"""
+    patient_ids = models.list_professional_patient_ids(professional)
+    patients = score_patients(patient_ids, days=days)
+    levels = {level: 0 for _, level in RISK_LEVELS}
+    levels["Sem registros"] = 0
+    for patient in patients:
+        levels[patient["risk_level"]] += 1
+    logger.info(f"Risco calculado para {len(patients)} pacientes ({days} dias)", extra={"sample": True})
+    return {
+        "professional_id": str(professional["_id"]),
+        "period_days": days,
+        "rolling_days": RISK_ROLLING_DAYS,
+        "patients": patients,
+        "levels": levels,
+        "total": len(patients)
+    }
@@ -0,0 +1,51 @@
+"""
+Configuração do gunicorn para rodar o report-service com vários workers:
+
+    gunicorn -c gunicorn.conf.py report_app:app
+
+O app não é pré-carregado (preload_app): as threads de fundo (lifecycle,
+invalidação) não sobrevivem ao fork e cada worker importa o
+report_app por conta própria. Só as dependências pesadas e sem estado são
+importadas aqui, uma vez, no processo mestre: os workers herdam os módulos já
+carregados e compartilham essas páginas de memória em vez de importar o
+ReportLab e o NumPy cada um.
+"""
+import gc
+import os
+import subprocess
+import sys
+
+# Gerador de PDF e ReportLab (ver tools/startup_bench.py)
+import pdf_generator  # noqa: F401
+# Pontuação de risco e NumPy
+import analytics  # noqa: F401
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5001)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+# Threads por worker: PDFs e estatísticas concorrentes. O feed SSE, que mantém uma
+# conexão aberta por profissional, roda à parte no stream_app (uvicorn)
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+# PDFs detalhados podem levar mais que o padrão de 30 s
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+# Pré-renderização agendada (PRERENDER_AT): um único processo, filho do mestre.
+# Dentro dos workers haveria um agendador (e um pool de PRERENDER_WORKERS) por worker
+_prerender_scheduler = None
+
+def when_ready(server):
+    global _prerender_scheduler
+    if os.getenv("PRERENDER_AT"):
+        _prerender_scheduler = subprocess.Popen(
+            [sys.executable, "prerender.py", "schedule", "--at", os.getenv("PRERENDER_AT")],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        server.log.info(f"Agendador de pré-renderização iniciado (pid {_prerender_scheduler.pid})")
+
+def on_exit(server):
+    if _prerender_scheduler and _prerender_scheduler.poll() is None:
+        _prerender_scheduler.terminate()
+
+# Objetos já criados vão para a geração permanente: a coleta de lixo nos
+# workers não toca neles, e as páginas herdadas não são copiadas
+gc.freeze()
@@ -0,0 +1,211 @@
+"""
+Feed em tempo real dos humores dos pacientes (Server-Sent Events), servido
+pelo stream_app (Starlette + motor) em um processo próprio.
+
+Um único change stream em mood_entries por processo, aberto no primeiro
+assinante, alimenta todas as conexões: cada evento vai para a fila das
+assinaturas que acompanham o paciente da entrada. Tudo roda no event loop:
+uma conexão aberta custa uma fila e uma corrotina, não uma thread.
+
+O id de cada evento SSE é o resume token do change stream. Os eventos
+recentes ficam em um buffer circular. Uma reconexão com Last-Event-ID recebe
+o que perdeu; se o token já saiu do buffer (ou o processo reiniciou), recebe
+um evento "reset" e recarrega os dados.
+
+Change streams exigem replica set (o docker-compose sobe o mongo como replica
+set de um nó) e não funcionam em coleções time-series: com
+MOOD_STORE=timeseries o app-main grava cada entrada nova ou editada também em
+mood_events (coleção comum, com TTL), e o stream é aberto nela.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+MOOD_STORE = os.getenv("MOOD_STORE", "legacy")
+BUFFER_SIZE = int(os.getenv("FEED_BUFFER_SIZE", 10000))
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("FEED_SUBSCRIBER_QUEUE_SIZE", 100))
+HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", 15))
+RECONNECT_MS = 3000
+# Resume token que já saiu do oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+_PIPELINE = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+# Eventos gravados pelo app-main com MOOD_STORE=timeseries: {"op", "mood", "created_at"}
+MOOD_EVENTS = "mood_events"
+_EVENTS_PIPELINE = [{"$match": {"operationType": "insert"}}]
+
+class Subscription:
+    """Uma conexão aberta: pacientes acompanhados e fila de eventos"""
+    def __init__(self, patient_ids: Optional[Set[str]]):
+        self.patient_ids = patient_ids  # None = todos os pacientes
+        self.events: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = False
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        return self.patient_ids is None or event.get("user_id") in self.patient_ids
+
+    def offer(self, event: Dict[str, Any]):
+        try:
+            self.events.put_nowait(event)
+        except asyncio.QueueFull:
+            # Conexão lenta: é encerrada e o navegador reconecta com Last-Event-ID
+            self.dropped = True
+
+def _mood_json(doc: Dict[str, Any]) -> Dict[str, Any]:
+    song = doc.get("song")
+    return {
+        "_id": str(doc["_id"]),
+        "user_id": str(doc["user_id"]),
+        "emoji": doc.get("emoji"),
+        "comment": doc.get("comment", ""),
+        "song_id": str(doc["song_id"]) if doc.get("song_id") else None,
+        "song": {"title": song.get("title"), "artist": song.get("artist")} if song else None,
+        "created_at": doc["created_at"].isoformat() if doc.get("created_at") else None
+    }
+
+class MoodFeed:
+    """
+    Estado do feed, acessado só de dentro do event loop: subscribe, unsubscribe e
+    _publish não têm await, então não precisam de lock.
+    """
+    def __init__(self):
+        self.db = None
+        self.error: Optional[str] = None
+        self._by_patient: Dict[str, Set[Subscription]] = {}
+        self._everyone: Set[Subscription] = set()
+        self._buffer: "deque[Dict[str, Any]]" = deque(maxlen=BUFFER_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"events": 0, "subscribers": 0, "dropped": 0, "resets": 0}
+
+    def init(self, database):
+        """database: AsyncIOMotorDatabase"""
+        self.db = database
+
+    def _source(self):
+        """Coleção observada e pipeline do change stream"""
+        if MOOD_STORE == "timeseries":
+            return self.db[MOOD_EVENTS], _EVENTS_PIPELINE
+        return self.db.mood_entries, _PIPELINE
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch(), name="mood-feed")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def subscribe(self, patient_ids: Optional[Set[str]], last_event_id: Optional[str] = None
+                  ) -> Tuple[Subscription, List[Dict[str, Any]], bool]:
+        """Registrar uma conexão; devolve a assinatura, os eventos a repetir e se precisa de reset"""
+        self._ensure_started()
+        subscription = Subscription(patient_ids)
+        replay, reset = [], False
+        if last_event_id:
+            events = list(self._buffer)
+            position = next((i for i, event in enumerate(events) if event["id"] == last_event_id), None)
+            if position is None:
+                reset = True
+            else:
+                replay = [event for event in events[position + 1:] if subscription.wants(event)]
+        if patient_ids is None:
+            self._everyone.add(subscription)
+        else:
+            for patient_id in patient_ids:
+                self._by_patient.setdefault(patient_id, set()).add(subscription)
+        self.stats["subscribers"] += 1
+        return subscription, replay, reset
+
+    def unsubscribe(self, subscription: Subscription):
+        self._everyone.discard(subscription)
+        for patient_id in subscription.patient_ids or ():
+            subscribers = self._by_patient.get(patient_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_patient[patient_id]
+        self.stats["subscribers"] -= 1
+        if subscription.dropped:
+            self.stats["dropped"] += 1
+
+    def _publish(self, event: Dict[str, Any]):
+        self._buffer.append(event)
+        self.stats["events"] += 1
+        for subscription in self._by_patient.get(event["user_id"], set()) | self._everyone:
+            subscription.offer(event)
+
+    def _reset_all(self):
+        """Eventos perdidos: todas as conexões recarregam os dados"""
+        self._buffer.clear()
+        self.stats["resets"] += 1
+        for subscription in set(self._everyone).union(*self._by_patient.values()):
+            subscription.offer({"type": "reset"})
+
+    async def _watch(self):
+        token = None
+        backoff = 1
+        while True:
+            try:
+                collection, pipeline = self._source()
+                # O próprio motor retoma o stream em erros transitórios
+                async with collection.watch(pipeline, full_document="updateLookup", resume_after=token) as stream:
+                    self.error = None
+                    backoff = 1
+                    logger.info(f"Change stream de {collection.name} aberto")
+                    async for change in stream:
+                        token = change["_id"]
+                        doc = change.get("fullDocument")
+                        if not doc:
+                            continue  # entrada apagada antes do lookup
+                        op = change["operationType"]
+                        if collection.name == MOOD_EVENTS:
+                            op, doc = doc["op"], doc["mood"]
+                        self._publish({
+                            "id": token["_data"],
+                            "op": op,
+                            "user_id": str(doc["user_id"]),
+                            "mood": _mood_json(doc)
+                        })
+            except PyMongoError as e:
+                self.error = str(e)
+                logger.error(f"Change stream do feed interrompido: {e}")
+                if isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_HISTORY_LOST:
+                    token = None
+                    self._reset_all()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+def _format(event: Dict[str, Any]) -> str:
+    if event.get("type") == "reset":
+        return "event: reset\ndata: {}\n\n"
+    payload = json.dumps({"op": event["op"], "mood": event["mood"]}, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: mood\ndata: {payload}\n\n"
+
+async def sse_events(subscription: Subscription, replay: List[Dict[str, Any]], reset: bool) -> AsyncIterator[str]:
+    """Corpo da resposta text/event-stream de uma conexão"""
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        if reset:
+            yield _format({"type": "reset"})
+        for event in replay:
+            yield _format(event)
+        while not subscription.dropped:
+            try:
+                event = await asyncio.wait_for(subscription.events.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém proxies abertos e detecta cliente que saiu
+                yield ": ping\n\n"
+                continue
+            yield _format(event)
+    finally:
+        feed.unsubscribe(subscription)
+
+feed = MoodFeed()
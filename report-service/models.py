@@ -1,40 +1,153 @@
-from datetime import datetime
+import contextvars
+import copy
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from typing import Optional, Dict, Any, List
 
+from moodtracker_common import invalidation
+from moodtracker_common.loader import BatchLoader
+
+logger = logging.getLogger(__name__)
+
 # Variável global para receber instância do db
 db = None
+# Mesmo banco, lido conforme ANALYTICS_READ_PREFERENCE (ver reporting_db)
+analytics_db = None
+
+# Leituras analíticas (estatísticas, top músicas, listagens) vão para os secundários,
+# aceitando até ANALYTICS_MAX_STALENESS_SECONDS de atraso (mínimo do MongoDB: 90; -1 = sem limite).
+# Leituras que precisam ver a própria escrita (usuário, fingerprint, PDFs salvos) ficam no primário.
+ANALYTICS_READ_PREFERENCE = os.getenv("ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+ANALYTICS_MAX_STALENESS = int(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", 90))
+_READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+_primary_only = contextvars.ContextVar("primary_only", default=False)
+
+# Onde as entradas de humor são lidas (legacy/dual: mood_entries; timeseries: mood_entries_ts).
+# Mesmo MOOD_STORE do app-main, ver tools/migrate_timeseries.py
+MOOD_STORE = os.getenv("MOOD_STORE", "legacy")
+MOODS_TIMESERIES = "mood_entries_ts"
+# A time-series não indexa _id: a busca é limitada ao redor do timestamp do ObjectId
+ID_TIME_WINDOW = timedelta(minutes=5)
+# Campos da cópia da música gravada em cada entrada de humor (app-main/song_fanout.py)
+SONG_SNAPSHOT_PROJECTION = {"title": 1, "artist": 1, "spotify_url": 1}
+# Humores registrados pelo app (nomes nos PDFs e valência na pontuação de risco, ver analytics.py)
+MOOD_NAMES = {
+    '😊': 'Feliz',
+    '😢': 'Triste',
+    '😡': 'Bravo',
+    '😰': 'Ansioso',
+    '😴': 'Cansado',
+    '🥳': 'Animado',
+    '😍': 'Apaixonado',
+    '🤔': 'Pensativo'
+}
+
+# Buscas por _id em lote, compartilhadas entre requisições concorrentes (ver loader.py)
+song_loader = BatchLoader(lambda ids: {
+    song.pop("_id"): song for song in db.songs.find({"_id": {"$in": ids}}, SONG_SNAPSHOT_PROJECTION)
+})
+username_loader = BatchLoader(lambda ids: {
+    user["_id"]: user.get("username") for user in db.users.find({"_id": {"$in": ids}}, {"username": 1})
+})
+# Usuários lidos em todo relatório; removidos quando o documento muda (ver invalidation.py)
+user_cache = invalidation.bus.register(invalidation.TaggedTTLCache(
+    float(os.getenv("USER_CACHE_TTL", 60)), int(os.getenv("USER_CACHE_SIZE", 1024))
+))
 
 def init_db(database_instance):
     """Inicializar a conexão do banco no models"""
-    global db
+    global db, analytics_db
     db = database_instance
-    print("✅ Report Models inicializado com sucesso!")
+    analytics_db = db.with_options(read_preference=analytics_read_preference())
+    logger.info("Report Models inicializado com sucesso!")
+
+def analytics_read_preference():
+    if ANALYTICS_READ_PREFERENCE == "primary":
+        return Primary()
+    return _READ_PREFERENCES[ANALYTICS_READ_PREFERENCE](max_staleness=ANALYTICS_MAX_STALENESS)
+
+@contextmanager
+def read_from_primary():
+    """Dentro do bloco, as leituras analíticas também vão para o primário"""
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+def reporting_db():
+    """Banco das leituras analíticas (o primário dentro de read_from_primary)"""
+    return db if _primary_only.get() else analytics_db
+
+def _moods(analytics: bool = False):
+    """Coleção de onde as entradas de humor são lidas"""
+    database = reporting_db() if analytics else db
+    return database[MOODS_TIMESERIES] if MOOD_STORE == "timeseries" else database.mood_entries
+
+def _find_mood(oid: ObjectId) -> Optional[Dict[str, Any]]:
+    if MOOD_STORE != "timeseries":
+        return db.mood_entries.find_one({"_id": oid})
+    created = oid.generation_time.replace(tzinfo=None)
+    mood = _moods().find_one({"_id": oid, "created_at": {"$gte": created - ID_TIME_WINDOW, "$lte": created + ID_TIME_WINDOW}})
+    # Entradas importadas podem ter created_at longe do timestamp do _id
+    return mood if mood is not None else _moods().find_one({"_id": oid})
+
+def _with_date(entry: Dict[str, Any]) -> Dict[str, Any]:
+    # A time-series não guarda o campo "date" (derivado de created_at)
+    if "date" not in entry and entry.get("created_at"):
+        entry["date"] = entry["created_at"].strftime("%Y-%m-%d")
+    return entry
 
 #  USUÁRIOS
 
+# Humores recentes embutidos pelo app-main (users.recent_moods): fora das respostas
+USER_PROJECTION = {"recent_moods": 0, "moods_version": 0}
+
 def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """Buscar usuário por ID com tratamento de erro"""
     try:
-        user = db.users.find_one({"_id": ObjectId(user_id)})
-        if user:
+        user = user_cache.get(user_id)
+        if user is None:
+            user = db.users.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
+            if not user:
+                return None
             user["_id"] = str(user["_id"])
-        return user
+            user_cache.set(user_id, user, tags=[f"user:{user_id}"])
+        # Cópia: quem chama pode alterar o dicionário
+        return copy.deepcopy(user)
     except Exception as e:
-        print(f"Erro ao buscar usuário: {e}")
+        logger.error(f"Erro ao buscar usuário: {e}")
         return None
 
+def prime_user_cache() -> int:
+    """Carregar os profissionais no cache (lidos em toda chamada do dashboard); devolve quantos"""
+    primed = 0
+    for user in db.users.find({"user_type": "professional"}, USER_PROJECTION).limit(user_cache.max_size):
+        user["_id"] = str(user["_id"])
+        user_cache.set(user["_id"], user, tags=[f"user:{user['_id']}"])
+        primed += 1
+    return primed
+
 def list_all_users() -> List[Dict[str, Any]]:
     """Listar todos os usuários"""
     try:
         users = []
-        for user in db.users.find():
+        for user in reporting_db().users.find({}, USER_PROJECTION):
             user["_id"] = str(user["_id"])
             user.pop('password_hash', None)  # Remover senha por segurança
             users.append(user)
         return users
     except Exception as e:
-        print(f"Erro ao listar usuários: {e}")
+        logger.error(f"Erro ao listar usuários: {e}")
         return []
 
 #  MÚSICAS
@@ -47,7 +160,7 @@ def get_song(song_id: str) -> Optional[Dict[str, Any]]:
             song["_id"] = str(song["_id"])
         return song
     except Exception as e:
-        print(f"Erro ao buscar música: {e}")
+        logger.error(f"Erro ao buscar música: {e}")
         return None
 
 def list_songs(limit: int = 50) -> List[Dict[str, Any]]:
@@ -59,7 +172,7 @@ def list_songs(limit: int = 50) -> List[Dict[str, Any]]:
             songs.append(song)
         return songs
     except Exception as e:
-        print(f"Erro ao listar músicas: {e}")
+        logger.error(f"Erro ao listar músicas: {e}")
         return []
 
 #  ENTRADAS DE HUMOR
@@ -67,8 +180,9 @@ def list_songs(limit: int = 50) -> List[Dict[str, Any]]:
 def get_mood_entry(mood_id: str) -> Optional[Dict[str, Any]]:
     """Buscar entrada de mood por ID"""
     try:
-        mood = db.mood_entries.find_one({"_id": ObjectId(mood_id)})
+        mood = _find_mood(ObjectId(mood_id))
         if mood:
+            _with_date(mood)
             mood["_id"] = str(mood["_id"])
             mood["user_id"] = str(mood["user_id"])
             if mood.get("song_id"):
@@ -77,14 +191,15 @@ def get_mood_entry(mood_id: str) -> Optional[Dict[str, Any]]:
                 mood["song_id"] = None
         return mood
     except Exception as e:
-        print(f"Erro ao buscar mood: {e}")
+        logger.error(f"Erro ao buscar mood: {e}")
         return None
 
 def list_mood_entries(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
     """Listar entradas de humor de um usuário"""
     try:
         entries = []
-        for entry in db.mood_entries.find({"user_id": ObjectId(user_id)}).sort("created_at", -1).limit(limit):
+        for entry in _moods().find({"user_id": ObjectId(user_id)}).sort("created_at", -1).limit(limit):
+            _with_date(entry)
             entry["_id"] = str(entry["_id"])
             entry["user_id"] = str(entry["user_id"])
             
@@ -97,32 +212,19 @@ def list_mood_entries(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
             entries.append(entry)
         return entries
     except Exception as e:
-        print(f"Erro ao listar entradas de humor: {e}")
+        logger.error(f"Erro ao listar entradas de humor: {e}")
         return []
 
 def get_mood_entries_with_songs(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-    """Buscar entradas de humor com informações das músicas (JOIN)"""
+    """Buscar entradas de humor com informações das músicas (cópia gravada na entrada, sem JOIN)"""
     try:
-        pipeline = [
-            {"$match": {"user_id": ObjectId(user_id)}},
-            {"$sort": {"created_at": -1}},
-            {"$limit": limit},
-            {"$lookup": {
-                "from": "songs",
-                "localField": "song_id",
-                "foreignField": "_id", 
-                "as": "song_info"
-            }},
-            {"$lookup": {
-                "from": "users",
-                "localField": "user_id",
-                "foreignField": "_id",
-                "as": "user_info"
-            }}
-        ]
+        uid = ObjectId(user_id)
+        entries = _attach_songs(list(_moods().find({"user_id": uid}).sort("created_at", -1).limit(limit)))
+        username = username_loader.load(uid)
         
         results = []
-        for entry in db.mood_entries.aggregate(pipeline):
+        for entry in entries:
+            _with_date(entry)
             entry["_id"] = str(entry["_id"])
             entry["user_id"] = str(entry["user_id"])
             if "song_id" in entry and entry["song_id"]:
@@ -131,34 +233,152 @@ def get_mood_entries_with_songs(user_id: str, limit: int = 10) -> List[Dict[str,
                 entry["song_id"] = None
             
             # Adicionar info da música e usuário
-            if entry["song_info"]:
-                entry["song"] = entry["song_info"][0]
-                entry["song"]["_id"] = str(entry["song"]["_id"])
-            
-            if entry["user_info"]:
-                entry["user"] = {"username": entry["user_info"][0]["username"]}
+            if entry["song"]:
+                entry["song"]["_id"] = entry["song_id"]
+            else:
+                entry.pop("song")
             
-            # Limpar campos auxiliares
-            entry.pop("song_info", None)
-            entry.pop("user_info", None)
+            if username:
+                entry["user"] = {"username": username}
             
             results.append(entry)
         
         return results
         
     except Exception as e:
-        print(f"Erro ao buscar entradas com músicas: {e}")
+        logger.error(f"Erro ao buscar entradas com músicas: {e}")
         return []
 
+def iter_mood_entries_batches(user_id: str, days: int = 30, batch_size: int = 200):
+    """
+    Percorrer as entradas de humor do período em lotes (ordem cronológica),
+    já com as informações da música. Nunca mantém mais de um lote em memória.
+    """
+    start_date = datetime.utcnow() - timedelta(days=days)
+    cursor = _moods(analytics=True).find(
+        {"user_id": ObjectId(user_id), "created_at": {"$gte": start_date}},
+        {"emoji": 1, "comment": 1, "song_id": 1, "song": 1, "created_at": 1}
+    ).sort("created_at", 1).batch_size(batch_size)
+
+    try:
+        batch = []
+        for entry in cursor:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield _attach_songs(batch)
+                batch = []
+        if batch:
+            yield _attach_songs(batch)
+    finally:
+        cursor.close()
+
+def _attach_songs(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Música de cada entrada: a cópia gravada pelo app-main (null se a música foi
+    apagada). Entradas anteriores à cópia: músicas distintas buscadas em lote.
+    """
+    missing = {entry["song_id"] for entry in entries if entry.get("song_id") and "song" not in entry}
+    songs = song_loader.load_many(missing) if missing else {}
+
+    for entry in entries:
+        if "song" not in entry:
+            song = songs.get(entry.get("song_id"))
+            # Documento compartilhado com outras requisições: cada entrada recebe uma cópia
+            entry["song"] = dict(song) if song else None
+    return entries
+
+def get_mood_fingerprint(user_id: str) -> Dict[str, Any]:
+    """Quantidade e última alteração das entradas do usuário (muda a cada escrita)"""
+    pipeline = [
+        {"$match": {"user_id": ObjectId(user_id)}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "last_update": {"$max": "$updated_at"}
+        }}
+    ]
+    result = list(_moods().aggregate(pipeline))
+    if not result:
+        return {"count": 0, "last_update": None}
+    return {"count": result[0]["count"], "last_update": result[0]["last_update"]}
+
+def list_linked_patient_ids() -> List[str]:
+    """IDs de todos os pacientes vinculados a algum profissional"""
+    try:
+        patient_ids = set()
+        users = reporting_db().users
+        for professional in users.find({"user_type": "professional"}, {"patients": 1}):
+            for patient_id in professional.get("patients") or []:
+                patient_ids.add(str(patient_id))
+
+        for patient in users.find(
+            {"user_type": "patient", "linked_professional": {"$ne": None}},
+            {"_id": 1}
+        ):
+            patient_ids.add(str(patient["_id"]))
+
+        return sorted(patient_ids)
+    except Exception as e:
+        logger.error(f"Erro ao listar pacientes vinculados: {e}")
+        return []
+
+def list_professional_patient_ids(professional: Dict[str, Any]) -> List[ObjectId]:
+    """
+    Pacientes vinculados ao profissional (lista "patients" dele e pacientes com
+    linked_professional apontando para ele). Sem vínculos: todos os pacientes,
+    como em /reports/patients.
+    """
+    users = reporting_db().users
+    professional_id = ObjectId(professional["_id"])
+    patient_ids = {ObjectId(patient_id) for patient_id in professional.get("patients") or [] if ObjectId.is_valid(patient_id)}
+    for patient in users.find(
+        {"user_type": "patient", "linked_professional": {"$in": [professional_id, str(professional_id)]}},
+        {"_id": 1}
+    ):
+        patient_ids.add(patient["_id"])
+    if not patient_ids:
+        patient_ids = {patient["_id"] for patient in users.find({"user_type": "patient"}, {"_id": 1})}
+    return sorted(patient_ids)
+
+def get_daily_mood_counts(user_ids: List[ObjectId], start_date: datetime) -> List[Dict[str, Any]]:
+    """Contagem de entradas por (usuário, dia UTC, emoji) desde start_date, para vários usuários de uma vez"""
+    pipeline = [
+        {"$match": {"user_id": {"$in": user_ids}, "created_at": {"$gte": start_date}}},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "emoji": "$emoji"
+            },
+            "count": {"$sum": 1}
+        }}
+    ]
+    return list(_moods(analytics=True).aggregate(pipeline))
+
 #  FUNÇÃO PRINCIPAL DE ESTATÍSTICAS
+def _fill_top_song_titles(top_songs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Grupos só com entradas anteriores à cópia da música: buscar em songs"""
+    missing = [item["_id"] for item in top_songs if item["song_title"] is None]
+    if not missing:
+        return top_songs
+    songs = song_loader.load_many(missing)
+    filled = []
+    for item in top_songs:
+        if item["song_title"] is None:
+            song = songs.get(item["_id"])
+            if not song:
+                continue  # música apagada
+            item["song_title"] = song.get("title")
+            item["song_artist"] = song.get("artist")
+        filled.append(item)
+    return filled
+
 def get_user_mood_stats(user_id: str, days: int = 30) -> Dict[str, Any]:
     """
      Estatísticas de humor do usuário - VERSÃO COMPLETA PARA RELATÓRIOS
     """
     try:
-        from datetime import timedelta
-        
-        print(f"📊 Gerando estatísticas para usuário {user_id} (últimos {days} dias)")
+        logger.info(f"Gerando estatísticas para usuário {user_id} (últimos {days} dias)", extra={"sample": True})
         
         # Verificar se usuário existe
         user = get_user_by_id(user_id)
@@ -180,46 +400,46 @@ def get_user_mood_stats(user_id: str, days: int = 30) -> Dict[str, Any]:
             {"$sort": {"count": -1}}
         ]
         
-        mood_distribution = list(db.mood_entries.aggregate(pipeline))
+        mood_distribution = list(_moods(analytics=True).aggregate(pipeline))
         total_entries_period = sum(item["count"] for item in mood_distribution)
         
         # Estatísticas gerais (todos os tempos)
-        total_all_time = db.mood_entries.count_documents({"user_id": ObjectId(user_id)})
+        total_all_time = _moods(analytics=True).count_documents({"user_id": ObjectId(user_id)})
         
         # Humor mais comum
         most_common_mood = mood_distribution[0]["_id"] if mood_distribution else None
         
         # Estatísticas adicionais para relatórios
-        unique_days_with_entries = len(list(db.mood_entries.distinct("date", {
-            "user_id": ObjectId(user_id),
-            "created_at": {"$gte": start_date}
-        })))
+        # Dias distintos calculados a partir de created_at (a time-series não tem "date")
+        unique_days_with_entries = next(_moods(analytics=True).aggregate([
+            {"$match": {
+                "user_id": ObjectId(user_id),
+                "created_at": {"$gte": start_date}
+            }},
+            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}}},
+            {"$count": "days"}
+        ]), {"days": 0})["days"]
         
         # Músicas mais associadas aos humores
         songs_pipeline = [
             {"$match": {
                 "user_id": ObjectId(user_id),
                 "created_at": {"$gte": start_date},
-                "song_id": {"$exists": True, "$ne": None}
-            }},
-            {"$lookup": {
-                "from": "songs",
-                "localField": "song_id",
-                "foreignField": "_id",
-                "as": "song_info"
+                "song_id": {"$exists": True, "$ne": None},
+                # song: null = música apagada
+                "song": {"$not": {"$type": "null"}}
             }},
-            {"$unwind": "$song_info"},
             {"$group": {
                 "_id": "$song_id",
                 "count": {"$sum": 1},
-                "song_title": {"$first": "$song_info.title"},
-                "song_artist": {"$first": "$song_info.artist"}
+                "song_title": {"$max": "$song.title"},
+                "song_artist": {"$max": "$song.artist"}
             }},
             {"$sort": {"count": -1}},
             {"$limit": 5}
         ]
         
-        top_songs = list(db.mood_entries.aggregate(songs_pipeline))
+        top_songs = _fill_top_song_titles(list(_moods(analytics=True).aggregate(songs_pipeline)))
         
         result = {
             "user_id": user_id,
@@ -243,11 +463,11 @@ def get_user_mood_stats(user_id: str, days: int = 30) -> Dict[str, Any]:
             }
         }
         
-        print(f"✅ Estatísticas geradas: {total_entries_period} entradas no período")
+        logger.info(f"Estatísticas geradas: {total_entries_period} entradas no período", extra={"sample": True})
         return result
         
     except Exception as e:
-        print(f"❌ Erro ao gerar estatísticas: {e}")
+        logger.error(f"Erro ao gerar estatísticas: {e}")
         return {"error": f"Erro ao gerar estatísticas: {str(e)}"}
 
 # FUNÇÃO ADICIONAL: COMPARAR PERÍODOS
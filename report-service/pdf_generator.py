@@ -6,55 +6,20 @@ from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from io import BytesIO
 from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+import os
+import tempfile
 import models
 
+# Acima deste tamanho o PDF detalhado é movido da memória para o disco
+SPOOL_MAX_SIZE = int(os.getenv("PDF_SPOOL_MAX_SIZE", 5 * 1024 * 1024))
+
 def get_mood_name(emoji):
     """Mapear emojis para nomes"""
-    mood_names = {
-        '😊': 'Feliz',
-        '😢': 'Triste', 
-        '😡': 'Bravo',
-        '😰': 'Ansioso',
-        '😴': 'Cansado',
-        '🥳': 'Animado',
-        '😍': 'Apaixonado',
-        '🤔': 'Pensativo'
-    }
-    return mood_names.get(emoji, 'Desconhecido')
+    return models.MOOD_NAMES.get(emoji, 'Desconhecido')
 
-def generate_mood_report_pdf(user_id, days=30, is_professional=False):
-    """
-    Gerar PDF do relatório de humor
-    
-    Args:
-        user_id: ID do usuário
-        days: Período em dias (padrão 30)
-        is_professional: Se True, inclui informações adicionais para profissionais
-    
-    Returns:
-        BytesIO: Buffer com o PDF gerado
-    """
-    
-    # Buscar dados
-    stats = models.get_user_mood_stats(user_id, days=days)
-    
-    if 'error' in stats:
-        raise Exception(f"Erro ao gerar dados: {stats['error']}")
-    
-    # Criar buffer para o PDF
-    buffer = BytesIO()
-    
-    # Configurar documento
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=72,
-        leftMargin=72,
-        topMargin=72,
-        bottomMargin=18
-    )
-    
-    # Estilos
+def _get_report_styles():
+    """Estilos compartilhados pelos relatórios"""
     styles = getSampleStyleSheet()
     
     # Estilo customizado para título
@@ -84,6 +49,27 @@ def generate_mood_report_pdf(user_id, days=30, is_professional=False):
         spaceAfter=12
     )
     
+    footer_style = ParagraphStyle(
+        'Footer',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=colors.HexColor('#64748b'),
+        alignment=TA_CENTER
+    )
+    
+    return {
+        'title': title_style,
+        'subtitle': subtitle_style,
+        'normal': normal_style,
+        'footer': footer_style
+    }
+
+def _build_summary_elements(stats, days, is_professional, styles, now_brazil):
+    """Cabeçalho, resumo, distribuição, músicas e observações do relatório"""
+    title_style = styles['title']
+    subtitle_style = styles['subtitle']
+    normal_style = styles['normal']
+    
     # Lista para elementos do PDF
     elements = []
     
@@ -101,9 +87,9 @@ def generate_mood_report_pdf(user_id, days=30, is_professional=False):
         elements.append(Paragraph(f"<b>Usuário:</b> {username}", normal_style))
     
     elements.append(Paragraph(f"<b>Período:</b> Últimos {days} dias", normal_style))
-    now_local = datetime.now()
-    now_brazil = datetime.utcnow() - timedelta(hours=3)
-    elements.append(Paragraph(f"<b>Gerado em:</b> {now_brazil.strftime('%d/%m/%Y às %H:%M')}", normal_style))
+    # Só o dia (o período "últimos N dias" já depende dele): com a hora, os mesmos dados
+    # renderizados em outro minuto dariam outros bytes e o report_store não deduplicaria
+    elements.append(Paragraph(f"<b>Gerado em:</b> {now_brazil.strftime('%d/%m/%Y')}", normal_style))
     elements.append(Spacer(1, 20))
     
     # 📊 RESUMO GERAL
@@ -223,22 +209,63 @@ def generate_mood_report_pdf(user_id, days=30, is_professional=False):
     
     elements.append(Spacer(1, 30))
     
-    #  RODAPÉ
+    return elements
+
+def _build_footer_elements(is_professional, styles, now_brazil):
+    """Rodapé do relatório"""
+    footer_style = styles['footer']
+    
     if is_professional:
         footer_text = "Este relatório foi gerado para fins profissionais de acompanhamento psicológico."
     else:
         footer_text = "Este é seu relatório pessoal de humor. Utilize-o para acompanhar seu bem-estar."
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#64748b'),
-        alignment=TA_CENTER
+    return [
+        Paragraph(footer_text, footer_style),
+        Paragraph(f"Gerado por Registra.Mood em {now_brazil.strftime('%d/%m/%Y')}", footer_style)
+    ]
+
+def _create_document(output):
+    """Configurar documento A4 padrão dos relatórios"""
+    # invariant: sem data de criação/ID aleatório, mesmo conteúdo gera os mesmos bytes
+    return SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=18,
+        invariant=1
     )
+
+def generate_mood_report_pdf(user_id, days=30, is_professional=False):
+    """
+    Gerar PDF do relatório de humor
+    
+    Args:
+        user_id: ID do usuário
+        days: Período em dias (padrão 30)
+        is_professional: Se True, inclui informações adicionais para profissionais
+    
+    Returns:
+        BytesIO: Buffer com o PDF gerado
+    """
+    
+    # Buscar dados
+    stats = models.get_user_mood_stats(user_id, days=days)
+    
+    if 'error' in stats:
+        raise Exception(f"Erro ao gerar dados: {stats['error']}")
+    
+    # Criar buffer para o PDF
+    buffer = BytesIO()
+    doc = _create_document(buffer)
     
-    elements.append(Paragraph(footer_text, footer_style))
-    elements.append(Paragraph(f"Gerado por Registra.Mood em {now_brazil.strftime('%d/%m/%Y')}", footer_style))
+    styles = _get_report_styles()
+    now_brazil = datetime.utcnow() - timedelta(hours=3)
+    
+    elements = _build_summary_elements(stats, days, is_professional, styles, now_brazil)
+    elements.extend(_build_footer_elements(is_professional, styles, now_brazil))
     
     # Construir PDF
     doc.build(elements)
@@ -247,6 +274,107 @@ def generate_mood_report_pdf(user_id, days=30, is_professional=False):
     buffer.seek(0)
     return buffer
 
+class _LazyFlowables(list):
+    """
+    Lista de flowables que se reabastece a partir de um gerador.
+    O ReportLab consome a lista pela frente (del flowables[0]), então
+    só o lote atual fica em memória durante a diagramação.
+    """
+    def __init__(self, batches):
+        super().__init__()
+        self._batches = iter(batches)
+
+    def _refill(self):
+        while not list.__len__(self):
+            batch = next(self._batches, None)
+            if batch is None:
+                return
+            self.extend(batch)
+
+    def __len__(self):
+        self._refill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._refill()
+        return list.__getitem__(self, index)
+
+def _build_entry_tables(batches, styles):
+    """Gerar uma tabela de registros por lote de entradas"""
+    cell_style = ParagraphStyle(
+        'EntryCell',
+        parent=styles['normal'],
+        fontSize=9,
+        leading=11,
+        spaceAfter=0
+    )
+
+    for entries in batches:
+        rows = [['Data', 'Humor', 'Comentário', 'Música']]
+        for entry in entries:
+            created_brazil = entry['created_at'] - timedelta(hours=3)
+            song = entry.get('song')
+            song_text = f"{song.get('title', 'N/A')} - {song.get('artist', 'N/A')}" if song else '-'
+            rows.append([
+                created_brazil.strftime('%d/%m/%Y %H:%M'),
+                f"{entry.get('emoji', '')} {get_mood_name(entry.get('emoji', ''))}",
+                Paragraph(escape(entry.get('comment') or '-'), cell_style),
+                Paragraph(escape(song_text), cell_style)
+            ])
+
+        entries_table = Table(rows, colWidths=[1.1*inch, 1.1*inch, 2.2*inch, 1.8*inch], repeatRows=1)
+        entries_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8fafc')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#4f46e5')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0'))
+        ]))
+        yield [entries_table]
+
+def generate_detailed_mood_report_pdf(user_id, days=30, is_professional=False, batch_size=200):
+    """
+    Gerar PDF detalhado (todas as entradas com comentário e música)
+
+    As entradas são lidas do cursor em lotes e diagramadas conforme chegam,
+    e o PDF é escrito em um SpooledTemporaryFile (vai para o disco acima de
+    SPOOL_MAX_SIZE), então a memória não cresce com o histórico do paciente.
+
+    Returns:
+        SpooledTemporaryFile: Arquivo posicionado no início com o PDF gerado
+    """
+
+    stats = models.get_user_mood_stats(user_id, days=days)
+
+    if 'error' in stats:
+        raise Exception(f"Erro ao gerar dados: {stats['error']}")
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        doc = _create_document(output)
+
+        styles = _get_report_styles()
+        now_brazil = datetime.utcnow() - timedelta(hours=3)
+
+        def sections():
+            yield _build_summary_elements(stats, days, is_professional, styles, now_brazil)
+            yield [Paragraph("📝 Registros do Período", styles['subtitle'])]
+            batches = models.iter_mood_entries_batches(user_id, days=days, batch_size=batch_size)
+            yield from _build_entry_tables(batches, styles)
+            yield [Spacer(1, 30)] + _build_footer_elements(is_professional, styles, now_brazil)
+
+        doc.build(_LazyFlowables(sections()))
+    except Exception:
+        output.close()
+        raise
+
+    output.seek(0)
+    return output
+
 def create_simple_pdf_test():
     """Função simples para testar se o PDF está funcionando"""
     buffer = BytesIO()
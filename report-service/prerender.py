@@ -0,0 +1,264 @@
+"""
+Pré-renderização dos relatórios semanais/mensais em horário de baixo uso.
+
+Via cron:
+    python prerender.py run [--days 7 30] [--workers 2] [--force]
+    python prerender.py status
+    python prerender.py gc
+
+Ou agendada: `python prerender.py schedule --at 03:00` (UTC) dispara a mesma
+rotina uma vez por dia. Com PRERENDER_AT=HH:MM, o mestre do gunicorn sobe esse
+processo (um só, não um por worker; ver gunicorn.conf.py).
+
+Cada execução grava suas tarefas em `prerender_tasks`. As tarefas são
+reservadas com um lease, então vários processos podem dividir o trabalho
+e uma execução interrompida é retomada de onde parou.
+"""
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+
+from pymongo import MongoClient, ReturnDocument, ASCENDING
+
+from moodtracker_common import log_config
+import models
+import report_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERIODS = [7, 30]
+DEFAULT_WORKERS = int(os.getenv("PRERENDER_WORKERS", 2))
+LEASE_SECONDS = int(os.getenv("PRERENDER_LEASE_SECONDS", 300))
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 10  # segundos
+
+# Variável global para receber instância do db
+db = None
+
+def init(database_instance):
+    """Inicializar a pré-renderização"""
+    global db
+    db = database_instance
+
+def ensure_indexes():
+    """Criar os índices da fila de pré-renderização (idempotente)"""
+    db.prerender_tasks.create_index(
+        [("run_id", ASCENDING), ("user_id", ASCENDING), ("days", ASCENDING)],
+        unique=True
+    )
+    db.prerender_tasks.create_index([("run_id", ASCENDING), ("status", ASCENDING)])
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _start_run(periods: List[int], force: bool = False) -> Optional[str]:
+    """Criar (ou retomar) a execução do dia e enfileirar as tarefas que faltam"""
+    now = datetime.utcnow()
+    run_id = now.strftime("%Y-%m-%d")
+    if force:
+        run_id = f"{run_id}-{now.strftime('%H%M%S')}"
+
+    run = db.prerender_runs.find_one_and_update(
+        {"_id": run_id},
+        {"$setOnInsert": {"status": "running", "periods": periods, "started_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if run["status"] == "finished":
+        logger.info(f"Pré-renderização {run_id} já concluída")
+        return None
+
+    # Enfileirar apenas o que ainda não existe: retomar não duplica tarefas
+    patient_ids = models.list_linked_patient_ids()
+    for user_id in patient_ids:
+        for days in run["periods"]:
+            db.prerender_tasks.update_one(
+                {"run_id": run_id, "user_id": user_id, "days": days},
+                {"$setOnInsert": {"status": "pending", "attempts": 0, "created_at": now}},
+                upsert=True
+            )
+
+    logger.info(f"Pré-renderização {run_id}: {len(patient_ids)} pacientes, períodos {run['periods']}")
+    return run_id
+
+def _claim_task(run_id: str) -> Optional[Dict[str, Any]]:
+    """Reservar a próxima tarefa pendente (ou cujo lease expirou)"""
+    now = datetime.utcnow()
+    return db.prerender_tasks.find_one_and_update(
+        {
+            "run_id": run_id,
+            "$or": [
+                {"status": "pending"},
+                {"status": "running", "lease_until": {"$lt": now}}
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": _worker_id(),
+                "lease_until": now + timedelta(seconds=LEASE_SECONDS)
+            },
+            "$inc": {"attempts": 1}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+
+def _render_task(task: Dict[str, Any]):
+    """Renderizar e salvar o relatório profissional de uma tarefa"""
+    user_id = task["user_id"]
+    days = task["days"]
+
+    if report_store.get_current_report(user_id, days, True):
+        return "skipped"
+
+    # Fingerprint lido antes de renderizar: uma escrita no meio invalida a cópia
+    fingerprint = models.get_mood_fingerprint(user_id)
+    import pdf_generator
+    with models.read_from_primary():
+        pdf_buffer = pdf_generator.generate_mood_report_pdf(
+            user_id=user_id,
+            days=days,
+            is_professional=True
+        )
+    report_store.save_report(user_id, days, True, pdf_buffer.getvalue(), fingerprint)
+    return "rendered"
+
+def _work(run_id: str):
+    """Consumir tarefas até a fila da execução esvaziar"""
+    while True:
+        task = _claim_task(run_id)
+        if not task:
+            return
+
+        try:
+            outcome = _render_task(task)
+            db.prerender_tasks.update_one(
+                {"_id": task["_id"]},
+                {"$set": {"status": "done", "outcome": outcome, "finished_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            status = "failed" if task["attempts"] >= MAX_ATTEMPTS else "pending"
+            db.prerender_tasks.update_one(
+                {"_id": task["_id"]},
+                {"$set": {"status": status, "error": str(e)}}
+            )
+            logger.exception(f"Erro ao pré-renderizar {task['user_id']} ({task['days']} dias): {e}")
+
+def get_progress(run_id: str) -> Dict[str, int]:
+    """Contagem de tarefas por status"""
+    counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+    for item in db.prerender_tasks.aggregate([
+        {"$match": {"run_id": run_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        counts[item["_id"]] = item["count"]
+    counts["total"] = sum(counts.values())
+    return counts
+
+def _report_progress(run_id: str) -> Dict[str, int]:
+    progress = get_progress(run_id)
+    db.prerender_runs.update_one(
+        {"_id": run_id},
+        {"$set": {"progress": progress, "updated_at": datetime.utcnow()}}
+    )
+    logger.info(f"{run_id}: {progress['done']}/{progress['total']} concluídas, "
+                f"{progress['failed']} com falha, {progress['running']} em andamento",
+                extra={"fields": {"run_id": run_id, "progress": progress}})
+    return progress
+
+def run_prerender(periods: List[int] = None, workers: int = DEFAULT_WORKERS, force: bool = False) -> Optional[Dict[str, int]]:
+    """Executar (ou retomar) a pré-renderização do dia"""
+    run_id = _start_run(periods or DEFAULT_PERIODS, force=force)
+    if not run_id:
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_work, run_id) for _ in range(workers)]
+        while not all(future.done() for future in futures):
+            time.sleep(PROGRESS_INTERVAL)
+            _report_progress(run_id)
+
+    progress = _report_progress(run_id)
+    # Tarefas de outro processo ainda em andamento: quem terminar por último encerra a execução
+    if progress["pending"] == 0 and progress["running"] == 0:
+        db.prerender_runs.update_one(
+            {"_id": run_id},
+            {"$set": {"status": "finished", "finished_at": datetime.utcnow()}}
+        )
+        logger.info(f"Pré-renderização {run_id} concluída")
+        removed = report_store.collect_garbage()
+        logger.info(f"{removed} PDFs sem referência removidos")
+    return progress
+
+def _seconds_until(at: str) -> float:
+    hour, minute = (int(part) for part in at.split(":"))
+    now = datetime.utcnow()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+def start_scheduler(at: str, periods: List[int] = None, workers: int = DEFAULT_WORKERS):
+    """Iniciar thread que executa a pré-renderização todo dia no horário `at` (UTC)"""
+    def loop():
+        while True:
+            time.sleep(_seconds_until(at))
+            try:
+                run_prerender(periods, workers)
+            except Exception as e:
+                logger.exception(f"Erro na pré-renderização agendada: {e}")
+
+    thread = threading.Thread(target=loop, name="prerender-scheduler", daemon=True)
+    thread.start()
+    logger.info(f"Pré-renderização agendada para {at} UTC")
+    return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-renderização de relatórios")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Executar ou retomar a pré-renderização do dia")
+    run_parser.add_argument("--days", type=int, nargs="+", default=DEFAULT_PERIODS)
+    run_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    run_parser.add_argument("--force", action="store_true", help="Nova execução mesmo se a do dia já terminou")
+
+    status_parser = subparsers.add_parser("status", help="Mostrar o progresso de uma execução")
+    status_parser.add_argument("--run-id", default=datetime.utcnow().strftime("%Y-%m-%d"))
+
+    subparsers.add_parser("gc", help="Remover PDFs que nenhum relatório referencia")
+
+    schedule_parser = subparsers.add_parser("schedule", help="Executar todo dia no horário --at (UTC)")
+    schedule_parser.add_argument("--at", default=os.getenv("PRERENDER_AT"), required=not os.getenv("PRERENDER_AT"))
+    schedule_parser.add_argument("--days", type=int, nargs="+", default=DEFAULT_PERIODS)
+    schedule_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+
+    args = parser.parse_args()
+    log_config.setup_logging("prerender")
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://mongo:27017"))
+    database = client[os.getenv("DB_NAME", "moodtracker")]
+    models.init_db(database)
+    report_store.init_store(database)
+    init(database)
+    # O agendador sobe junto com o serviço, talvez antes do MongoDB: os índices ficam para o aquecimento do report_app
+    if args.command != "schedule":
+        report_store.ensure_indexes()
+        ensure_indexes()
+
+    if args.command == "run":
+        run_prerender(args.days, args.workers, force=args.force)
+    elif args.command == "schedule":
+        start_scheduler(args.at, args.days, args.workers).join()
+    elif args.command == "gc":
+        logger.info(f"{report_store.collect_garbage()} PDFs sem referência removidos")
+    else:
+        _report_progress(args.run_id)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-from flask import Flask, jsonify, request, render_template, send_file
+from flask import Flask, jsonify, make_response, request, render_template, send_file
 from flask_cors import CORS 
+import logging
 import os
 from pymongo import MongoClient
 import models
@@ -7,8 +8,15 @@ import json
 from bson import ObjectId
 from datetime import datetime
 
-#  IMPORTAR O GERADOR DE PDF
-import pdf_generator
+# pdf_generator (e o ReportLab) só é importado no primeiro PDF; ver gunicorn.conf.py
+import report_store
+import prerender
+# Módulos compartilhados com o app-main (ver common/)
+from moodtracker_common import admission, invalidation, lifecycle, log_config, mongo_tracing, static_assets
+
+# Logs em JSON, escritos por uma thread de fundo (não bloqueiam a requisição)
+log_config.setup_logging("report-service")
+logger = logging.getLogger(__name__)
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
@@ -27,28 +35,75 @@ def serialize_document(doc):
     else:
         return doc
 
-app = Flask(__name__)
+# Arquivos estáticos sob /reports/static: o HTML do relatório aberto pelo gateway
+# do app-main busca o CSS no mesmo prefixo repassado ao report-service
+app = Flask(__name__, static_url_path="/reports/static")
 CORS(app)
 app.json_encoder = JSONEncoder
+log_config.init_request_ids(app)
+
+# Prioridade de cada rota: PDFs e estatísticas disputam um limite próprio
+def admission_class(req):
+    if req.endpoint in ('download_user_report_pdf', 'download_detailed_report_pdf', 'get_user_mood_statistics',
+                        'patients_risk'):
+        return admission.EXPENSIVE
+    if req.endpoint in (None, 'home', 'health', 'admission_metrics', 'invalidation_metrics',
+                        'livez', 'readyz', 'mongo_reads', 'static', 'static_asset'):
+        return None
+    return admission.NORMAL
+
+admission.init_admission(app, admission_class)
+mongo_tracing.init_tracing(app)
+# JS/CSS do relatório HTML com hash no nome; sob /reports para passar pelo gateway do app-main
+static_assets.init_assets(app, "/reports/assets")
 
 # Conexão MongoDB
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
 DB_NAME = os.getenv("DB_NAME", "moodtracker")
+# Espera máxima pelo change stream de invalidação antes de aquecer os caches
+CACHE_PRIME_WAIT = float(os.getenv("CACHE_PRIME_WAIT", 5))
 
-try:
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    
-    # Testar conexão
-    client.admin.command('ping')
-    print(f"✅ Report Service conectado ao MongoDB: {MONGO_URI}/{DB_NAME}")
-    
-    # Inicializar models
-    models.init_db(db)
-    
-except Exception as e:
-    print(f"❌ Erro ao conectar MongoDB: {e}")
-    exit(1)
+# Tracer registra os comandos de cada requisição (Server-Timing e alerta de N+1).
+# O client conecta sob demanda: o processo sobe mesmo com o Mongo fora do ar
+served_by = mongo_tracing.ServedByCounter()
+client = MongoClient(MONGO_URI, event_listeners=[mongo_tracing.RequestCommandTracer(), served_by])
+db = client[DB_NAME]
+logger.info(f"Report Service usando MongoDB: {MONGO_URI}/{DB_NAME}")
+
+# Inicializar models
+models.init_db(db)
+report_store.init_store(db)
+prerender.init(db)
+# Threads de fundo só no processo que atende: não no pai do reloader de `python report_app.py`
+BACKGROUND_THREADS = lifecycle.serving_process(__name__)
+invalidation.init_invalidation(app, db, start=BACKGROUND_THREADS)
+# Onde cada leitura foi atendida (estatísticas vão para os secundários, ver models.reporting_db)
+mongo_tracing.init_served_by(app, client, served_by, {
+    "analytics": models.ANALYTICS_READ_PREFERENCE,
+    "analytics_max_staleness_seconds": models.ANALYTICS_MAX_STALENESS,
+    "default": client.read_preference.mongos_mode
+})
+
+def warm_pdf():
+    """Gerar um PDF pequeno: carrega os módulos e as fontes do ReportLab"""
+    import pdf_generator
+    pdf_generator.create_simple_pdf_test()
+
+def warm_caches():
+    """Template do relatório compilado e profissionais no cache de usuários"""
+    app.jinja_env.get_template('report.html')
+    # Antes do change stream abrir o cache fica desligado (e é esvaziado quando abre)
+    if invalidation.bus.wait_live(CACHE_PRIME_WAIT):
+        logger.info(f"Cache de usuários aquecido com {models.prime_user_cache()} profissionais")
+    else:
+        logger.warning("Barramento de invalidação inativo: cache de usuários não aquecido")
+
+# Subida em segundo plano: /readyz responde 200 depois do aquecimento (ver lifecycle.py)
+lifecycle.startup.check("mongodb", lifecycle.mongo_ping(client))
+lifecycle.startup.warmup_step("indexes", lambda: (report_store.ensure_indexes(), prerender.ensure_indexes()))
+lifecycle.startup.warmup_step("reportlab", warm_pdf)
+lifecycle.startup.warmup_step("caches", warm_caches)
+lifecycle.init_lifecycle(app, start=BACKGROUND_THREADS)
 
 @app.route('/')
 def home():
@@ -61,8 +116,13 @@ def home():
             "/reports/user_mood_stats/<user_id>": "Estatísticas JSON",
             "/reports/html/<user_id>": "Relatório HTML",
             "/reports/pdf/<user_id>": "📄 Relatório PDF (NOVO!)",
+            "/reports/pdf/<user_id>/detailed": "📄 Relatório PDF detalhado (streaming)",
+            "/reports/stream?professional_id=<id>": "Novos humores dos pacientes (Server-Sent Events, stream_app.py)",
+            "/reports/risk?professional_id=<id>": "Pacientes ordenados pela pontuação de risco de humor",
             "/test-db": "Testar conexão MongoDB",
-            "/health": "Health check"
+            "/health": "Health check",
+            "/livez": "Processo vivo",
+            "/readyz": "Pronto para receber tráfego (aquecido e com o MongoDB respondendo)"
         }
     })
 
@@ -92,10 +152,17 @@ def test_db():
 
 @app.route('/health')
 def health():
+    # Último resultado das conferências do lifecycle (não consulta o banco)
+    status = lifecycle.startup.snapshot()
+    if status["ready"]:
+        state = "healthy"
+    else:
+        # starting/warming durante a subida; degraded se uma dependência caiu depois
+        state = "degraded" if status["state"] == lifecycle.READY else status["state"]
     return jsonify({
-        "status": "healthy",
+        "status": state,
         "service": "report-service",
-        "mongodb_connected": True
+        "mongodb_connected": status["checks"].get("mongodb", {}).get("ok", False)
     })
 
 #  ROTA PARA TESTE SIMPLES DO PDF
@@ -103,7 +170,8 @@ def health():
 def test_pdf():
     """Rota para testar se o PDF está funcionando"""
     try:
-        print("🧪 Testando geração de PDF...")
+        logger.info("Testando geração de PDF...")
+        import pdf_generator
         pdf_buffer = pdf_generator.create_simple_pdf_test()
         
         return send_file(
@@ -113,7 +181,7 @@ def test_pdf():
             download_name=f'teste_pdf_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
         )
     except Exception as e:
-        print(f"❌ Erro no teste PDF: {e}")
+        logger.exception(f"Erro no teste PDF: {e}")
         return jsonify({"error": f"Erro ao gerar PDF de teste: {str(e)}"}), 500
 
 # 📄 NOVA ROTA PRINCIPAL: DOWNLOAD PDF
@@ -131,15 +199,6 @@ def download_user_report_pdf(user_id):
         days = request.args.get('days', 30, type=int)
         is_professional = request.args.get('professional', 'false').lower() == 'true'
         
-        print(f"📄 Gerando PDF para usuário {user_id} (últimos {days} dias, profissional: {is_professional})")
-        
-        # Gerar PDF
-        pdf_buffer = pdf_generator.generate_mood_report_pdf(
-            user_id=user_id,
-            days=days,
-            is_professional=is_professional
-        )
-        
         # Nome do arquivo
         user_info = models.get_user_by_id(user_id)
         username = user_info.get('username', 'usuario') if user_info else 'usuario'
@@ -149,17 +208,97 @@ def download_user_report_pdf(user_id):
         else:
             filename = f"meu_relatorio_humor_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         
-        print(f"✅ PDF gerado com sucesso: {filename}")
+        # Cópia salva ainda atual? Senão renderiza e guarda (conteúdo igual é gravado uma vez só)
+        stored = report_store.get_current_report(user_id, days, is_professional)
+        if stored:
+            logger.info(f"Servindo PDF salvo em {stored['rendered_at']}: {filename}", extra={"sample": True})
+        else:
+            logger.info(f"Gerando PDF para usuário {user_id} (últimos {days} dias, profissional: {is_professional})", extra={"sample": True})
+            
+            # Fingerprint lido antes de renderizar: uma escrita no meio invalida a cópia
+            fingerprint = models.get_mood_fingerprint(user_id)
+            
+            # Gerar PDF (no primário: a cópia salva tem que corresponder ao fingerprint)
+            import pdf_generator
+            with models.read_from_primary():
+                pdf_buffer = pdf_generator.generate_mood_report_pdf(
+                    user_id=user_id,
+                    days=days,
+                    is_professional=is_professional
+                )
+            stored = report_store.save_report(user_id, days, is_professional, pdf_buffer.getvalue(), fingerprint)
+            
+            logger.info(f"PDF gerado com sucesso: {filename}", extra={"sample": True})
         
-        return send_file(
-            pdf_buffer,
+        # ETag forte = SHA-256 do conteúdo; conditional=True trata Range, If-Range e If-None-Match
+        response = send_file(
+            stored['path'],
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            conditional=True,
+            etag=stored['sha256']
         )
+        response.cache_control.private = True
+        return response
         
     except Exception as e:
-        print(f"❌ Erro ao gerar PDF para usuário {user_id}: {e}")
+        logger.exception(f"Erro ao gerar PDF para usuário {user_id}: {e}")
+        return jsonify({"error": f"Erro ao gerar PDF: {str(e)}"}), 500
+
+# 📄 ROTA DE PDF DETALHADO (STREAMING)
+@app.route('/reports/pdf/<user_id>/detailed', methods=['GET'])
+def download_detailed_report_pdf(user_id):
+    """
+    Gerar e baixar relatório detalhado em PDF (todas as entradas do período)
+
+    Query parameters:
+    - days: número de dias (padrão 30)
+    - professional: true/false (padrão false)
+    - batch_size: entradas lidas do banco por lote (padrão 200)
+    """
+    try:
+        days = request.args.get('days', 30, type=int)
+        is_professional = request.args.get('professional', 'false').lower() == 'true'
+        batch_size = max(1, min(request.args.get('batch_size', 200, type=int), 1000))
+
+        logger.info(f"Gerando PDF detalhado para usuário {user_id} (últimos {days} dias, profissional: {is_professional})")
+
+        import pdf_generator
+        pdf_file = pdf_generator.generate_detailed_mood_report_pdf(
+            user_id=user_id,
+            days=days,
+            is_professional=is_professional,
+            batch_size=batch_size
+        )
+
+        # Tamanho final para o Content-Length
+        pdf_file.seek(0, os.SEEK_END)
+        size = pdf_file.tell()
+        pdf_file.seek(0)
+
+        user_info = models.get_user_by_id(user_id)
+        username = user_info.get('username', 'usuario') if user_info else 'usuario'
+
+        if is_professional:
+            filename = f"relatorio_detalhado_paciente_{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        else:
+            filename = f"meu_relatorio_detalhado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+        logger.info(f"PDF detalhado gerado com sucesso: {filename} ({size} bytes)")
+
+        # send_file envia o arquivo em blocos e o fecha ao final
+        response = send_file(
+            pdf_file,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=filename
+        )
+        response.content_length = size
+        return response
+
+    except Exception as e:
+        logger.exception(f"Erro ao gerar PDF detalhado para usuário {user_id}: {e}")
         return jsonify({"error": f"Erro ao gerar PDF: {str(e)}"}), 500
 
 #  ROTA PRINCIPAL DE RELATÓRIOS (mantida igual)
@@ -172,21 +311,21 @@ def get_user_mood_statistics(user_id):
     try:
         days = request.args.get('days', 30, type=int)
         
-        print(f"📊 Gerando relatório para usuário {user_id} (últimos {days} dias)")
+        logger.info(f"Gerando relatório para usuário {user_id} (últimos {days} dias)", extra={"sample": True})
         
         # Usar função do models
         stats = models.get_user_mood_stats(user_id, days=days)
         
         if 'error' in stats:
-            print(f"❌ Erro nas estatísticas: {stats['error']}")
+            logger.error(f"Erro nas estatísticas: {stats['error']}")
             return jsonify(stats), 400
         
-        print(f"✅ Relatório gerado com sucesso: {stats['total_entries_period']} entradas")
+        logger.info(f"Relatório gerado com sucesso: {stats['total_entries_period']} entradas", extra={"sample": True})
         clean_stats = serialize_document(stats)
         return jsonify(clean_stats), 200
 
     except Exception as e:
-        print(f"❌ Erro ao gerar relatório para o usuário {user_id}: {e}")
+        logger.exception(f"Erro ao gerar relatório para o usuário {user_id}: {e}")
         return jsonify({"error": f"Erro interno ao gerar relatório: {str(e)}"}), 500
 
 # ROTA HTML DO RELATÓRIO (mantida igual)
@@ -196,17 +335,18 @@ def get_report_html(user_id):
     Renderiza a página HTML do relatório para um usuário específico.
     O JavaScript na página fará a chamada para o endpoint JSON.
     """
-    print(f" Renderizando página de relatório para usuário: {user_id}")
-    return render_template('report.html', user_id=user_id)
+    logger.info(f"Renderizando página de relatório para usuário: {user_id}", extra={"sample": True})
+    # Template gerado pelo build quando existir (ver static_assets.py); revalidado a cada visita
+    return static_assets.revalidated(make_response(render_template('report.html', user_id=user_id)))
 
 @app.route('/reports/patients', methods=['GET'])
 def list_all_patients():
     """Lista todos os pacientes para profissionais"""
     try:
-        print(" Listando pacientes para profissional...")
+        logger.info("Listando pacientes para profissional...", extra={"sample": True})
         
         # Buscar apenas usuários do tipo 'patient'
-        patients = list(db.users.find(
+        patients = list(models.reporting_db().users.find(
             {"user_type": "patient"}, 
             {"_id": 1, "username": 1, "email": 1, "created_at": 1}
         ))
@@ -215,16 +355,38 @@ def list_all_patients():
         for patient in patients:
             patient["_id"] = str(patient["_id"])
         
-        print(f"✅ {len(patients)} pacientes encontrados")
+        logger.info(f"{len(patients)} pacientes encontrados", extra={"sample": True})
         
         return jsonify({
             "patients": patients,
             "total": len(patients)
         })
     except Exception as e:
-        print(f"❌ Erro ao listar pacientes: {e}")
+        logger.error(f"Erro ao listar pacientes: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/reports/risk', methods=['GET'])
+def patients_risk():
+    """Pacientes do profissional ordenados pela pontuação de risco de humor (ver analytics.py)"""
+    professional_id = request.args.get('professional_id')
+    if not professional_id:
+        return jsonify({"error": "professional_id é obrigatório"}), 400
+    days = request.args.get('days', 30, type=int)
+    if not 1 <= days <= 365:
+        return jsonify({"error": "days deve estar entre 1 e 365"}), 400
+
+    try:
+        professional = models.get_user_by_id(professional_id)
+        if not professional or professional.get("user_type") != "professional":
+            return jsonify({"error": "Profissional não encontrado"}), 404
+
+        # NumPy só é carregado na primeira chamada (o gunicorn já importa no processo mestre)
+        import analytics
+        return jsonify(analytics.professional_risk(professional, days=days))
+    except Exception as e:
+        logger.exception(f"Erro ao calcular risco dos pacientes do profissional {professional_id}: {e}")
+        return jsonify({"error": f"Erro ao calcular risco: {str(e)}"}), 500
+
 #  ROTA ADICIONAL DE LISTAR USUÁRIOS PARA RELATÓRIOS (mantida igual)
 @app.route('/reports/users', methods=['GET'])
 def list_users_for_reports():
@@ -254,16 +416,12 @@ def internal_error(error):
     }), 500
 
 if __name__ == '__main__':
-    print("🚀 Iniciando Report Service...")
-    print("📊 Endpoints disponíveis:")
-    print("   GET  /                              - Info do serviço")
-    print("   GET  /test-db                       - Testar MongoDB")
-    print("   GET  /test-pdf                      - 🧪 Testar PDF")
-    print("   GET  /health                        - Health check")
-    print("   GET  /reports/user_mood_stats/<id>  - Estatísticas JSON")
-    print("   GET  /reports/html/<id>             - Relatório HTML")
-    print("   GET  /reports/pdf/<id>              - 📄 Relatório PDF (NOVO!)")
-    print("   GET  /reports/users                 - Listar usuários")
-    print("   GET  /reports/patients              - Listar pacientes")
+    logger.info("Iniciando Report Service...", extra={"fields": {
+        "endpoints": sorted(str(rule) for rule in app.url_map.iter_rules() if rule.endpoint != "static")
+    }})
     
+    # Pré-renderização diária (ex.: PRERENDER_AT=03:00); no gunicorn quem agenda é o mestre
+    if os.getenv("PRERENDER_AT") and BACKGROUND_THREADS:
+        prerender.start_scheduler(os.getenv("PRERENDER_AT"))
+
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+from bson import ObjectId
+from pymongo import ASCENDING
+
+import models
+
+logger = logging.getLogger(__name__)
+
+# Diretório onde os PDFs são gravados, endereçados pelo SHA-256 do conteúdo
+REPORT_STORE_DIR = os.getenv(
+    "REPORT_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_store")
+)
+BLOB_DIR = os.path.join(REPORT_STORE_DIR, "blobs")
+
+# Depois deste tempo o relatório salvo deixa de valer (a janela "últimos N dias" andou)
+REPORT_MAX_AGE_HOURS = int(os.getenv("REPORT_MAX_AGE_HOURS", 24))
+
+# Variável global para receber instância do db
+db = None
+
+def init_store(database_instance):
+    """Inicializar o armazenamento de relatórios"""
+    global db
+    db = database_instance
+    os.makedirs(BLOB_DIR, exist_ok=True)
+
+def ensure_indexes():
+    """Criar os índices dos relatórios salvos (idempotente)"""
+    db.prerendered_reports.create_index(
+        [("user_id", ASCENDING), ("days", ASCENDING), ("professional", ASCENDING)],
+        unique=True
+    )
+    db.prerendered_reports.create_index("sha256")
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], f"{sha256}.pdf")
+
+def put_blob(pdf_bytes: bytes) -> str:
+    """Gravar o PDF uma única vez por conteúdo e retornar o hash"""
+    sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+    path = blob_path(sha256)
+
+    # Registrar o uso antes de conferir o arquivo: a coleta de lixo só apaga blobs sem uso recente
+    now = datetime.utcnow()
+    db.report_blobs.update_one(
+        {"_id": sha256},
+        {
+            "$setOnInsert": {"size": len(pdf_bytes), "created_at": now},
+            "$set": {"last_used_at": now}
+        },
+        upsert=True
+    )
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escrever em arquivo temporário e renomear: quem estiver lendo nunca vê um PDF pela metade
+        # (nome único por chamada: duas renderizações iguais no mesmo processo não disputam o temporário)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return sha256
+
+def save_report(user_id: str, days: int, is_professional: bool, pdf_bytes: bytes,
+                fingerprint: Dict[str, Any]) -> Dict[str, Any]:
+    """Gravar o PDF e apontar o relatório (usuário, período, tipo) para ele"""
+    sha256 = put_blob(pdf_bytes)
+
+    meta = {
+        "user_id": ObjectId(user_id),
+        "days": days,
+        "professional": is_professional,
+        "sha256": sha256,
+        "size": len(pdf_bytes),
+        "fingerprint": fingerprint,
+        "rendered_at": datetime.utcnow()
+    }
+    db.prerendered_reports.update_one(
+        {"user_id": meta["user_id"], "days": days, "professional": is_professional},
+        {"$set": meta, "$unset": {"path": ""}},
+        upsert=True
+    )
+    meta["path"] = blob_path(sha256)
+    return meta
+
+def get_current_report(user_id: str, days: int, is_professional: bool) -> Optional[Dict[str, Any]]:
+    """
+    Retornar os metadados do relatório salvo se ele ainda estiver atual:
+    renderizado há menos de REPORT_MAX_AGE_HOURS e sem entradas novas,
+    alteradas ou removidas desde então.
+    """
+    try:
+        meta = db.prerendered_reports.find_one({
+            "user_id": ObjectId(user_id),
+            "days": days,
+            "professional": is_professional
+        })
+        if not meta or not meta.get("sha256"):
+            return None
+
+        if meta["rendered_at"] < datetime.utcnow() - timedelta(hours=REPORT_MAX_AGE_HOURS):
+            return None
+
+        if meta.get("fingerprint") != models.get_mood_fingerprint(user_id):
+            return None
+
+        meta["path"] = blob_path(meta["sha256"])
+        if not os.path.exists(meta["path"]):
+            return None
+
+        return meta
+    except Exception as e:
+        logger.error(f"Erro ao buscar relatório salvo: {e}")
+        return None
+
+def collect_garbage(min_age_hours: int = 1) -> int:
+    """Remover PDFs que nenhum relatório referencia mais"""
+    referenced = set(db.prerendered_reports.distinct("sha256"))
+    cutoff = datetime.utcnow() - timedelta(hours=min_age_hours)
+    removed = 0
+
+    for blob in db.report_blobs.find({"last_used_at": {"$lt": cutoff}}, {"_id": 1}):
+        if blob["_id"] in referenced:
+            continue
+        # Só apaga o arquivo se ninguém reutilizou o blob desde a consulta
+        res = db.report_blobs.delete_one({"_id": blob["_id"], "last_used_at": {"$lt": cutoff}})
+        if res.deleted_count == 0:
+            continue
+        try:
+            os.remove(blob_path(blob["_id"]))
+        except FileNotFoundError:
+            pass
+        removed += 1
+
+    return removed
@@ -0,0 +1,107 @@
+"""
+Feed SSE dos humores (GET /reports/stream) em um processo ASGI próprio.
+
+Cada dashboard profissional mantém uma conexão aberta indefinidamente. No
+report_app (gunicorn gthread) cada conexão prenderia uma thread de worker; aqui
+ela é uma corrotina no event loop, e o change stream (motor) é um só por
+processo (ver live_feed.py).
+
+    uvicorn stream_app:app --host 0.0.0.0 --port 5002
+
+O gateway do app-main redireciona /reports/stream para REPORT_STREAM_URL, que
+aponta para este processo.
+"""
+import asyncio
+import logging
+import os
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import live_feed
+from moodtracker_common import log_config
+
+log_config.setup_logging("report-stream")
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+DB_NAME = os.getenv("DB_NAME", "moodtracker")
+MONGO_PING_TIMEOUT = float(os.getenv("MONGO_PING_TIMEOUT", 2))
+
+client = None
+db = None
+
+async def mood_stream(request):
+    """Novos humores dos pacientes do profissional, em tempo real (Server-Sent Events)"""
+    professional_id = request.query_params.get('professional_id')
+    if not professional_id:
+        return JSONResponse({"error": "professional_id é obrigatório"}, 400)
+
+    try:
+        professional = await db.users.find_one({"_id": ObjectId(professional_id)}, {"user_type": 1, "patients": 1})
+    except InvalidId:
+        professional = None
+    if not professional or professional.get("user_type") != "professional":
+        return JSONResponse({"error": "Profissional não encontrado"}, 404)
+
+    # Sem pacientes vinculados, acompanha todos (como a lista de /reports/patients)
+    patient_ids = {str(patient_id) for patient_id in professional.get("patients") or []} or None
+    subscription, replay, reset = live_feed.feed.subscribe(patient_ids, request.headers.get('Last-Event-ID'))
+    # O Starlette cancela o gerador quando o cliente desconecta (o finally tira a assinatura)
+    return StreamingResponse(
+        live_feed.sse_events(subscription, replay, reset),
+        media_type='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def feed_metrics(request):
+    """Conexões abertas, eventos distribuídos e estado do change stream"""
+    return JSONResponse({**live_feed.feed.stats, "error": live_feed.feed.error})
+
+async def livez(request):
+    return JSONResponse({"status": "alive"})
+
+async def readyz(request):
+    """MongoDB respondendo (o change stream abre na primeira conexão)"""
+    try:
+        await asyncio.wait_for(client.admin.command('ping'), MONGO_PING_TIMEOUT)
+    except Exception as e:
+        return JSONResponse({"ready": False, "error": str(e)}, 503)
+    return JSONResponse({"ready": True, "feed": live_feed.feed.stats})
+
+async def connect_mongo():
+    """Client no event loop do servidor; conecta sob demanda (o processo sobe com o Mongo fora do ar)"""
+    global client, db
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[DB_NAME]
+    live_feed.feed.init(db)
+    logger.info(f"Feed SSE usando MongoDB: {MONGO_URI}/{DB_NAME}")
+
+async def close_mongo():
+    await live_feed.feed.stop()
+    if client:
+        client.close()
+
+app = Starlette(
+    routes=[
+        Route('/reports/stream', mood_stream, methods=['GET']),
+        Route('/reports/stream/metrics', feed_metrics, methods=['GET']),
+        Route('/livez', livez, methods=['GET']),
+        Route('/readyz', readyz, methods=['GET'])
+    ],
+    # O navegador chega aqui pelo redirecionamento do gateway, vindo da origem do app-main
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["GET"], allow_headers=["Last-Event-ID"])],
+    on_startup=[connect_mongo],
+    on_shutdown=[close_mongo]
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv("PORT", 5002)), access_log=False)
@@ -0,0 +1,100 @@
+"""
+Comparação lado a lado do app-main (Flask, uma thread por requisição) com o
+app-async (ASGI + motor) sob alta concorrência.
+
+Uso:
+    docker-compose up -d app-main app-async
+    python tools/bench_async.py --seed-db --rates 100 300 600 --duration 30 --out async_vs_threaded.json
+
+Para cada taxa, os dois serviços recebem exatamente a mesma sequência de
+requisições (mesma semente), uma rodada de cada vez, usando o gerador de
+carga de tools/loadtest.py. A mistura padrão imita os clientes móveis:
+muito polling de /moods/user/<id> e gravações em /moods.
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+from pymongo import MongoClient
+
+import loadtest
+import seed
+
+DEFAULT_MIX = {
+    "moods": 50,
+    "create_mood": 25,
+    "moods_detailed": 10,
+    "stats": 15
+}
+
+def compare_targets(db, targets, mix, rates, duration, concurrency, timeout, rng_seed):
+    """Rodar a mesma carga contra cada alvo, taxa por taxa"""
+    rounds = []
+    for rate in rates:
+        row = {"rate": rate, "targets": {}}
+        for name, url in targets.items():
+            ctx = loadtest.build_context(db, url, url)
+            results, elapsed = loadtest.run_load(ctx, mix, rate, duration, concurrency, timeout, rng_seed)
+            all_samples = [sample for samples in results.values() for sample in samples]
+            row["targets"][name] = {
+                "overall": loadtest.summarize(all_samples, elapsed),
+                "routes": {route: loadtest.summarize(samples, elapsed) for route, samples in sorted(results.items())}
+            }
+            overall = row["targets"][name]["overall"]
+            print(f"⏱️ {rate} req/s {name}: {overall['throughput_rps']} ok/s, p50 {overall['p50_ms']} ms, "
+                  f"p99 {overall['p99_ms']} ms, erros {overall['error_rate']:.1%}")
+        rounds.append(row)
+    return rounds
+
+def main():
+    parser = argparse.ArgumentParser(description="app-main (threads) x app-async (ASGI)")
+    parser.add_argument("--threaded", default=os.getenv("APP_URL", "http://localhost:8080"))
+    parser.add_argument("--async", dest="async_url", default=os.getenv("ASYNC_APP_URL", "http://localhost:8083"))
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "moodtracker"))
+    parser.add_argument("--rates", type=float, nargs="+", default=[100, 300, 600], help="Requisições por segundo")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga por rodada")
+    parser.add_argument("--concurrency", type=int, default=2000, help="Máximo de requisições em andamento no cliente")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--mix", type=loadtest.parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-db", action="store_true", help="Popular o banco antes da carga")
+    parser.add_argument("--drop", action="store_true", help="Com --seed-db, apagar os dados existentes")
+    parser.add_argument("--out", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    if args.seed_db:
+        seed.seed_database(db, seed=args.seed, drop=args.drop)
+    if not loadtest.build_context(db, args.threaded, args.threaded)["patient_ids"]:
+        parser.error("Nenhum usuário de teste encontrado: rode com --seed-db")
+
+    targets = {"threaded": args.threaded.rstrip("/"), "async": args.async_url.rstrip("/")}
+    rounds = compare_targets(db, targets, args.mix, args.rates, args.duration,
+                             args.concurrency, args.timeout, args.seed)
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "git_commit": loadtest._git_commit(),
+        "config": {
+            "targets": targets,
+            "rates": args.rates,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "seed": args.seed
+        },
+        "rounds": rounds
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"✅ Resultado gravado em {args.out}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Micro-benchmarks das funções de acesso a dados dos dois serviços.
+
+Uso:
+    python tools/bench_models.py run --scale 1k --out bench_1k.json
+    python tools/bench_models.py run --scale 100k --save-baseline
+    python tools/bench_models.py compare tools/bench_baselines/100k.json bench_100k.json --threshold 0.2
+
+Cada escala usa um banco próprio (moodtracker_bench_<escala>), populado uma
+única vez. Por função são medidos:
+    - wall_ms: tempo de parede (p50/p95 de --iterations chamadas)
+    - server_ms: soma da duração dos comandos reportada pelo driver
+    - commands / docs_examined / keys_examined: via profiler do MongoDB
+    - alloc_kb / peak_kb: alocações Python (tracemalloc)
+
+O profiler e o tracemalloc rodam em uma passada separada para não distorcer os tempos.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from pymongo import MongoClient, monitoring
+
+import seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baselines")
+
+# escala -> (pacientes, entradas por paciente, músicas)
+SCALES = {
+    "1k": (20, 50, 100),
+    "100k": (1000, 100, 2000),
+    "10m": (20000, 500, 20000)
+}
+
+# Muda quando o conteúdo gerado muda: bancos de versões anteriores são repopulados
+# (2: as escritas do benchmark deixaram de ir para o paciente medido)
+DATASET_VERSION = 2
+BENCH_WRITER_EMAIL = "bench-writer@bench.local"
+
+# Métricas comparadas pelo "compare" (maior = pior)
+COMPARED_METRICS = ["wall_p50_ms", "server_ms", "docs_examined", "keys_examined", "alloc_kb"]
+
+class CommandTimer(monitoring.CommandListener):
+    """Somar a duração dos comandos enviados pela thread atual"""
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.micros = 0
+        self._local.count = 0
+
+    @property
+    def micros(self):
+        return getattr(self._local, "micros", 0)
+
+    @property
+    def count(self):
+        return getattr(self._local, "count", 0)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._local.micros = self.micros + event.duration_micros
+        self._local.count = self.count + 1
+
+    def failed(self, event):
+        self.succeeded(event)
+
+def load_models():
+    """Carregar os models dos dois serviços (os dois arquivos se chamam models.py)"""
+    report_dir = os.path.join(ROOT, "report-service")
+    sys.path.insert(0, report_dir)
+    # Pacote compartilhado pelos dois serviços, caso não esteja instalado (pip install -e common)
+    sys.path.append(os.path.join(ROOT, "common"))
+    # Módulos que só existem no app-main (recent_moods, song_fanout); "models" continua sendo o do report-service
+    sys.path.append(os.path.join(ROOT, "app-main"))
+    import models as report_models  # noqa: E402  (pdf_generator importa "models")
+    import pdf_generator  # noqa: E402
+
+    spec = importlib.util.spec_from_file_location("app_models", os.path.join(ROOT, "app-main", "models.py"))
+    app_models = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app_models)
+    return app_models, report_models, pdf_generator
+
+def ensure_dataset(db, scale, rng_seed):
+    """Popular o banco da escala se ainda não tiver sido feito"""
+    meta = db.bench_meta.find_one({"_id": "dataset"})
+    if meta and meta.get("scale") == scale and meta.get("seed") == rng_seed and meta.get("version") == DATASET_VERSION:
+        return
+    patients, entries_per_user, songs = SCALES[scale]
+    print(f"🌱 Populando {db.name}: {patients} pacientes x {entries_per_user} humores, {songs} músicas")
+    seed.seed_database(db, users=patients, professionals=max(1, patients // 50), songs=songs,
+                       entries_per_user=entries_per_user, seed=rng_seed, drop=True)
+    db.bench_meta.replace_one({"_id": "dataset"}, {"_id": "dataset", "scale": scale, "seed": rng_seed, "version": DATASET_VERSION}, upsert=True)
+
+def create_bench_writer(db):
+    """Paciente descartável que recebe as escritas do benchmark (fora dos dados medidos)"""
+    remove_bench_writer(db)
+    now = datetime.utcnow()
+    return str(db.users.insert_one({
+        "username": "bench-writer",
+        "email": BENCH_WRITER_EMAIL,
+        "user_type": "patient",
+        "active": True,
+        "linked_professional": None,
+        "created_at": now,
+        "updated_at": now
+    }).inserted_id)
+
+def remove_bench_writer(db):
+    """Apagar o paciente descartável e as entradas dele (nas duas coleções de humores)"""
+    for writer in db.users.find({"email": BENCH_WRITER_EMAIL}, {"_id": 1}):
+        db.mood_entries.delete_many({"user_id": writer["_id"]})
+        if "mood_entries_ts" in db.list_collection_names():
+            # user_id é o metaField: o MongoDB 5.0 aceita delete filtrando só por ele
+            db.mood_entries_ts.delete_many({"user_id": writer["_id"]})
+        db.users.delete_one({"_id": writer["_id"]})
+
+def build_cases(app_models, report_models, pdf_generator, user_id, song_id, writer_id):
+    """Funções medidas: nome -> chamada sem argumentos"""
+    return {
+        "app.list_mood_entries": lambda: app_models.list_mood_entries(user_id, limit=20),
+        "app.get_mood_entries_with_songs": lambda: app_models.get_mood_entries_with_songs(user_id, limit=20),
+        "app.get_user_mood_stats": lambda: app_models.get_user_mood_stats(user_id, days=30),
+        "app.search_songs": lambda: app_models.search_songs("Música 1"),
+        "app.list_all_users": lambda: app_models.list_all_users(),
+        "report.get_user_mood_stats": lambda: report_models.get_user_mood_stats(user_id, days=30),
+        "report.get_mood_entries_with_songs": lambda: report_models.get_mood_entries_with_songs(user_id, limit=20),
+        "report.list_all_users": lambda: report_models.list_all_users(),
+        "pdf.generate_mood_report_pdf": lambda: pdf_generator.generate_mood_report_pdf(user_id, days=30, is_professional=True),
+        # Escreve no paciente descartável: o paciente medido não cresce de uma execução para outra
+        "app.create_mood_entry": lambda: app_models.create_mood_entry(writer_id, "😊", song_id=song_id, comment="bench")
+    }
+
+def _profile_pass(db, func):
+    """Rodar uma vez com o profiler ligado e somar o trabalho do servidor"""
+    db.command("profile", 0)
+    db.system.profile.drop()
+    db.command("profile", 2)
+    start = datetime.utcnow()
+    try:
+        func()
+    finally:
+        db.command("profile", 0)
+
+    commands = docs = keys = 0
+    for op in db.system.profile.find({"ts": {"$gte": start}, "ns": {"$ne": f"{db.name}.system.profile"}}):
+        commands += 1
+        docs += op.get("docsExamined", 0)
+        keys += op.get("keysExamined", 0)
+    return commands, docs, keys
+
+def _alloc_pass(func):
+    tracemalloc.start()
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(current / 1024, 1), round(peak / 1024, 1)
+
+def bench_function(db, timer, func, iterations, warmup):
+    for _ in range(warmup):
+        func()
+
+    wall = []
+    server = []
+    for _ in range(iterations):
+        timer.reset()
+        start = time.perf_counter()
+        func()
+        wall.append((time.perf_counter() - start) * 1000)
+        server.append(timer.micros / 1000)
+
+    commands, docs, keys = _profile_pass(db, func)
+    alloc_kb, peak_kb = _alloc_pass(func)
+    wall.sort()
+    return {
+        "iterations": iterations,
+        "wall_p50_ms": round(statistics.median(wall), 3),
+        "wall_p95_ms": round(wall[min(len(wall) - 1, int(0.95 * len(wall)))], 3),
+        "server_ms": round(statistics.median(server), 3),
+        "commands": commands,
+        "docs_examined": docs,
+        "keys_examined": keys,
+        "alloc_kb": alloc_kb,
+        "peak_kb": peak_kb
+    }
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def run(args):
+    timer = CommandTimer()
+    client = MongoClient(args.mongo_uri, event_listeners=[timer])
+    db = client[f"moodtracker_bench_{args.scale}"]
+    ensure_dataset(db, args.scale, args.seed)
+
+    app_models, report_models, pdf_generator = load_models()
+    app_models.init_db(db)
+    report_models.init_db(db)
+
+    # Paciente "típico": o primeiro gerado pelo seed
+    user = db.users.find_one({"email": seed.user_email(0)})
+    song = db.songs.find_one({})
+    writer_id = create_bench_writer(db)
+    cases = build_cases(app_models, report_models, pdf_generator, str(user["_id"]),
+                        str(song["_id"]) if song else None, writer_id)
+    if args.only:
+        cases = {name: func for name, func in cases.items() if any(part in name for part in args.only)}
+
+    results = {}
+    try:
+        for name, func in cases.items():
+            results[name] = bench_function(db, timer, func, args.iterations, args.warmup)
+            print(f"⏱️ {name}: p50 {results[name]['wall_p50_ms']} ms, servidor {results[name]['server_ms']} ms, "
+                  f"{results[name]['docs_examined']} docs examinados")
+    finally:
+        remove_bench_writer(db)
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "git_commit": _git_commit(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "results": results
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.scale}.json")
+        with open(path, "w") as f:
+            f.write(output)
+        print(f"✅ Baseline gravado em {path}")
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"✅ Resultado gravado em {args.out}")
+    if not args.save_baseline and not args.out:
+        print(output)
+
+def compare(args):
+    """Comparar duas execuções e apontar regressões acima do limite"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    for name, metrics in sorted(current.items()):
+        base = baseline.get(name)
+        if not base:
+            print(f"➕ {name}: sem baseline")
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            # Valores minúsculos (ex.: 0 docs) não viram regressão por ruído
+            if new <= old or new - old < args.min_delta:
+                continue
+            change = (new - old) / old if old else float("inf")
+            if change > args.threshold:
+                regressions.append((name, metric, old, new, change))
+
+    for name, metric, old, new, change in regressions:
+        print(f"❌ {name} {metric}: {old} -> {new} (+{change:.0%})")
+    if not regressions:
+        print(f"✅ Nenhuma regressão acima de {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos models")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Executar os benchmarks")
+    run_parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    run_parser.add_argument("--scale", choices=list(SCALES), default="1k")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--iterations", type=int, default=30)
+    run_parser.add_argument("--warmup", type=int, default=3)
+    run_parser.add_argument("--only", nargs="+", help="Rodar só funções cujo nome contenha estes trechos")
+    run_parser.add_argument("--out", help="Arquivo JSON de saída")
+    run_parser.add_argument("--save-baseline", action="store_true",
+                            help="Gravar em tools/bench_baselines/<escala>.json")
+
+    compare_parser = subparsers.add_parser("compare", help="Comparar com um baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Piora relativa tolerada (0.2 = 20%%)")
+    compare_parser.add_argument("--min-delta", type=float, default=0.5,
+                                help="Diferença absoluta mínima para contar como regressão")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Verificação dos planos de consulta dos dois serviços (explain "executionStats").
+
+Uso:
+    python tools/explain_plans.py --scale 1k
+    python tools/explain_plans.py --scale 100k --max-ratio 5 --out plans.json
+
+Cada função de acesso a dados dos dois models.py (e a rota
+report_app.list_all_patients) roda uma vez contra um banco populado pelo
+seed, com os índices criados pelo aquecimento dos serviços. Todos os comandos
+de leitura e o filtro das escritas que ela envia ao MongoDB são capturados e
+repetidos com explain. Um comando reprova quando:
+    - o plano tem COLLSCAN e o comando tem filtro (listar a coleção inteira é permitido)
+    - totalDocsExamined passa de --max-ratio vezes os documentos devolvidos/alterados
+
+O relatório mostra os estágios de cada plano, com o índice usado, para revisar
+mudanças de índice com evidência. Sai com código 1 se algum comando reprovar.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+from bson import json_util
+from pymongo import MongoClient, monitoring
+
+import bench_models
+import seed
+
+# Comandos de leitura repetidos como estão; escritas viram um explain por instrução
+READ_COMMANDS = {"find", "aggregate", "count", "distinct"}
+WRITE_COMMANDS = {"update": "updates", "delete": "deletes"}
+# Campos da sessão/driver que o explain não aceita dentro do comando
+_DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "readConcern", "writeConcern"}
+
+# Varreduras aceitas de propósito, com o motivo (revisar ao mudar a consulta)
+ALLOWED_COLLSCANS = {
+    "app.search_songs": "busca por trecho sem âncora e sem diferenciar maiúsculas: nenhum índice B-tree ajuda"
+}
+
+class CommandCapture(monitoring.CommandListener):
+    """Guardar os comandos enviados pela thread principal enquanto ativo"""
+    def __init__(self):
+        self.active = False
+        self.commands = []
+
+    def started(self, event):
+        if self.active and threading.current_thread() is threading.main_thread():
+            self.commands.append((event.database_name, event.command_name, dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def _explainable(command_name, command):
+    """Comandos a explicar, já sem os campos do driver"""
+    body = {key: value for key, value in command.items() if key not in _DRIVER_FIELDS}
+    if command_name in READ_COMMANDS or command_name == "findAndModify":
+        return [body]
+    if command_name in WRITE_COMMANDS:
+        statements = WRITE_COMMANDS[command_name]
+        return [{command_name: body[command_name], statements: [statement]} for statement in body.get(statements, [])]
+    return []
+
+def _has_filter(command_name, command):
+    if command_name == "find":
+        return bool(command.get("filter")) or bool(command.get("sort"))
+    if command_name == "aggregate":
+        first = (command.get("pipeline") or [{}])[0]
+        return "$match" in first or "$sort" in first
+    if command_name in ("count", "distinct"):
+        return bool(command.get("query"))
+    if command_name == "findAndModify":
+        return bool(command.get("query"))
+    statements = command.get(WRITE_COMMANDS.get(command_name, ""), [])
+    return any(statement.get("q") for statement in statements)
+
+def _walk(node, key):
+    """Todos os valores de uma chave em qualquer nível do explain"""
+    if isinstance(node, dict):
+        for name, value in node.items():
+            if name == key:
+                yield value
+            yield from _walk(value, key)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item, key)
+
+def _plan_stages(plan):
+    """Estágios do plano vencedor, da raiz para as folhas (ex.: FETCH > IXSCAN user_id_1_created_at_-1)"""
+    stages = []
+    node = plan.get("queryPlan", plan)
+    while node:
+        label = node.get("stage", "?")
+        if node.get("indexName"):
+            label += f" {node['indexName']}"
+        stages.append(label)
+        if node.get("inputStages"):
+            stages.extend(stage for child in node["inputStages"] for stage in _plan_stages(child))
+            break
+        node = node.get("inputStage")
+    return stages
+
+def analyze(explain_output, has_filter, max_ratio, allowed):
+    """Resumo de um explain e lista de problemas encontrados"""
+    stages = [stage for plan in _walk(explain_output, "winningPlan") for stage in _plan_stages(plan)]
+    stats = [value for value in _walk(explain_output, "executionStats") if isinstance(value, dict)]
+    examined = sum(value.get("totalDocsExamined", 0) for value in stats)
+    keys = sum(value.get("totalKeysExamined", 0) for value in stats)
+    # Escritas não devolvem documentos: vale o que seria alterado/apagado
+    returned = sum(max(value.get("nReturned", 0),
+                       value.get("executionStages", {}).get("nMatched", 0),
+                       value.get("executionStages", {}).get("nWouldDelete", 0)) for value in stats)
+
+    summary = {"stages": stages, "docs_examined": examined, "keys_examined": keys, "returned": returned}
+    problems = []
+    if allowed:
+        return summary, problems
+    if has_filter and any(stage.startswith("COLLSCAN") for stage in stages):
+        problems.append("COLLSCAN")
+    if examined > max_ratio * max(returned, 1):
+        problems.append(f"{examined} docs examinados para {returned} devolvidos")
+    return summary, problems
+
+def build_cases(app_models, report_models, report_app, song_fanout, ids):
+    """Funções verificadas, em ordem (as escritas vêm depois das leituras)"""
+    user_id, song_id, mood_id = ids["user_id"], ids["song_id"], ids["mood_id"]
+    created = {}
+
+    def create(key, result, field):
+        created[key] = result.get(field)
+        return result
+
+    reports = report_app.app.test_client()
+    return {
+        "app.get_user_by_id": lambda: app_models.get_user_by_id(user_id),
+        "app.get_user_by_email": lambda: app_models.get_user_by_email(seed.user_email(0)),
+        "app.list_all_users": lambda: app_models.list_all_users(),
+        "app.get_song": lambda: app_models.get_song(song_id),
+        "app.search_songs": lambda: app_models.search_songs("Música 1"),
+        "app.list_songs": lambda: app_models.list_songs(),
+        "app.list_songs(user)": lambda: app_models.list_songs(user_id),
+        "app.get_mood_entry": lambda: app_models.get_mood_entry(mood_id),
+        "app.list_mood_entries": lambda: app_models.list_mood_entries(user_id, limit=20),
+        "app.list_mood_entries(sem cache)": lambda: app_models.list_mood_entries(user_id, limit=app_models.RECENT_MOODS_SIZE + 1),
+        "app.get_mood_entries_with_songs": lambda: app_models.get_mood_entries_with_songs(user_id, limit=10),
+        "app.get_user_mood_stats": lambda: app_models.get_user_mood_stats(user_id, days=30),
+        "app.get_users_by_ids": lambda: app_models.get_users_by_ids([user_id, user_id]),
+        "app.get_songs_by_ids": lambda: app_models.get_songs_by_ids([song_id], fields=["title"]),
+        "app.get_mood_entries_by_ids": lambda: app_models.get_mood_entries_by_ids([mood_id]),
+        "report.get_user_by_id": lambda: report_models.get_user_by_id(user_id),
+        "report.list_all_users": lambda: report_models.list_all_users(),
+        "report.get_song": lambda: report_models.get_song(song_id),
+        "report.list_songs": lambda: report_models.list_songs(),
+        "report.get_mood_entry": lambda: report_models.get_mood_entry(mood_id),
+        "report.list_mood_entries": lambda: report_models.list_mood_entries(user_id, limit=20),
+        "report.get_mood_entries_with_songs": lambda: report_models.get_mood_entries_with_songs(user_id, limit=10),
+        "report.iter_mood_entries_batches": lambda: list(report_models.iter_mood_entries_batches(user_id, days=30)),
+        "report.get_mood_fingerprint": lambda: report_models.get_mood_fingerprint(user_id),
+        "report.list_linked_patient_ids": lambda: report_models.list_linked_patient_ids(),
+        "report.get_user_mood_stats": lambda: report_models.get_user_mood_stats(user_id, days=30),
+        "report.compare_mood_periods": lambda: report_models.compare_mood_periods(user_id),
+        "report_app.list_all_patients": lambda: reports.get("/reports/patients").get_json(),
+        "app.create_user": lambda: create("user", app_models.create_user(
+            "explain", f"explain-{datetime.utcnow().timestamp()}@example.com", "x"), "user_id"),
+        "app.update_user": lambda: app_models.update_user(created["user"], username="explain2"),
+        "app.create_song": lambda: create("song", app_models.create_song(
+            f"Explain {datetime.utcnow().timestamp()}", "Explain", "https://open.spotify.com/track/x"), "song_id"),
+        "app.update_song": lambda: app_models.update_song(created["song"], title="Explain 2"),
+        "app.create_mood_entry": lambda: create("mood", app_models.create_mood_entry(
+            created["user"], "😊", song_id=created["song"], comment="explain"), "mood_id"),
+        "app.update_mood_entry": lambda: app_models.update_mood_entry(created["mood"], comment="explain2"),
+        "song_fanout.run_pending": lambda: song_fanout.run_pending(),
+        "song_fanout.apply_snapshot": lambda: song_fanout.apply_snapshot(ids["song_oid"]),
+        "app.delete_mood_entry": lambda: app_models.delete_mood_entry(created["mood"]),
+        "app.delete_song": lambda: app_models.delete_song(created["song"]),
+        "app.delete_user": lambda: app_models.delete_user(created["user"])
+    }
+
+def load_report_app(mongo_uri, db_name):
+    """Importar o report_app apontando para o banco de teste (a rota usa o client dele)"""
+    os.environ.update({"MONGO_URI": mongo_uri, "DB_NAME": db_name, "INVALIDATION_BUS": "local"})
+    import report_app  # noqa: E402
+    import logging
+    # Os logs JSON do serviço misturariam com o relatório
+    logging.getLogger().setLevel(logging.WARNING)
+    return report_app
+
+def main():
+    parser = argparse.ArgumentParser(description="Planos de consulta dos models (explain)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--scale", choices=list(bench_models.SCALES), default="1k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-ratio", type=float, default=10,
+                        help="Máximo de documentos examinados por documento devolvido")
+    parser.add_argument("--only", nargs="+", help="Verificar só funções cujo nome contenha estes trechos")
+    parser.add_argument("--out", help="Arquivo JSON com os planos (para revisão)")
+    args = parser.parse_args()
+
+    # Antes de qualquer client: o listener global vale também para o client do report_app
+    capture = CommandCapture()
+    monitoring.register(capture)
+
+    client = MongoClient(args.mongo_uri)
+    db_name = f"moodtracker_explain_{args.scale}"
+    db = client[db_name]
+    bench_models.ensure_dataset(db, args.scale, args.seed)
+
+    app_models, report_models, _ = bench_models.load_models()
+    song_fanout = app_models.song_fanout
+    report_app = load_report_app(args.mongo_uri, db_name)
+    app_models.init_db(db)
+    report_models.init_db(db)
+    song_fanout.db = db
+    # Mesmos índices que os serviços criam ao subir
+    app_models.ensure_indexes()
+    report_app.report_store.ensure_indexes()
+    report_app.prerender.ensure_indexes()
+
+    user = db.users.find_one({"email": seed.user_email(0)})
+    song = db.songs.find_one({})
+    mood = db.mood_entries.find_one({"user_id": user["_id"]})
+    ids = {"user_id": str(user["_id"]), "song_id": str(song["_id"]), "song_oid": song["_id"], "mood_id": str(mood["_id"])}
+    cases = build_cases(app_models, report_models, report_app, song_fanout, ids)
+    if args.only:
+        cases = {name: func for name, func in cases.items() if any(part in name for part in args.only)}
+
+    report = {"generated_at": datetime.utcnow().isoformat(), "scale": args.scale,
+              "max_ratio": args.max_ratio, "cases": {}}
+    failures = 0
+    for name, func in cases.items():
+        capture.commands = []
+        capture.active = True
+        try:
+            result = func()
+        finally:
+            capture.active = False
+        if isinstance(result, dict) and result.get("error"):
+            print(f"⚠️ {name}: {result['error']}")
+
+        print(f"🔎 {name}")
+        entries = []
+        for database, command_name, command in capture.commands:
+            for explained in _explainable(command_name, command):
+                collection = explained.get(command_name)
+                try:
+                    output = client[database].command({"explain": explained, "verbosity": "executionStats"})
+                except Exception as e:
+                    print(f"   ⚠️ {command_name} {collection}: explain falhou ({e})")
+                    continue
+                summary, problems = analyze(output, _has_filter(command_name, explained), args.max_ratio,
+                                            name in ALLOWED_COLLSCANS)
+                failures += bool(problems)
+                entries.append({"command": command_name, "collection": collection, **summary, "problems": problems,
+                                "query": json.loads(json_util.dumps(explained))})
+                status = "❌" if problems else "✅"
+                print(f"   {status} {command_name} {collection}: {' > '.join(summary['stages']) or '-'} "
+                      f"(keys {summary['keys_examined']}, docs {summary['docs_examined']}, "
+                      f"devolvidos {summary['returned']}){' - ' + '; '.join(problems) if problems else ''}")
+        if name in ALLOWED_COLLSCANS:
+            print(f"   ℹ️ COLLSCAN permitido: {ALLOWED_COLLSCANS[name]}")
+        report["cases"][name] = entries
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Planos salvos em {args.out}")
+
+    if failures:
+        print(f"❌ {failures} comando(s) com plano reprovado")
+        sys.exit(1)
+    print("✅ Todos os planos usam índice")
+
+if __name__ == "__main__":
+    main()
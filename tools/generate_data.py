@@ -0,0 +1,279 @@
+"""
+Gerador de dados sintéticos em grande volume para testes de escala.
+
+Uso:
+    python tools/generate_data.py --db moodtracker_scale --drop \\
+        --patients 1000000 --songs 50000 --days 365 --workers 8
+
+Gera pacientes, profissionais (com a lista `patients` preenchida), músicas e
+humores, gravando direto no MongoDB com insert_many em paralelo (um processo
+por bloco de pacientes). Os dados seguem hábitos realistas:
+    - cada paciente tem uma frequência própria de registro, horário preferido,
+      menos registros no fim de semana e pode abandonar o app;
+    - distribuição de emojis com viés por paciente e tendência a repetir o humor
+      do dia anterior;
+    - popularidade das músicas com cauda longa (Zipf).
+
+Mesmo --seed e --end-date geram exatamente os mesmos documentos (inclusive os
+_id), independente do número de workers.
+"""
+import argparse
+import bisect
+import calendar
+import math
+import multiprocessing
+import os
+import random
+import struct
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import MongoClient
+from werkzeug.security import generate_password_hash
+
+import seed
+
+# Frequência base de cada emoji na população
+EMOJI_WEIGHTS = {
+    '😊': 0.28,
+    '🤔': 0.15,
+    '😴': 0.14,
+    '😰': 0.12,
+    '😢': 0.10,
+    '🥳': 0.08,
+    '😍': 0.07,
+    '😡': 0.06
+}
+COMMENTS = [
+    "Dia tranquilo", "Muito trabalho hoje", "Saí com amigos", "Dormi mal",
+    "Treino pesado", "Briguei com alguém", "Consegui descansar", "Semana puxada",
+    "Sessão de terapia hoje", "Reencontrei a família"
+]
+GENRES = ["pop", "rock", "mpb", "sertanejo", "funk", "jazz", "clássica", "indie", "samba", "eletrônica"]
+
+# Prefixo de tipo no _id determinístico
+KIND_SONG, KIND_PATIENT, KIND_PROFESSIONAL, KIND_MOOD = 1, 2, 3, 4
+
+def make_id(kind: int, index: int, when: datetime) -> ObjectId:
+    """ObjectId determinístico: timestamp (UTC) de `when` + tipo + índice"""
+    return ObjectId(struct.pack(">I", calendar.timegm(when.utctimetuple())) + bytes([kind]) + index.to_bytes(7, "big"))
+
+def _is_linked(rng: random.Random) -> bool:
+    return rng.random() < 0.8
+
+def _zipf_cumulative(n: int, exponent: float):
+    total = 0.0
+    cumulative = []
+    for rank in range(1, n + 1):
+        total += 1.0 / (rank ** exponent)
+        cumulative.append(total)
+    return cumulative
+
+def song_snapshot(i: int, config) -> dict:
+    """Título, artista e link da música i (também copiados nas entradas de humor)"""
+    return {
+        "title": f"Música {i}",
+        "artist": f"Artista {i % max(1, config['songs'] // 8)}",
+        "spotify_url": f"https://open.spotify.com/track/gen{i}"
+    }
+
+def generate_songs(db, config):
+    rng = random.Random(f"{config['seed']}:songs")
+    base = config["start"]
+    batch = []
+    for i in range(config["songs"]):
+        batch.append({
+            "_id": make_id(KIND_SONG, i, base),
+            **song_snapshot(i, config),
+            "user_id": None,
+            "genres": rng.sample(GENRES, rng.randint(1, 2)),
+            "play_count": 0,
+            "created_at": base,
+            "updated_at": base
+        })
+        if len(batch) >= config["batch_size"]:
+            db.songs.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.songs.insert_many(batch, ordered=False)
+
+def _patient_moods(rng, patient_id, config, song_cumulative, counter):
+    """Gerar os humores de um paciente ao longo da janela"""
+    start, end = config["start"], config["end"]
+    total_days = (end - start).days
+
+    # Hábitos do paciente
+    signup_day = int(rng.random() ** 2 * total_days * 0.8)
+    churn_day = total_days if rng.random() < 0.7 else rng.randint(signup_day, total_days)
+    propensity = rng.betavariate(2, 3)
+    preferred_hour = rng.gauss(21, 1.5) if rng.random() < 0.6 else rng.gauss(8, 1.5)
+    song_rate = rng.uniform(0.3, 0.9)
+    comment_rate = rng.uniform(0.1, 0.7)
+    emojis = list(EMOJI_WEIGHTS)
+    weights = [EMOJI_WEIGHTS[emoji] * rng.lognormvariate(0, 0.5) for emoji in emojis]
+    previous = None
+
+    for day in range(signup_day, churn_day):
+        date = start + timedelta(days=day)
+        chance = propensity * (0.7 if date.weekday() >= 5 else 1.0)
+        if rng.random() >= chance:
+            continue
+
+        for _ in range(2 if rng.random() < 0.1 else 1):
+            hour = min(23.99, max(0.0, rng.gauss(preferred_hour, 1.0)))
+            created_at = date + timedelta(seconds=int(hour * 3600))
+            if previous and rng.random() < 0.4:
+                emoji = previous
+            else:
+                emoji = rng.choices(emojis, weights)[0]
+            previous = emoji
+
+            entry = {
+                "_id": make_id(KIND_MOOD, counter, created_at),
+                "user_id": patient_id,
+                "emoji": emoji,
+                "comment": rng.choice(COMMENTS) if rng.random() < comment_rate else "",
+                "date": created_at.strftime("%Y-%m-%d"),
+                "created_at": created_at,
+                "updated_at": created_at
+            }
+            if song_cumulative and rng.random() < song_rate:
+                song_index = bisect.bisect_left(song_cumulative, rng.random() * song_cumulative[-1])
+                entry["song_id"] = make_id(KIND_SONG, song_index, start)
+                entry["song"] = song_snapshot(song_index, config)
+            counter += 1
+            yield entry
+
+def generate_block(task):
+    """Gerar e gravar um bloco de pacientes com seus profissionais e humores"""
+    config, block_start, block_end = task
+    started = time.perf_counter()
+    db = MongoClient(config["mongo_uri"])[config["db"]]
+    song_cumulative = _zipf_cumulative(config["songs"], config["zipf"]) if config["songs"] else None
+    start = config["start"]
+    per_professional = config["patients_per_professional"]
+
+    patients, professionals, moods = [], [], []
+    inserted = {"users": 0, "mood_entries": 0}
+
+    def flush(collection, docs):
+        if docs:
+            db[collection].insert_many(docs, ordered=False)
+            inserted["users" if collection == "users" else collection] += len(docs)
+            docs.clear()
+
+    linked_by_professional = {}
+    for i in range(block_start, block_end):
+        rng = random.Random(f"{config['seed']}:patient:{i}")
+        patient_id = make_id(KIND_PATIENT, i, start)
+        professional_index = i // per_professional
+        linked = _is_linked(rng)
+        if linked:
+            linked_by_professional.setdefault(professional_index, []).append(patient_id)
+
+        patients.append({
+            "_id": patient_id,
+            "username": f"paciente{i}",
+            "email": seed.user_email(i),
+            "password_hash": config["password_hash"],
+            "user_type": "patient",
+            "active": True,
+            "age": rng.randint(16, 80),
+            "gender": rng.choice(["F", "M", None]),
+            "linked_professional": make_id(KIND_PROFESSIONAL, professional_index, start) if linked else None,
+            "created_at": start,
+            "updated_at": start
+        })
+        if len(patients) >= config["batch_size"]:
+            flush("users", patients)
+
+        # Contador de humores único por paciente: i * 2^20 entradas possíveis
+        for entry in _patient_moods(rng, patient_id, config, song_cumulative, i << 20):
+            moods.append(entry)
+            if len(moods) >= config["batch_size"]:
+                flush("mood_entries", moods)
+
+    # Os blocos são múltiplos de patients_per_professional: cada profissional cai em um só bloco
+    for professional_index in range(block_start // per_professional, math.ceil(block_end / per_professional)):
+        professionals.append({
+            "_id": make_id(KIND_PROFESSIONAL, professional_index, start),
+            "username": f"profissional{professional_index}",
+            "email": f"seed-pro-{professional_index}@example.com",
+            "password_hash": config["password_hash"],
+            "user_type": "professional",
+            "active": True,
+            "crp": f"06/{100000 + professional_index}",
+            "specialization": "",
+            "clinic_name": "",
+            "patients": linked_by_professional.get(professional_index, []),
+            "created_at": start,
+            "updated_at": start
+        })
+
+    flush("users", patients)
+    flush("users", professionals)
+    flush("mood_entries", moods)
+    return inserted, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de dados sintéticos em grande volume")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "moodtracker"))
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--patients-per-professional", type=int, default=25)
+    parser.add_argument("--songs", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--end-date", default=datetime.utcnow().strftime("%Y-%m-%d"),
+                        help="Último dia dos dados (AAAA-MM-DD); fixe para reproduzir")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Expoente da popularidade das músicas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop", action="store_true", help="Apagar users, songs e mood_entries antes")
+    args = parser.parse_args()
+
+    end = datetime.strptime(args.end_date, "%Y-%m-%d")
+    config = {
+        "mongo_uri": args.mongo_uri,
+        "db": args.db,
+        "seed": args.seed,
+        "songs": args.songs,
+        "zipf": args.zipf,
+        "start": end - timedelta(days=args.days),
+        "end": end,
+        "batch_size": args.batch_size,
+        "patients_per_professional": args.patients_per_professional,
+        # Mesmo hash para todos os usuários (senha seed.SEED_PASSWORD)
+        "password_hash": generate_password_hash(seed.SEED_PASSWORD)
+    }
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    if args.drop:
+        for collection in ['users', 'songs', 'mood_entries']:
+            db[collection].drop()
+
+    started = time.perf_counter()
+    generate_songs(db, config)
+    print(f"🎵 {args.songs} músicas em {time.perf_counter() - started:.1f}s")
+
+    block = args.patients_per_professional * max(1, 2000 // args.patients_per_professional)
+    tasks = [(config, i, min(i + block, args.patients)) for i in range(0, args.patients, block)]
+
+    totals = {"users": 0, "mood_entries": 0}
+    # spawn: os workers não herdam o MongoClient do processo principal
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        for done, (inserted, _) in enumerate(pool.imap_unordered(generate_block, tasks), 1):
+            for key, value in inserted.items():
+                totals[key] += value
+            elapsed = time.perf_counter() - started
+            documents = totals["users"] + totals["mood_entries"]
+            print(f"⏳ {done}/{len(tasks)} blocos: {totals['users']} usuários, {totals['mood_entries']} humores "
+                  f"({documents / elapsed:,.0f} docs/s)")
+
+    elapsed = time.perf_counter() - started
+    documents = args.songs + totals["users"] + totals["mood_entries"]
+    print(f"✅ {documents:,} documentos em {elapsed:.1f}s ({documents / elapsed:,.0f} docs/s)")
+
+if __name__ == "__main__":
+    main()
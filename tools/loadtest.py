@@ -0,0 +1,225 @@
+"""
+Teste de carga HTTP do app-main e do report-service com taxa de chegada fixa.
+
+Uso:
+    python tools/loadtest.py --seed-db --drop --rate 50 --duration 60 --out loadtest.json
+
+As requisições são disparadas em horários fixos (1/rate segundos), independente
+de quanto as anteriores demoram, e a latência é medida a partir do horário
+previsto: a fila que se forma quando o serviço satura entra nos percentis.
+O resultado (vazão, p50/p95/p99 e taxa de erro por rota) é gravado em JSON
+para comparar commits.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from pymongo import MongoClient
+
+import seed
+
+EMOJIS = seed.EMOJIS
+
+# Mistura padrão de rotas (pesos relativos)
+DEFAULT_MIX = {
+    "login": 10,
+    "create_mood": 30,
+    "moods_detailed": 25,
+    "stats": 15,
+    "report_stats": 15,
+    "report_pdf": 5
+}
+
+_local = threading.local()
+
+def _session():
+    """Uma sessão keep-alive por thread"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+def build_request(route, ctx, rng):
+    """Montar (método, url, corpo) de uma requisição da rota"""
+    index = rng.randrange(len(ctx["patient_ids"]))
+    user_id = ctx["patient_ids"][index]
+
+    if route == "login":
+        return "POST", f"{ctx['app']}/auth/login", {"email": seed.user_email(index), "password": seed.SEED_PASSWORD}
+    if route == "create_mood":
+        body = {"user_id": user_id, "emoji": rng.choice(EMOJIS), "comment": "loadtest"}
+        if ctx["song_ids"] and rng.random() < 0.7:
+            body["song_id"] = rng.choice(ctx["song_ids"])
+        return "POST", f"{ctx['app']}/moods", body
+    if route == "moods":
+        return "GET", f"{ctx['app']}/moods/user/{user_id}?limit=20", None
+    if route == "moods_detailed":
+        return "GET", f"{ctx['app']}/moods/user/{user_id}?detailed=true&limit=20", None
+    if route == "stats":
+        return "GET", f"{ctx['app']}/stats/user/{user_id}?days=30", None
+    if route == "report_stats":
+        return "GET", f"{ctx['reports']}/reports/user_mood_stats/{user_id}?days=30", None
+    if route == "report_pdf":
+        return "GET", f"{ctx['reports']}/reports/pdf/{user_id}?days=30&professional=true", None
+    raise ValueError(f"Rota desconhecida: {route}")
+
+def _fire(route, method, url, body, scheduled_at, timeout, results, lock):
+    error = None
+    status = None
+    try:
+        response = _session().request(method, url, json=body, timeout=timeout)
+        status = response.status_code
+        response.content  # consumir o corpo (PDFs inclusive)
+        if status >= 400:
+            error = f"HTTP {status}"
+    except requests.RequestException as e:
+        error = type(e).__name__
+    latency_ms = (time.perf_counter() - scheduled_at) * 1000
+
+    with lock:
+        results.setdefault(route, []).append((latency_ms, error))
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+def summarize(samples, duration):
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, error in samples if error)
+    error_kinds = {}
+    for _, error in samples:
+        if error:
+            error_kinds[error] = error_kinds.get(error, 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0,
+        "error_kinds": error_kinds,
+        "throughput_rps": round((len(samples) - errors) / duration, 2),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1], 2) if latencies else None
+    }
+
+def run_load(ctx, mix, rate, duration, concurrency, timeout, rng_seed):
+    """Disparar requisições em taxa fixa e retornar as amostras por rota"""
+    rng = random.Random(rng_seed)
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    results = {}
+    lock = threading.Lock()
+    total = int(rate * duration)
+    interval = 1.0 / rate
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled_at = start + i * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            route = rng.choices(routes, weights)[0]
+            method, url, body = build_request(route, ctx, rng)
+            executor.submit(_fire, route, method, url, body, scheduled_at, timeout, results, lock)
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def build_context(db, app_url, reports_url):
+    """URLs e ids dos pacientes/músicas de teste usados para montar as requisições"""
+    # A ordem dos pacientes segue o índice do e-mail, usado no login
+    patients = list(db.users.find({"user_type": "patient", "email": {"$regex": r"^seed-user-"}}, {"email": 1}))
+    patients.sort(key=lambda user: int(user["email"].split("-")[2].split("@")[0]))
+    return {
+        "app": app_url.rstrip("/"),
+        "reports": reports_url.rstrip("/"),
+        "patient_ids": [str(user["_id"]) for user in patients],
+        "song_ids": [str(song["_id"]) for song in db.songs.find({}, {"_id": 1}).limit(1000)]
+    }
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        route, weight = item.split("=")
+        mix[route.strip()] = float(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do Registra.Mood")
+    parser.add_argument("--app", default=os.getenv("APP_URL", "http://localhost:8080"))
+    parser.add_argument("--reports", default=os.getenv("REPORTS_URL", "http://localhost:8081"))
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "moodtracker"))
+    parser.add_argument("--rate", type=float, default=20, help="Requisições por segundo")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga")
+    parser.add_argument("--concurrency", type=int, default=200, help="Máximo de requisições em andamento")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Pesos por rota, ex.: login=10,create_mood=30,moods_detailed=25")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-db", action="store_true", help="Popular o banco antes da carga")
+    parser.add_argument("--drop", action="store_true", help="Com --seed-db, apagar os dados existentes")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--songs", type=int, default=200)
+    parser.add_argument("--entries-per-user", type=int, default=30)
+    parser.add_argument("--out", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    if args.seed_db:
+        seed.seed_database(db, users=args.users, songs=args.songs,
+                           entries_per_user=args.entries_per_user, seed=args.seed, drop=args.drop)
+
+    ctx = build_context(db, args.app, args.reports)
+    if not ctx["patient_ids"]:
+        parser.error("Nenhum usuário de teste encontrado: rode com --seed-db")
+
+    print(f"🚀 {args.rate} req/s por {args.duration}s contra {ctx['app']} e {ctx['reports']}")
+    results, elapsed = run_load(ctx, args.mix, args.rate, args.duration,
+                                args.concurrency, args.timeout, args.seed)
+
+    all_samples = [sample for samples in results.values() for sample in samples]
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "rate": args.rate,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "seed": args.seed,
+            "dataset": {
+                "patients": len(ctx["patient_ids"]),
+                "songs": db.songs.estimated_document_count(),
+                "mood_entries": db.mood_entries.estimated_document_count()
+            }
+        },
+        "elapsed_s": round(elapsed, 2),
+        "overall": summarize(all_samples, elapsed),
+        "routes": {route: summarize(samples, elapsed) for route, samples in sorted(results.items())}
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"✅ Resultado gravado em {args.out}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
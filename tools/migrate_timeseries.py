@@ -0,0 +1,288 @@
+"""
+Migração de mood_entries para uma coleção time-series (mood_entries_ts).
+
+A time-series usa created_at como timeField e user_id como metaField: as
+entradas de cada usuário ficam em buckets comprimidos por coluna, e as
+consultas por (user_id, período) leem só os buckets do intervalo.
+
+Passo a passo da virada:
+    1. python tools/migrate_timeseries.py create
+    2. subir app-main, app-async e report-service com MOOD_STORE=dual
+       (gravações vão para as duas coleções; leituras continuam em
+       mood_entries e uma amostra é comparada com a time-series)
+    3. python tools/migrate_timeseries.py copy --workers 4
+    4. python tools/migrate_timeseries.py verify --fix
+    5. python tools/migrate_timeseries.py compare --out antes_depois.json
+    6. subir os serviços com MOOD_STORE=timeseries (exige MongoDB 8.0, ver abaixo)
+    (voltar atrás: MOOD_STORE=legacy; mood_entries continua completa enquanto durar o modo dual)
+
+O copy pode ser interrompido e retomado (--resume), e pode rodar com os
+serviços no ar em modo dual. Os serviços inserem primeiro na time-series e
+depois em mood_entries. O copy lê mood_entries antes da time-series, então
+uma entrada gravada durante a cópia nunca é duplicada.
+
+Atenção: em time-series, update/delete por _id (PUT/DELETE /moods/<id>) e
+o update_many da cópia das músicas exigem MongoDB 8.0. Antes disso (o
+docker-compose usa o 5.0), a virada para no passo 5: em modo dual a edição
+vale em mood_entries e a falha na time-series fica no log dos serviços; o
+verify --fix refaz a cópia dos usuários divergentes (apagar pelo metaField
+user_id funciona no 5.0). Os serviços recusam MOOD_STORE=timeseries nessas
+versões (models.check_mood_store).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import CollectionInvalid
+
+LEGACY = "mood_entries"
+TIMESERIES = "mood_entries_ts"
+CHECKPOINT_ID = "mood_entries_ts"
+# Campos comparados no verify ("date" não existe na time-series)
+COMPARED_FIELDS = ["user_id", "emoji", "comment", "song_id", "created_at", "updated_at"]
+
+def _server_version(db):
+    return tuple(int(part) for part in db.client.server_info()["version"].split(".")[:2])
+
+def create(db, args):
+    try:
+        db.create_collection(TIMESERIES, timeseries={
+            "timeField": "created_at",
+            "metaField": "user_id",
+            "granularity": args.granularity
+        })
+        print(f"✅ Coleção {TIMESERIES} criada (granularidade {args.granularity})")
+    except CollectionInvalid:
+        print(f"ℹ️ {TIMESERIES} já existe")
+    db[TIMESERIES].create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+
+    if _server_version(db) < (8, 0):
+        print("⚠️ MongoDB < 8.0: PUT/DELETE /moods/<id> não chegam à time-series em modo dual, "
+              "e os serviços não sobem com MOOD_STORE=timeseries")
+    return 0
+
+def _user_ids(db, after=None):
+    """user_ids de mood_entries em ordem (sem o limite de 16 MB do distinct)"""
+    pipeline = []
+    if after is not None:
+        pipeline.append({"$match": {"user_id": {"$gt": after}}})
+    pipeline += [{"$group": {"_id": "$user_id"}}, {"$sort": {"_id": 1}}]
+    for item in db[LEGACY].aggregate(pipeline, allowDiskUse=True):
+        yield item["_id"]
+
+def copy_user(db, user_id, batch_size=1000):
+    """Copiar as entradas do usuário que ainda não estão na time-series"""
+    # Primeiro mood_entries, depois a time-series (ver docstring do módulo)
+    legacy_docs = list(db[LEGACY].find({"user_id": user_id}))
+    existing = {doc["_id"] for doc in db[TIMESERIES].find({"user_id": user_id}, {"_id": 1})}
+
+    missing = []
+    for doc in legacy_docs:
+        if doc["_id"] in existing or not doc.get("created_at"):
+            continue
+        doc.pop("date", None)
+        missing.append(doc)
+
+    for i in range(0, len(missing), batch_size):
+        db[TIMESERIES].insert_many(missing[i:i + batch_size], ordered=False)
+    return len(legacy_docs), len(missing)
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def copy(db, args):
+    checkpoint = db.migrations.find_one({"_id": CHECKPOINT_ID}) if args.resume else None
+    after = checkpoint.get("last_user_id") if checkpoint else None
+    totals = {"users": 0, "read": 0, "copied": 0}
+    if checkpoint:
+        totals.update(checkpoint.get("totals", {}))
+        print(f"↩️ Retomando depois do usuário {after}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for chunk in _chunks(_user_ids(db, after), args.chunk_users):
+            for read, copied in executor.map(lambda user_id: copy_user(db, user_id, args.batch_size), chunk):
+                totals["read"] += read
+                totals["copied"] += copied
+            totals["users"] += len(chunk)
+            # Checkpoint só depois do bloco inteiro: retomar repete no máximo um bloco (sem duplicar)
+            db.migrations.update_one(
+                {"_id": CHECKPOINT_ID},
+                {"$set": {"last_user_id": chunk[-1], "totals": totals, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            elapsed = time.perf_counter() - started
+            print(f"⏳ {totals['users']} usuários, {totals['copied']} entradas copiadas "
+                  f"({totals['read'] / elapsed:,.0f} entradas/s)")
+
+    print(f"✅ Cópia concluída: {totals['copied']} de {totals['read']} entradas copiadas")
+    return 0
+
+def _normalize(doc):
+    return tuple(doc.get(field) for field in COMPARED_FIELDS)
+
+def verify_user(db, user_id, fix=False):
+    """Comparar as entradas do usuário nas duas coleções; devolve as divergências"""
+    legacy = {doc["_id"]: _normalize(doc) for doc in db[LEGACY].find({"user_id": user_id})}
+    timeseries = {}
+    duplicated = 0
+    for doc in db[TIMESERIES].find({"user_id": user_id}):
+        if doc["_id"] in timeseries:
+            duplicated += 1
+        timeseries[doc["_id"]] = _normalize(doc)
+
+    missing = [oid for oid in legacy if oid not in timeseries]
+    extra = [oid for oid in timeseries if oid not in legacy]
+    different = [oid for oid, values in legacy.items() if oid in timeseries and timeseries[oid] != values]
+
+    if fix and (extra or different or duplicated):
+        # Editadas ou apagadas em mood_entries: a time-series do usuário é refeita do zero
+        db[TIMESERIES].delete_many({"user_id": user_id})
+        copy_user(db, user_id)
+    elif fix and missing:
+        copy_user(db, user_id)
+    return {"missing": len(missing), "extra": len(extra), "different": len(different), "duplicated": duplicated}
+
+def verify(db, args):
+    user_ids = list(_user_ids(db))
+    if args.sample and args.sample < len(user_ids):
+        user_ids = random.Random(args.seed).sample(user_ids, args.sample)
+
+    problems = {}
+    totals = {"missing": 0, "extra": 0, "different": 0, "duplicated": 0}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for user_id, result in zip(user_ids, executor.map(lambda user_id: verify_user(db, user_id, args.fix), user_ids)):
+            if any(result.values()):
+                problems[str(user_id)] = result
+                for key, value in result.items():
+                    totals[key] += value
+
+    legacy_count = db[LEGACY].count_documents({})
+    timeseries_count = db[TIMESERIES].count_documents({})
+    print(f"🔎 {len(user_ids)} usuários verificados; {LEGACY}: {legacy_count}, {TIMESERIES}: {timeseries_count}")
+    for user_id, result in list(problems.items())[:20]:
+        print(f"❌ {user_id}: {result}")
+    if problems:
+        if args.fix:
+            print(f"🔧 {len(problems)} usuários com divergências corrigidas: {totals}")
+            return 0
+        print(f"❌ {len(problems)} usuários com divergências: {totals}")
+        return 1
+    print("✅ Coleções equivalentes")
+    return 0
+
+def _collection_size(db, name):
+    stats = db.command("collStats", name)
+    result = {
+        "count": db[name].estimated_document_count(),
+        "size_mb": round(stats.get("size", 0) / 2**20, 2),
+        "storage_mb": round(stats.get("storageSize", 0) / 2**20, 2),
+        "index_mb": round(stats.get("totalIndexSize", 0) / 2**20, 2)
+    }
+    if "timeseries" in stats:
+        result["buckets"] = stats["timeseries"].get("bucketCount")
+        result["avg_entries_per_bucket"] = stats["timeseries"].get("avgNumMeasurementsPerCommit")
+    return result
+
+def _stats_queries(collection, user_id, days):
+    """As consultas de get_user_mood_stats (report-service) contra uma coleção"""
+    start_date = datetime.utcnow() - timedelta(days=days)
+    match = {"user_id": user_id, "created_at": {"$gte": start_date}}
+    list(collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$emoji", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}}
+    ]))
+    collection.count_documents({"user_id": user_id})
+    list(collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}}},
+        {"$count": "days"}
+    ]))
+    list(collection.find(match, {"emoji": 1, "created_at": 1}).sort("created_at", -1).limit(20))
+
+def _latency(db, name, user_ids, days, iterations):
+    timings = []
+    for _ in range(iterations):
+        for user_id in user_ids:
+            start = time.perf_counter()
+            _stats_queries(db[name], user_id, days)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 2),
+        "samples": len(timings)
+    }
+
+def compare(db, args):
+    """Tamanho em disco e latência das consultas de estatísticas, antes x depois"""
+    user_ids = [item["_id"] for item in db[LEGACY].aggregate([
+        {"$sample": {"size": args.users}}, {"$group": {"_id": "$user_id"}}
+    ])]
+    report = {"generated_at": datetime.utcnow().isoformat(), "users": len(user_ids), "days": args.days}
+    for label, name in (("legacy", LEGACY), ("timeseries", TIMESERIES)):
+        # Uma passada de aquecimento para comparar com o cache quente nos dois casos
+        _latency(db, name, user_ids, args.days, 1)
+        report[label] = {"collection": name, **_collection_size(db, name),
+                         "stats_query": _latency(db, name, user_ids, args.days, args.iterations)}
+        print(f"📦 {name}: {report[label]['storage_mb']} MB em disco, {report[label]['index_mb']} MB de índices, "
+              f"estatísticas p50 {report[label]['stats_query']['p50_ms']} ms")
+
+    output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"✅ Resultado gravado em {args.out}")
+    else:
+        print(output)
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Migração de mood_entries para time-series")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "moodtracker"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = subparsers.add_parser("create", help="Criar a coleção time-series e o índice")
+    create_parser.add_argument("--granularity", choices=["seconds", "minutes", "hours"], default="hours")
+
+    copy_parser = subparsers.add_parser("copy", help="Copiar as entradas (idempotente)")
+    copy_parser.add_argument("--workers", type=int, default=4)
+    copy_parser.add_argument("--chunk-users", type=int, default=500, help="Usuários por checkpoint")
+    copy_parser.add_argument("--batch-size", type=int, default=1000)
+    copy_parser.add_argument("--resume", action="store_true", help="Continuar do último checkpoint")
+
+    verify_parser = subparsers.add_parser("verify", help="Comparar as duas coleções usuário a usuário")
+    verify_parser.add_argument("--sample", type=int, help="Verificar só N usuários sorteados")
+    verify_parser.add_argument("--seed", type=int, default=42)
+    verify_parser.add_argument("--workers", type=int, default=4)
+    verify_parser.add_argument("--fix", action="store_true", help="Copiar as entradas faltantes e refazer os usuários divergentes")
+
+    compare_parser = subparsers.add_parser("compare", help="Tamanho e latência antes x depois")
+    compare_parser.add_argument("--users", type=int, default=50)
+    compare_parser.add_argument("--days", type=int, default=30)
+    compare_parser.add_argument("--iterations", type=int, default=5)
+    compare_parser.add_argument("--out", help="Arquivo JSON de saída (padrão: stdout)")
+
+    args = parser.parse_args()
+    db = MongoClient(args.mongo_uri)[args.db]
+    commands = {"create": create, "copy": copy, "verify": verify, "compare": compare}
+    sys.exit(commands[args.command](db, args))
+
+if __name__ == "__main__":
+    main()
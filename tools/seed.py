@@ -0,0 +1,134 @@
+"""
+Popular um MongoDB local com dados de teste (usuários, músicas e humores).
+
+Uso:
+    python tools/seed.py --db moodtracker_bench --drop --users 200 --songs 500 --entries-per-user 60
+
+O mesmo --seed gera sempre os mesmos dados. Todos os usuários usam a senha
+SEED_PASSWORD e e-mails no formato seed-user-<n>@example.com.
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+from werkzeug.security import generate_password_hash
+
+SEED_PASSWORD = "seed12345"
+EMOJIS = ['😊', '😢', '😡', '😰', '😴', '🥳', '😍', '🤔']
+COMMENTS = ["", "Dia tranquilo", "Muito trabalho hoje", "Saí com amigos", "Dormi mal", "Treino pesado"]
+
+def user_email(index: int) -> str:
+    return f"seed-user-{index}@example.com"
+
+def seed_database(db, users: int = 100, professionals: int = 5, songs: int = 200,
+                  entries_per_user: int = 30, days: int = 90, seed: int = 42, drop: bool = False):
+    """Criar o conjunto de dados e retornar os ids gerados"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    if drop:
+        for collection in ['users', 'songs', 'mood_entries']:
+            db[collection].drop()
+
+    # Mesmo hash para todos: gerar um hash por usuário dominaria o tempo de carga
+    password_hash = generate_password_hash(SEED_PASSWORD)
+
+    song_docs = [{
+        "title": f"Música {i}",
+        "artist": f"Artista {i % 50}",
+        "spotify_url": f"https://open.spotify.com/track/seed{i}",
+        "user_id": None,
+        "genres": [],
+        "play_count": 0,
+        "created_at": now,
+        "updated_at": now
+    } for i in range(songs)]
+    song_ids = db.songs.insert_many(song_docs).inserted_ids if song_docs else []
+
+    patient_docs = [{
+        "username": f"paciente{i}",
+        "email": user_email(i),
+        "password_hash": password_hash,
+        "user_type": "patient",
+        "active": True,
+        "age": rng.randint(16, 80),
+        "gender": rng.choice(["F", "M", None]),
+        "linked_professional": None,
+        "created_at": now,
+        "updated_at": now
+    } for i in range(users)]
+    patient_ids = db.users.insert_many(patient_docs).inserted_ids if patient_docs else []
+
+    professional_ids = []
+    for i in range(professionals):
+        linked = patient_ids[i::professionals]
+        result = db.users.insert_one({
+            "username": f"profissional{i}",
+            "email": user_email(users + i),
+            "password_hash": password_hash,
+            "user_type": "professional",
+            "active": True,
+            "crp": f"06/{100000 + i}",
+            "specialization": "",
+            "clinic_name": "",
+            "patients": list(linked),
+            "created_at": now,
+            "updated_at": now
+        })
+        professional_ids.append(result.inserted_id)
+        if linked:
+            db.users.update_many({"_id": {"$in": linked}}, {"$set": {"linked_professional": result.inserted_id}})
+
+    batch = []
+    for user_id in patient_ids:
+        for _ in range(entries_per_user):
+            created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+            entry = {
+                "user_id": user_id,
+                "emoji": rng.choice(EMOJIS),
+                "comment": rng.choice(COMMENTS),
+                "date": created_at.strftime("%Y-%m-%d"),
+                "created_at": created_at,
+                "updated_at": created_at
+            }
+            if song_ids and rng.random() < 0.7:
+                song_index = rng.randrange(len(song_ids))
+                entry["song_id"] = song_ids[song_index]
+                # Cópia da música, como o create_mood_entry grava (ver app-main/song_fanout.py)
+                entry["song"] = {field: song_docs[song_index][field] for field in ("title", "artist", "spotify_url")}
+            batch.append(entry)
+            if len(batch) >= 5000:
+                db.mood_entries.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        db.mood_entries.insert_many(batch, ordered=False)
+
+    return {
+        "patient_ids": [str(patient_id) for patient_id in patient_ids],
+        "professional_ids": [str(professional_id) for professional_id in professional_ids],
+        "song_ids": [str(song_id) for song_id in song_ids]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Popular o MongoDB com dados de teste")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "moodtracker"))
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--professionals", type=int, default=5)
+    parser.add_argument("--songs", type=int, default=200)
+    parser.add_argument("--entries-per-user", type=int, default=30)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="Apagar users, songs e mood_entries antes de popular")
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    ids = seed_database(db, args.users, args.professionals, args.songs,
+                        args.entries_per_user, args.days, args.seed, drop=args.drop)
+    print(f"✅ {len(ids['patient_ids'])} pacientes, {len(ids['professional_ids'])} profissionais, "
+          f"{len(ids['song_ids'])} músicas e {args.users * args.entries_per_user} humores em {args.db}")
+
+if __name__ == "__main__":
+    main()
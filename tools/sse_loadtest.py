@@ -0,0 +1,218 @@
+"""
+Teste de carga do feed SSE (GET /reports/stream, report-service/stream_app.py).
+
+Uso:
+    python tools/sse_loadtest.py --connections 2000 --moods 20 --out sse.json
+
+Abre --connections conexões simultâneas (distribuídas entre os profissionais
+do banco), espera todas receberem o início do fluxo e registra --moods humores
+pelo app-main (POST /moods), um a cada --interval segundos. Para cada humor,
+mede quantas das conexões que acompanham o paciente receberam o evento e em
+quanto tempo, a partir do POST. O resultado vai em JSON, como o loadtest.py.
+
+Cada conexão é um socket: com milhares de conexões, o limite de arquivos
+abertos (ulimit -n) é elevado até o máximo permitido ao processo.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+from pymongo import MongoClient
+
+import loadtest
+import seed
+
+MARKER = "sse-loadtest"
+
+class Listener:
+    """Uma conexão SSE: horário de chegada de cada humor marcado"""
+    def __init__(self, professional_id, patient_ids):
+        self.professional_id = professional_id
+        self.patient_ids = patient_ids  # None = todos os pacientes
+        self.connect_ms = None
+        self.error = None
+        self.received = {}
+
+    def follows(self, patient_id) -> bool:
+        return self.patient_ids is None or patient_id in self.patient_ids
+
+async def _listen(listener, host, port, connected, timeout):
+    """Abrir o fluxo e ler os eventos até ser cancelado"""
+    started = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write((f"GET /reports/stream?professional_id={listener.professional_id} HTTP/1.1\r\n"
+                      f"Host: {host}:{port}\r\nAccept: text/event-stream\r\n\r\n").encode())
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        if b" 200 " not in status:
+            raise ConnectionError(status.decode(errors="replace").strip() or "sem resposta")
+        # Cabeçalhos e o "retry:" inicial: a assinatura já está registrada no feed
+        while not (await asyncio.wait_for(reader.readline(), timeout)).startswith(b"retry:"):
+            pass
+        listener.connect_ms = (time.perf_counter() - started) * 1000
+        connected.release()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("fluxo encerrado pelo servidor")
+            if line.startswith(b"data: ") and MARKER.encode() in line:
+                comment = json.loads(line[6:])["mood"]["comment"]
+                listener.received.setdefault(comment, time.perf_counter())
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        listener.error = f"{type(e).__name__}: {e}"
+        if listener.connect_ms is None:
+            connected.release()
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _raise_file_limit(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard == resource.RLIM_INFINITY else min(hard, max(soft, needed))
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+def _post_mood(app_url, patient_id, comment, timeout):
+    response = requests.post(f"{app_url}/moods", json={"user_id": patient_id, "emoji": random.choice(seed.EMOJIS),
+                                                      "comment": comment}, timeout=timeout)
+    response.raise_for_status()
+
+async def run(args, professionals, patient_ids):
+    stream = urlsplit(args.stream)
+    host, port = stream.hostname, stream.port or 80
+    listeners = [Listener(*professionals[i % len(professionals)]) for i in range(args.connections)]
+    # --ramp conexões abrindo ao mesmo tempo
+    connected = asyncio.Semaphore(args.ramp)
+
+    async def start(listener):
+        await connected.acquire()
+        return asyncio.create_task(_listen(listener, host, port, connected, args.timeout))
+
+    print(f"🔌 Abrindo {args.connections} conexões em {args.stream}")
+    opening = time.perf_counter()
+    tasks = [await start(listener) for listener in listeners]
+    # Todas abertas (ou com erro)
+    for _ in range(args.ramp):
+        await connected.acquire()
+    open_s = time.perf_counter() - opening
+    alive = [listener for listener in listeners if listener.connect_ms is not None and listener.error is None]
+    print(f"✅ {len(alive)} conexões abertas em {open_s:.1f}s")
+
+    sent = []
+    for i in range(args.moods):
+        patient_id = random.choice(patient_ids)
+        comment = f"{MARKER}-{i}"
+        posted_at = time.perf_counter()
+        try:
+            await asyncio.to_thread(_post_mood, args.app, patient_id, comment, args.timeout)
+            sent.append((comment, patient_id, posted_at))
+        except requests.RequestException as e:
+            print(f"⚠️  POST /moods falhou: {e}")
+        await asyncio.sleep(args.interval)
+    await asyncio.sleep(args.settle)
+
+    try:
+        server = requests.get(f"{args.stream.rstrip('/')}/reports/stream/metrics", timeout=args.timeout).json()
+    except (requests.RequestException, ValueError):
+        server = None
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies, expected = [], 0
+    for comment, patient_id, posted_at in sent:
+        for listener in alive:
+            if listener.follows(patient_id):
+                expected += 1
+                if comment in listener.received:
+                    latencies.append((listener.received[comment] - posted_at) * 1000)
+    latencies.sort()
+    connects = sorted(listener.connect_ms for listener in alive)
+    errors = {}
+    for listener in listeners:
+        if listener.error:
+            errors[listener.error] = errors.get(listener.error, 0) + 1
+
+    return {
+        "connections": {
+            "requested": args.connections,
+            "open": len(alive),
+            "failed": args.connections - len(alive),
+            "open_s": round(open_s, 2),
+            "connect_p50_ms": loadtest.percentile(connects, 0.50),
+            "connect_p95_ms": loadtest.percentile(connects, 0.95),
+            "errors": errors
+        },
+        "delivery": {
+            "moods": len(sent),
+            "expected": expected,
+            "delivered": len(latencies),
+            "ratio": round(len(latencies) / expected, 4) if expected else None,
+            "p50_ms": loadtest.percentile(latencies, 0.50),
+            "p95_ms": loadtest.percentile(latencies, 0.95),
+            "p99_ms": loadtest.percentile(latencies, 0.99),
+            "max_ms": round(latencies[-1], 2) if latencies else None
+        },
+        "server": server
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do feed SSE do Registra.Mood")
+    parser.add_argument("--stream", default=os.getenv("STREAM_URL", "http://localhost:8084"))
+    parser.add_argument("--app", default=os.getenv("APP_URL", "http://localhost:8080"))
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "moodtracker"))
+    parser.add_argument("--connections", type=int, default=1000, help="Conexões SSE simultâneas")
+    parser.add_argument("--ramp", type=int, default=100, help="Conexões abrindo ao mesmo tempo")
+    parser.add_argument("--moods", type=int, default=20, help="Humores registrados com as conexões abertas")
+    parser.add_argument("--interval", type=float, default=0.5, help="Segundos entre os humores")
+    parser.add_argument("--settle", type=float, default=5, help="Espera pelos últimos eventos")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    professionals = [
+        (str(user["_id"]), {str(patient) for patient in user.get("patients") or []} or None)
+        for user in db.users.find({"user_type": "professional"}, {"patients": 1})
+    ]
+    patient_ids = [str(user["_id"]) for user in db.users.find({"user_type": "patient"}, {"_id": 1})]
+    if not professionals or not patient_ids:
+        parser.error("Nenhum profissional ou paciente no banco: rode tools/seed.py")
+
+    limit = _raise_file_limit(args.connections + 100)
+    if limit < args.connections + 100:
+        print(f"⚠️  Limite de arquivos abertos ({limit}) menor que o número de conexões")
+
+    result = asyncio.run(run(args, professionals, patient_ids))
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "git_commit": loadtest._git_commit(),
+        "config": {key: getattr(args, key) for key in ("connections", "ramp", "moods", "interval", "settle", "seed")},
+        **result
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"✅ Resultado gravado em {args.out}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
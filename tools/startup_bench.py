@@ -0,0 +1,211 @@
+"""
+Tempo de subida e memória dos dois serviços.
+
+Uso:
+    python tools/startup_bench.py imports --top 15
+    python tools/startup_bench.py startup --runs 5 --out startup.json
+    python tools/startup_bench.py startup --service report-service --command python report_app.py
+
+--command consome o resto da linha: deve ser o último argumento.
+
+imports: roda `python -X importtime` no módulo do serviço e lista os módulos
+com maior tempo acumulado de importação.
+
+startup: sobe o serviço fora do Docker (MongoDB em MONGO_URI) e mede:
+    - live_ms: tempo até a primeira resposta de /livez (primeira requisição atendida)
+    - ready_ms: tempo até /readyz responder 200 (aquecimento concluído)
+    - rss_kb / pss_kb de cada processo depois do aquecimento (Linux, /proc)
+O PSS divide as páginas compartilhadas entre os processos que as usam: com o
+ReportLab importado no mestre do gunicorn, o PSS dos workers fica abaixo do RSS.
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+import loadtest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVICES = {
+    "app-main": {
+        "dir": "app-main",
+        "module": "app",
+        "port": 5000,
+        "command": [sys.executable, "-m", "flask", "--app", "app", "run", "--port", "5000"]
+    },
+    "report-service": {
+        "dir": "report-service",
+        "module": "report_app",
+        "port": 5001,
+        "command": ["gunicorn", "-c", "gunicorn.conf.py", "report_app:app"]
+    }
+}
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def profile_imports(service, env):
+    """Tempo de importação por módulo (microssegundos), do maior acumulado para o menor"""
+    config = SERVICES[service]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {config['module']}"],
+        cwd=os.path.join(ROOT, config["dir"]), env=env, capture_output=True, text=True, timeout=120
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({"module": name, "depth": len(indent) // 2,
+                            "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules
+
+def _children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # O nome do processo vem entre parênteses e pode ter espaços
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+def _memory_kb(pid):
+    memory = {"pid": pid, "rss_kb": None, "pss_kb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_kb"] = int(line.split()[1])
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+def process_tree_memory(pid):
+    """Memória do processo principal e de cada worker"""
+    processes = [_memory_kb(pid)]
+    processes[0]["role"] = "master"
+    for child in _children(pid):
+        processes.append({**_memory_kb(child), "role": "worker"})
+    return processes
+
+def _wait_for(url, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(0.01)
+    return False
+
+def measure_startup(service, command, env, timeout):
+    """Subir o serviço uma vez e medir subida e memória"""
+    config = SERVICES[service]
+    base = f"http://127.0.0.1:{config['port']}"
+    started = time.monotonic()
+    process = subprocess.Popen(command, cwd=os.path.join(ROOT, config["dir"]), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        deadline = started + timeout
+        live = _wait_for(f"{base}/livez", deadline)
+        live_ms = round((time.monotonic() - started) * 1000, 1) if live else None
+        ready = live and _wait_for(f"{base}/readyz", deadline)
+        ready_ms = round((time.monotonic() - started) * 1000, 1) if ready else None
+        # Workers do gunicorn e o filho do reloader aparecem como processos filhos
+        time.sleep(0.5)
+        return {"live_ms": live_ms, "ready_ms": ready_ms, "processes": process_tree_memory(process.pid)}
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+def summarize(runs):
+    def median(values):
+        values = [value for value in values if value is not None]
+        return round(statistics.median(values), 1) if values else None
+
+    workers = [p for run in runs for p in run["processes"] if p["role"] == "worker"] or \
+              [p for run in runs for p in run["processes"]]
+    return {
+        "live_ms_p50": median([run["live_ms"] for run in runs]),
+        "ready_ms_p50": median([run["ready_ms"] for run in runs]),
+        "worker_rss_kb_p50": median([p["rss_kb"] for p in workers]),
+        "worker_pss_kb_p50": median([p["pss_kb"] for p in workers]),
+        "total_pss_kb_p50": median([sum(p["pss_kb"] or 0 for p in run["processes"]) for run in runs])
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de subida e memória dos serviços")
+    parser.add_argument("mode", choices=["imports", "startup"])
+    parser.add_argument("--service", choices=list(SERVICES), action="append",
+                        help="Serviço a medir (padrão: os dois)")
+    parser.add_argument("--command", nargs=argparse.REMAINDER,
+                        help="Comando de subida no lugar do padrão (com um único --service)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/?directConnection=true"))
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "moodtracker"))
+    parser.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY do gunicorn")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60, help="Segundos de espera por /readyz")
+    parser.add_argument("--top", type=int, default=15, help="Módulos listados no perfil de importação")
+    parser.add_argument("--out", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    services = args.service or list(SERVICES)
+    if args.command and len(services) != 1:
+        parser.error("--command exige um único --service")
+    # common/ no PYTHONPATH: os serviços sobem mesmo sem o pacote compartilhado instalado
+    python_path = os.pathsep.join(filter(None, [os.path.join(ROOT, "common"), os.environ.get("PYTHONPATH")]))
+    env = {**os.environ, "MONGO_URI": args.mongo_uri, "DB_NAME": args.db, "PYTHONPATH": python_path,
+           "WEB_CONCURRENCY": str(args.workers), "PYTHONUNBUFFERED": "1"}
+
+    report = {"generated_at": datetime.utcnow().isoformat(), "git_commit": loadtest._git_commit(), "services": {}}
+    for service in services:
+        if args.mode == "imports":
+            modules = profile_imports(service, env)
+            total = modules[0]["cumulative_ms"] if modules else 0
+            print(f"📦 {service}: {total:.0f} ms importando {SERVICES[service]['module']}")
+            for module in modules[:args.top]:
+                print(f"   {module['cumulative_ms']:8.1f} ms  {'  ' * module['depth']}{module['module']}")
+            report["services"][service] = {"total_ms": total, "modules": modules[:args.top]}
+        else:
+            command = args.command or SERVICES[service]["command"]
+            runs = []
+            for run in range(args.runs):
+                result = measure_startup(service, command, env, args.timeout)
+                runs.append(result)
+                memory = ", ".join(f"{p['role']} {p['rss_kb']} kB RSS / {p['pss_kb']} kB PSS" for p in result["processes"])
+                print(f"🚀 {service} #{run + 1}: /livez em {result['live_ms']} ms, /readyz em {result['ready_ms']} ms ({memory})")
+            report["services"][service] = {"command": command, "runs": runs, "summary": summarize(runs)}
+            print(f"📊 {service}: {report['services'][service]['summary']}")
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"💾 Resultado salvo em {args.out}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()